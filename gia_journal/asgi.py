@@ -3,6 +3,12 @@ ASGI config for gia_journal project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+    uvicorn gia_journal.asgi:application --workers 4
+    gunicorn gia_journal.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+PDF, covers and archive pages are async views (see journal/files.py):
+file bodies are streamed from a thread pool instead of holding a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
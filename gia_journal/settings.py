@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from gia_journal.database import sqlite_databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -36,12 +38,16 @@ INSTALLED_APPS = [
     "django.contrib.contenttypes",
     "django.contrib.sessions",
     "django.contrib.messages",
-    "django.contrib.staticfiles",
+    # journal стоит перед staticfiles, чтобы его collectstatic (со сборкой шрифтов) имел приоритет
     "journal",
+    "django.contrib.staticfiles",
 ]
 
 MIDDLEWARE = [
+    # Первым - чтобы замер времени включал остальные middleware
+    "journal.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "journal.middleware.PrecompressedStaticMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -54,7 +60,8 @@ ROOT_URLCONF = "gia_journal.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates с замером времени рендера (см. journal/timing.py)
+        "BACKEND": "journal.timing.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -73,13 +80,103 @@ WSGI_APPLICATION = "gia_journal.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# Писатель default и читатель replica на одном файле, WAL и PRAGMA при подключении
+# (см. gia_journal/database.py). Учебная db.sqlite3 лежит в репозитории: при DEBUG
+# она остается в обычном журнале, иначе первое же подключение меняет заголовок файла
+DATABASES = sqlite_databases(
+    BASE_DIR / "db.sqlite3",
+    pragmas={"journal_mode": "DELETE"} if DEBUG else None,
+)
+DATABASE_ROUTERS = ["gia_journal.database.ReadWriteRouter"]
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LocMemCache живет внутри одного процесса; при нескольких воркерах
+# лучше общий кэш (Redis/Memcached или FileBasedCache).
+
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "gia-journal",
     }
 }
 
+# Полностраничный кэш публичных страниц (см. journal/page_cache.py), секунды. С LocMemCache
+# другие воркеры увидят изменения не позже чем через TIMEOUT + STALE_TIMEOUT
+JOURNAL_PAGE_CACHE = {
+    "ENABLED": True,
+    "TIMEOUT": 10 * 60,         # страница свежая
+    "STALE_TIMEOUT": 60 * 60,   # после этого отдается устаревшая и обновляется в фоне
+    "LOCK_TIMEOUT": 30,
+    "WAIT_TIMEOUT": 5,          # сколько ждать чужой рендер при промахе
+}
+
+# Срок данных страниц архива в кэше, секунды (см. journal/archive.py). С LocMemCache
+# другие воркеры увидят изменения выпусков и периодов не позже чем через этот срок
+JOURNAL_ARCHIVE_CACHE_TIMEOUT = 5 * 60
+
+# OAI-PMH (см. journal/oai.py): идентификаторы записей oai:<REPOSITORY_IDENTIFIER>:article/<id>
+JOURNAL_OAI = {
+    "REPOSITORY_IDENTIFIER": "miigaik.ru",
+    "ADMIN_EMAIL": "editor@miigaik.ru",
+    "PAGE_SIZE": 100,           # записей в ответе ListRecords/ListIdentifiers
+}
+
+# Карта сайта (см. journal/sitemaps.py): файлы в ROOT, адреса от BASE_URL
+JOURNAL_SITEMAPS = {
+    "ROOT": BASE_DIR / "sitemaps",
+    "BASE_URL": "http://localhost:8000",    # в продакшене - публичный адрес сайта
+    "SHARD_SIZE": 50000,                    # адресов в одном файле (не больше 50 000)
+    "CHECK_INTERVAL": 5 * 60,               # как часто сверять файлы с БД при запросе карты, секунды
+}
+
+
+# Извлечение текста PDF для поиска (см. journal/text_extraction.py): после загрузки
+# файла в админке - в фоновом потоке процесса; весь архив - командой extract_pdf_text
+JOURNAL_TEXT_EXTRACTION = {
+    "ON_UPLOAD": True,
+}
+
+
+# Форма обратной связи (см. journal/contact_queue.py): сообщения пишутся в БД пачками
+JOURNAL_CONTACT = {
+    "QUEUE_DIR": BASE_DIR / "contact-queue",
+    "BATCH_SIZE": 50,           # сообщений в одной транзакции
+    "FLUSH_INTERVAL": 5,        # как часто фоновый поток пишет неполную пачку, секунды (0 - не запускать)
+    "MAX_PENDING": 5000,        # больше очередь не принимает (ответ 503)
+}
+
+# Ограничение частоты запросов с одного IP (см. journal/throttling.py)
+JOURNAL_THROTTLE = {
+    "PROXY_COUNT": 0,           # сколько обратных прокси перед Django (для X-Forwarded-For)
+    "contact": {"RATE": 5, "PERIOD": 60, "BURST": 3},  # отправок формы: 5 в минуту, не больше 3 подряд
+}
+
+# Замеры времени запросов (см. journal.middleware.ServerTimingMiddleware): заголовок
+# Server-Timing - сотрудникам всегда, поля в журнал journal.timing - для доли запросов
+JOURNAL_SERVER_TIMING = {
+    "SAMPLE_RATE": 0.01,
+}
+
+# Метрики для Prometheus на /metrics (см. journal/metrics.py)
+JOURNAL_METRICS = {
+    "ENABLED": True,
+    "DIR": BASE_DIR / "metrics",    # снимки значений воркеров; None - только текущий процесс
+    "FLUSH_INTERVAL": 5,            # как часто воркер записывает свой снимок, секунды
+    "ALLOWED_IPS": ["127.0.0.1", "::1"],  # откуда можно забирать метрики
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "journal.timing": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -119,10 +216,37 @@ STATIC_URL = "static/"
 STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
+# Сюда collectstatic собирает статику с хэшами в именах и сжатыми копиями .gz/.br
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        # В разработке статика отдается как есть, в продакшне - после collectstatic
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage" if DEBUG
+            else "journal.storage.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
 
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Передача PDF-файлов (см. journal/files.py). В продакшне за nginx:
+# JOURNAL_FILE_DELIVERY = {
+#     "BACKEND": "journal.files.NginxAccelDelivery",
+#     "OPTIONS": {"location": "/protected-media/"},
+# }
+# Для Apache (mod_xsendfile) и lighttpd - "journal.files.SendfileDelivery".
+JOURNAL_FILE_DELIVERY = {
+    "BACKEND": "journal.files.StreamingDelivery",
+}
+# Cache-Control: max-age для PDF (адреса постоянные, повторная проверка по ETag)
+JOURNAL_FILE_CACHE_MAX_AGE = 24 * 60 * 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
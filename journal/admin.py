@@ -17,7 +17,7 @@ class JournalIssueAdmin(admin.ModelAdmin):
     list_display = ['__str__', 'year', 'is_current', 'has_cover', 'has_pdf', 'created_at']
     list_filter = ['year', 'is_current']
     search_fields = ['number', 'year', 'volume'] # Убрал title, если его нет в модели, заменил на актуальные
-    ordering = ['-year', '-number']
+    ordering = ['-year', '-number_sort', '-number']
     
     # Подключаем Inline
     inlines = [ArticleInline]
@@ -48,9 +48,10 @@ class JournalIssueAdmin(admin.ModelAdmin):
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
     list_display = ['title', 'authors', 'issue', 'rubric', 'has_pdf', 'is_published']
+    list_select_related = ['issue']  # Выпуск в списке - без запроса на каждую строку
     list_filter = ['is_published', 'issue__year', 'rubric']
     search_fields = ['title', 'authors', 'abstract']
-    ordering = ['-issue__year', 'issue__number', 'page_start'] # Сортировка по порядку в журнале
+    ordering = ['-issue__year', 'issue__number_sort', 'page_start'] # Сортировка по порядку в журнале
     
     autocomplete_fields = ['issue'] # Удобный поиск выпуска при редактировании статьи
     
@@ -0,0 +1,282 @@
+"""
+JSON API только для чтения: /api/v1/<ресурс>/ и /api/v1/<ресурс>/<id>/.
+
+Ресурсы: issues, articles, editorial-board, archive-periods (описаны в RESOURCES).
+- ?fields=id,title - только нужные поля; из БД читаются только их колонки;
+- ?limit=N (до MAX_PAGE_SIZE) и ?cursor=... - страницы по курсору (journal.pagination);
+- ETag по содержимому страницы, If-None-Match -> 304 без сериализации;
+- строки страницы читаются одним запросом (ETag считается по ним же), JSON
+  списка собирается построчно по мере отправки ответа.
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from .models import ArchiveYear, Article, EditorialBoard, JournalIssue
+from .pagination import CURSOR_PARAM, CursorPaginator, InvalidCursor
+
+API_VERSION = 'v1'
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+API_MAX_AGE = 60
+
+
+class ApiError(Exception):
+    """Ошибка в параметрах запроса (ответ 400)"""
+
+
+@dataclass
+class ApiResource:
+    name: str
+    model: type
+    # имя поля -> (колонки модели, функция(obj, request) -> значение)
+    fields: dict
+    default_fields: tuple
+    ordering: list
+    # параметр запроса -> lookup (значения - целые числа)
+    filters: dict = field(default_factory=dict)
+    lookup: str = 'pk'
+    # условия видимости на сайте: неопубликованное не отдается и по id
+    visible: dict = field(default_factory=dict)
+
+    def get_queryset(self):
+        return self.model.objects.filter(**self.visible)
+
+
+def _attr(name):
+    return (name,), lambda obj, request: getattr(obj, name)
+
+
+def _absolute(request, url):
+    return request.build_absolute_uri(url) if url else None
+
+
+def _file_url(url_name, file_field):
+    def get(obj, request):
+        if not getattr(obj, file_field):
+            return None
+        return _absolute(request, reverse(url_name, args=[obj.pk]))
+    return (file_field,), get
+
+
+def _api_url(url_name, lookup='pk'):
+    return (lookup,), lambda obj, request: _absolute(request, reverse(url_name, args=[getattr(obj, lookup)]))
+
+
+RESOURCES = {
+    resource.name: resource for resource in [
+        ApiResource(
+            name='issues',
+            model=JournalIssue,
+            fields={
+                'id': _attr('id'),
+                'year': _attr('year'),
+                'volume': _attr('volume'),
+                'number': _attr('number'),
+                'publication_date': _attr('publication_date'),
+                'is_current': _attr('is_current'),
+                'cover_url': (('cover', 'cover_sha256'), lambda obj, request: _absolute(request, obj.cover_url)),
+                'cover_width': _attr('cover_width'),
+                'cover_height': _attr('cover_height'),
+                'pdf_url': _file_url('download_issue_pdf', 'full_pdf'),
+                'pdf_size': _attr('full_pdf_size'),
+                'pdf_sha256': _attr('full_pdf_sha256'),
+                'url': (('id',), lambda obj, request: _absolute(request, reverse('issue_detail', args=[obj.pk]))),
+                'api_url': _api_url('api_issue'),
+            },
+            default_fields=('id', 'year', 'volume', 'number', 'publication_date', 'is_current', 'cover_url',
+                            'pdf_url', 'url'),
+            ordering=['-year', '-number_sort', '-number', '-pk'],
+            filters={'year': 'year', 'year_from': 'year__gte', 'year_to': 'year__lte'},
+        ),
+        ApiResource(
+            name='articles',
+            model=Article,
+            fields={
+                'id': _attr('id'),
+                'issue': _attr('issue_id'),
+                'title': _attr('title'),
+                'authors': _attr('authors'),
+                'rubric': _attr('rubric'),
+                'abstract': _attr('abstract'),
+                'page_start': _attr('page_start'),
+                'page_end': _attr('page_end'),
+                'pdf_url': _file_url('download_article_pdf', 'pdf_file'),
+                'pdf_size': _attr('pdf_size'),
+                'pdf_sha256': _attr('pdf_sha256'),
+                'url': (('id',), lambda obj, request: _absolute(request, obj.get_absolute_url())),
+                'api_url': _api_url('api_article'),
+            },
+            default_fields=('id', 'issue', 'title', 'authors', 'rubric', 'page_start', 'page_end', 'pdf_url', 'url'),
+            ordering=['pk'],
+            filters={'issue': 'issue_id'},
+            visible={'is_published': True},
+        ),
+        ApiResource(
+            name='editorial-board',
+            model=EditorialBoard,
+            fields={
+                'id': _attr('id'),
+                'name': _attr('name'),
+                'position': _attr('position'),
+                'institution': _attr('institution'),
+                'photo_url': (('photo',), lambda obj, request: _absolute(request, obj.photo.url if obj.photo else None)),
+                'order': _attr('order'),
+                'api_url': _api_url('api_editorial_member'),
+            },
+            default_fields=('id', 'name', 'position', 'institution', 'photo_url'),
+            ordering=['order', 'name', 'pk'],
+        ),
+        ApiResource(
+            name='archive-periods',
+            model=ArchiveYear,
+            fields={
+                'slug': _attr('slug'),
+                'start_year': _attr('start_year'),
+                'end_year': _attr('end_year'),
+                'url': (('slug',), lambda obj, request: _absolute(request, reverse('archive_range', args=[obj.slug]))),
+                'issues_url': (('start_year', 'end_year'), lambda obj, request: _absolute(
+                    request, f"{reverse('api_issues')}?year_from={obj.start_year}&year_to={obj.end_year}")),
+                'api_url': _api_url('api_archive_period', 'slug'),
+            },
+            default_fields=('slug', 'start_year', 'end_year', 'url', 'issues_url'),
+            ordering=['-end_year', 'pk'],
+            lookup='slug',
+            visible={'is_active': True},
+        ),
+    ]
+}
+
+
+def _selected_fields(request, resource):
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(resource.default_fields)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in resource.fields]
+    if unknown or not names:
+        raise ApiError(f"Неизвестные поля: {', '.join(unknown)}. Доступны: {', '.join(resource.fields)}")
+    return list(dict.fromkeys(names))
+
+
+def _columns(resource, names):
+    columns = {column for name in names for column in resource.fields[name][0]}
+    columns.update(name.lstrip('-') for name in resource.ordering)
+    columns.discard('pk')
+    for column in list(columns):
+        # ImageField при загрузке объекта читает поля размеров - иначе по запросу на строку
+        model_field = resource.model._meta.get_field(column)
+        columns.update(filter(None, [getattr(model_field, 'width_field', None),
+                                     getattr(model_field, 'height_field', None)]))
+    return sorted(columns)
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ApiError("limit должен быть целым числом")
+    if not 1 <= size <= MAX_PAGE_SIZE:
+        raise ApiError(f"limit должен быть от 1 до {MAX_PAGE_SIZE}")
+    return size
+
+
+def _filtered(request, resource, queryset):
+    for param, lookup in resource.filters.items():
+        if param in request.GET:
+            try:
+                queryset = queryset.filter(**{lookup: int(request.GET[param])})
+            except ValueError:
+                raise ApiError(f"{param} должен быть целым числом")
+    return queryset
+
+
+def _serialize(obj, names, resource, request):
+    return {name: resource.fields[name][1](obj, request) for name in names}
+
+
+def _dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _etag(*parts):
+    """ETag по содержимому: версия API, параметры и значения строк"""
+    digest = hashlib.sha256(API_VERSION.encode())
+    for part in parts:
+        digest.update(repr(part).encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def _error(message, status=400):
+    return JsonResponse({'error': message}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def _finish(request, response):
+    patch_cache_control(response, public=True, max_age=API_MAX_AGE)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def resource_list(request, resource):
+    """Список объектов ресурса по курсору"""
+    resource = RESOURCES[resource]
+    try:
+        names = _selected_fields(request, resource)
+        page_size = _page_size(request)
+        queryset = _filtered(request, resource, resource.get_queryset()).only(*_columns(resource, names))
+        # Строки страницы (не больше MAX_PAGE_SIZE + 1) читаются одним запросом - по ним же
+        # считается ETag, поэтому запись в базу не рассинхронизирует его с телом ответа
+        page = CursorPaginator(queryset, page_size, resource.ordering).page(request.GET.get(CURSOR_PARAM))
+    except ApiError as exc:
+        return _error(str(exc))
+    except InvalidCursor:
+        return _error("Некорректный курсор")
+
+    columns = [resource.model._meta.get_field(column) for column in _columns(resource, names)]
+    digest = hashlib.sha256()
+    for obj in page:
+        digest.update(repr([column.value_to_string(obj) for column in columns]).encode())
+    digest.update(repr((page.has_next(), page.has_previous())).encode())
+    # Адреса в ответе абсолютные - хост тоже входит в ETag
+    etag = _etag(request.get_host(), request.get_full_path(), digest.hexdigest())
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return _finish(request, not_modified)
+
+    def stream():
+        yield '{"results": ['
+        for index, obj in enumerate(page):
+            yield (',' if index else '') + _dumps(_serialize(obj, names, resource, request))
+        yield '], ' + _dumps({'next': page.next_cursor, 'previous': page.previous_cursor})[1:]
+
+    response = StreamingHttpResponse(
+        (chunk.encode('utf-8') for chunk in stream()), content_type='application/json; charset=utf-8'
+    )
+    response['ETag'] = etag
+    return _finish(request, response)
+
+
+def resource_detail(request, resource, lookup):
+    """Один объект ресурса"""
+    resource = RESOURCES[resource]
+    try:
+        names = _selected_fields(request, resource)
+    except ApiError as exc:
+        return _error(str(exc))
+    obj = resource.get_queryset().only(*_columns(resource, names)).filter(**{resource.lookup: lookup}).first()
+    if obj is None:
+        return _error("Объект не найден", status=404)
+
+    body = _dumps(_serialize(obj, names, resource, request))
+    etag = _etag(body)
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return _finish(request, not_modified)
+    response = HttpResponse(body, content_type='application/json; charset=utf-8')
+    response['ETag'] = etag
+    return _finish(request, response)
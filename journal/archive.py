@@ -0,0 +1,125 @@
+"""
+Данные страниц архива по диапазонам лет (archive_range_view).
+
+Для каждого активного ArchiveYear в кэше хранится готовая структура
+страницы: выпуски, сгруппированные по годам, и список лет для кнопок.
+При сохранении или удалении выпуска (см. signals.py) обновляются только
+записи тех периодов, в которые он попадает; при изменении самих периодов
+сбрасывается список периодов и данные измененного периода.
+
+Адреса с неизвестным или слишком широким диапазоном отклоняются до
+обращения к выпускам в БД.
+
+Обновление и сброс видят только процессы с тем же кэшем. С LocMemCache
+(у каждого воркера свой) остальные воркеры получают изменения, когда истечет
+срок записи - JOURNAL_ARCHIVE_CACHE_TIMEOUT секунд; с общим кэшем (Redis,
+Memcached, FileBasedCache) - сразу, и срок можно увеличить.
+"""
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+from .models import ArchiveYear, JournalIssue
+
+PERIODS_KEY = 'archive-range:periods'
+RANGE_KEY = 'archive-range:data:{slug}:{start}-{end}'
+# Самый широкий допустимый диапазон, лет
+MAX_ARCHIVE_SPAN = 50
+
+# Срок записей по умолчанию, секунды (см. описание модуля)
+CACHE_TIMEOUT = 5 * 60
+
+_RANGE_RE = re.compile(r'^(\d{4})-(\d{4})$')
+
+
+def parse_range(slug):
+    """'2020-2025' -> (2020, 2025); None, если формат неверный или диапазон слишком широкий"""
+    match = _RANGE_RE.match(slug)
+    if not match:
+        return None
+    start_year, end_year = int(match.group(1)), int(match.group(2))
+    if start_year > end_year or end_year - start_year >= MAX_ARCHIVE_SPAN:
+        return None
+    return start_year, end_year
+
+
+def _timeout():
+    return getattr(settings, 'JOURNAL_ARCHIVE_CACHE_TIMEOUT', CACHE_TIMEOUT)
+
+
+def get_periods():
+    """{slug: (start_year, end_year)} активных архивных периодов"""
+    periods = cache.get(PERIODS_KEY)
+    metrics.cache_lookup('archive_periods', 'miss' if periods is None else 'hit')
+    if periods is None:
+        periods = {
+            slug: (start_year, end_year)
+            for slug, start_year, end_year in ArchiveYear.objects.filter(is_active=True)
+            .values_list('slug', 'start_year', 'end_year')
+        }
+        cache.set(PERIODS_KEY, periods, _timeout())
+    return periods
+
+
+def _group(issues):
+    issues_by_year = {}
+    # Тот же порядок, что и JournalIssue.Meta.ordering
+    for issue in sorted(issues, key=lambda issue: (issue.year, issue.number_sort, issue.number), reverse=True):
+        issues_by_year.setdefault(issue.year, []).append(issue)
+    return list(issues_by_year.items())
+
+
+def build_range(start_year, end_year):
+    """Структура страницы периода: выпуски по годам и список лет (от конца к началу)"""
+    issues = JournalIssue.objects.filter(year__gte=start_year, year__lte=end_year)
+    return {
+        'issues_by_year': _group(issues),
+        'years_list': list(range(end_year, start_year - 1, -1)),
+    }
+
+
+def get_range(slug):
+    """Данные страницы периода из кэша; None для неизвестного или недопустимого периода"""
+    bounds = parse_range(slug)
+    if bounds is None:
+        return None
+    periods = get_periods()
+    if periods.get(slug) != bounds:
+        return None
+    key = RANGE_KEY.format(slug=slug, start=bounds[0], end=bounds[1])
+    data = cache.get(key)
+    metrics.cache_lookup('archive_range', 'miss' if data is None else 'hit')
+    if data is None:
+        data = build_range(*bounds)
+        cache.set(key, data, _timeout())
+    return data
+
+
+def update_issue(issue_id):
+    """Обновляет закэшированные периоды, в которые выпуск входит или входил (после сохранения или удаления)"""
+    issue = JournalIssue.objects.filter(pk=issue_id).first()
+    for slug, (start_year, end_year) in get_periods().items():
+        key = RANGE_KEY.format(slug=slug, start=start_year, end=end_year)
+        data = cache.get(key)
+        if data is None:
+            continue
+        cached = [i for _, group in data['issues_by_year'] for i in group]
+        issues = [i for i in cached if i.pk != issue_id]
+        belongs = issue is not None and start_year <= issue.year <= end_year
+        # Выпуск не входил в период и не входит - запись не трогаем
+        if not belongs and len(issues) == len(cached):
+            continue
+        if belongs:
+            issues.append(issue)
+        data['issues_by_year'] = _group(issues)
+        cache.set(key, data, _timeout())
+
+
+def invalidate_period(archive_year):
+    """Сбрасывает список периодов и данные измененного периода"""
+    cache.delete_many([
+        PERIODS_KEY,
+        RANGE_KEY.format(slug=archive_year.slug, start=archive_year.start_year, end=archive_year.end_year),
+    ])
@@ -0,0 +1,312 @@
+"""
+Массовый импорт архивных выпусков: `python manage.py import_archive manifest.json`.
+
+Манифест - JSON (список выпусков со вложенным списком articles) или CSV
+(строка на статью, поля выпуска повторяются; строка без title - выпуск
+без статей). Пути к PDF и обложкам - относительно каталога с файлами:
+
+    [{"year": 1957, "volume": "1", "number": "2", "publication_date": "1957-06-01",
+      "pdf": "1957/2/full.pdf", "cover": "1957/2/cover.jpg", "full_pdf_first_page": 1,
+      "articles": [{"title": "...", "authors": "...", "rubric": "", "abstract": "",
+                    "page_start": 3, "page_end": 12, "pdf": "1957/2/p3.pdf"}]}]
+
+Выпуски и статьи создаются через bulk_create пачками по batch_size
+выпусков, каждая пачка - в своей транзакции. Хэши, размеры файлов и
+размеры обложек считаются в пуле процессов, пока основной процесс
+копирует файлы и пишет в БД. Импорт идемпотентен: выпуск узнается по
+(год, том, номер), статья - по (выпуск, первая страница, название), и
+уже существующие пропускаются, поэтому после сбоя команду достаточно
+запустить заново. Файл, скопированный до сбоя, переиспользуется, если
+его содержимое совпадает.
+
+bulk_create не вызывает save() и сигналы: number_sort и отпечатки
+файлов заполняются здесь, индекс поиска и кэши обновляются в конце.
+Варианты обложек и текст PDF - командами generate_image_derivatives
+и extract_pdf_text.
+"""
+import csv
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.core.files import File
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from PIL import Image
+
+from . import archive, page_cache, search, sitemaps
+from .files import CHUNK_SIZE, file_sha256
+from .models import ArchiveYear, Article, JournalIssue, issue_number_key
+
+ISSUE_FIELDS = ('year', 'volume', 'number', 'publication_date', 'pdf', 'cover', 'full_pdf_first_page')
+
+
+class ManifestError(ValueError):
+    """Манифест не читается или в нем нет обязательных полей"""
+
+
+# --- Манифест ---
+
+def _int(value, name, default=None):
+    if value in (None, ''):
+        if default is None:
+            raise ManifestError(f"Не заполнено поле {name}")
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ManifestError(f"Поле {name} должно быть целым числом: {value!r}")
+
+
+def _issue_entry(data):
+    entry = {
+        'year': _int(data.get('year'), 'year'),
+        'volume': str(data.get('volume') or '').strip(),
+        'number': str(data.get('number') or '').strip(),
+        'publication_date': None,
+        'pdf': data.get('pdf') or '',
+        'cover': data.get('cover') or '',
+        'full_pdf_first_page': _int(data.get('full_pdf_first_page'), 'full_pdf_first_page', default=1),
+        'articles': [],
+    }
+    if not entry['number']:
+        raise ManifestError(f"У выпуска {entry['year']} не заполнен number")
+    if data.get('publication_date'):
+        entry['publication_date'] = parse_date(str(data['publication_date']))
+        if entry['publication_date'] is None:
+            raise ManifestError(f"Некорректная дата выхода: {data['publication_date']!r}")
+    return entry
+
+
+def _article_entry(data):
+    if not (data.get('title') or '').strip():
+        raise ManifestError("У статьи не заполнен title")
+    return {
+        'title': data['title'].strip(),
+        'authors': (data.get('authors') or '').strip(),
+        'rubric': (data.get('rubric') or '').strip(),
+        'abstract': (data.get('abstract') or '').strip(),
+        'page_start': _int(data.get('page_start'), 'page_start', default=0),
+        'page_end': _int(data.get('page_end'), 'page_end', default=0),
+        'pdf': data.get('pdf') or '',
+    }
+
+
+def issue_key(year, volume, number):
+    return int(year), str(volume), str(number)
+
+
+def read_manifest(path):
+    """Список выпусков манифеста (JSON или CSV) со статьями в entry['articles']"""
+    path = Path(path)
+    try:
+        if path.suffix.lower() == '.csv':
+            with open(path, newline='', encoding='utf-8-sig') as fh:
+                rows = list(csv.DictReader(fh))
+            issues = {}
+            for row in rows:
+                entry = _issue_entry({name: row.get(name) for name in ISSUE_FIELDS})
+                # Для CSV pdf выпуска - в колонке issue_pdf, pdf - файл статьи
+                entry['pdf'] = row.get('issue_pdf') or ''
+                key = issue_key(entry['year'], entry['volume'], entry['number'])
+                entry = issues.setdefault(key, entry)
+                if (row.get('title') or '').strip():
+                    entry['articles'].append(_article_entry(row))
+            return list(issues.values())
+
+        with open(path, encoding='utf-8') as fh:
+            data = json.load(fh)
+    except (OSError, UnicodeDecodeError, ValueError, csv.Error) as exc:
+        if isinstance(exc, ManifestError):
+            raise
+        raise ManifestError(f"Не удалось прочитать манифест {path}: {exc}")
+    if not isinstance(data, list):
+        raise ManifestError("Манифест JSON должен быть списком выпусков")
+    issues = []
+    for item in data:
+        entry = _issue_entry(item)
+        entry['articles'] = [_article_entry(article) for article in item.get('articles') or []]
+        issues.append(entry)
+    return issues
+
+
+# --- Файлы (в процессах-воркерах) ---
+
+def inspect_file(path, is_image=False):
+    """(sha256, размер, ширина, высота) файла; размеры - только для картинок"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    width = height = None
+    if is_image:
+        with Image.open(path) as image:
+            width, height = image.size
+    return digest.hexdigest(), size, width, height
+
+
+def _store(instance, field_name, source, info):
+    """
+    Копирует файл в хранилище по upload_to поля; возвращает (имя, mtime).
+    Файл с тем же именем и содержимым (остался от прерванного запуска) не копируется.
+    """
+    field = instance._meta.get_field(field_name)
+    storage = field.storage
+    name = field.generate_filename(instance, source.name)
+    sha256, size = info[0], info[1]
+    if not (storage.exists(name) and storage.size(name) == size and file_sha256(storage, name) == sha256):
+        with open(source, 'rb') as fh:
+            name = storage.save(name, File(fh, name=source.name))
+    try:
+        mtime = storage.get_modified_time(name)
+    except NotImplementedError:
+        mtime = None
+    return name, mtime
+
+
+# --- Импорт ---
+
+def _plan(entries, source_dir):
+    """
+    Что создавать: [(entry, id существующего выпуска или None, [новые статьи])]
+    и список ошибок. Уже импортированные выпуски без новых статей в план не попадают.
+    """
+    existing_issues = {
+        issue_key(year, volume, number): pk
+        for pk, year, volume, number in JournalIssue.objects.values_list('pk', 'year', 'volume', 'number')
+    }
+    existing_articles = set(Article.objects.values_list('issue_id', 'page_start', 'title'))
+
+    plan, errors, seen = [], [], set()
+    for entry in entries:
+        key = issue_key(entry['year'], entry['volume'], entry['number'])
+        if key in seen:
+            errors.append(f"Выпуск {key} повторяется в манифесте")
+            continue
+        seen.add(key)
+        issue_id = existing_issues.get(key)
+        articles, article_keys = [], set()
+        for article in entry['articles']:
+            article_key = (article['page_start'], article['title'])
+            if article_key in article_keys or (issue_id, *article_key) in existing_articles:
+                continue
+            article_keys.add(article_key)
+            articles.append(article)
+        if issue_id is not None and not articles:
+            continue
+        files = ([entry['pdf'], entry['cover']] if issue_id is None else []) + [a['pdf'] for a in articles]
+        missing = [name for name in files if name and not (source_dir / name).is_file()]
+        if missing:
+            errors.append(f"Выпуск {key}: нет файлов {', '.join(missing)}")
+            continue
+        plan.append((entry, issue_id, articles))
+    return plan, errors
+
+
+def _plan_files(plan, source_dir):
+    """[(путь, картинка?)] файлов плана в порядке обработки"""
+    files = []
+    for entry, issue_id, articles in plan:
+        if issue_id is None:
+            files += [(source_dir / entry[name], name == 'cover') for name in ('pdf', 'cover') if entry[name]]
+        files += [(source_dir / article['pdf'], False) for article in articles if article['pdf']]
+    return files
+
+
+def _build_issue(entry, source_dir, info):
+    issue = JournalIssue(
+        year=entry['year'], volume=entry['volume'], number=entry['number'],
+        number_sort=issue_number_key(entry['number']), publication_date=entry['publication_date'],
+        full_pdf_first_page=entry['full_pdf_first_page'],
+    )
+    if entry['pdf']:
+        source = source_dir / entry['pdf']
+        issue.full_pdf.name, issue.full_pdf_mtime = _store(issue, 'full_pdf', source, info[source])
+        issue.full_pdf_sha256, issue.full_pdf_size = info[source][:2]
+    if entry['cover']:
+        source = source_dir / entry['cover']
+        issue.cover_sha256, issue.cover_size, issue.cover_width, issue.cover_height = info[source]
+        issue.cover.name, issue.cover_mtime = _store(issue, 'cover', source, info[source])
+    return issue
+
+
+def _build_article(issue, data, source_dir, info):
+    article = Article(
+        issue=issue, title=data['title'], authors=data['authors'], rubric=data['rubric'],
+        abstract=data['abstract'], page_start=data['page_start'], page_end=data['page_end'],
+    )
+    if data['pdf']:
+        source = source_dir / data['pdf']
+        article.pdf_file.name, article.pdf_mtime = _store(article, 'pdf_file', source, info[source])
+        article.pdf_sha256, article.pdf_size = info[source][:2]
+    return article
+
+
+def _import_batch(batch, source_dir, info):
+    """Одна пачка выпусков в одной транзакции; возвращает созданные статьи"""
+    with transaction.atomic():
+        new_issues = [_build_issue(entry, source_dir, info) for entry, issue_id, _ in batch if issue_id is None]
+        JournalIssue.objects.bulk_create(new_issues)
+        created = iter(new_issues)
+        existing = JournalIssue.objects.in_bulk([issue_id for _, issue_id, _ in batch if issue_id is not None])
+
+        articles = []
+        for entry, issue_id, article_entries in batch:
+            issue = next(created) if issue_id is None else existing[issue_id]
+            articles += [_build_article(issue, data, source_dir, info) for data in article_entries]
+        Article.objects.bulk_create(articles)
+    return len(new_issues), articles
+
+
+def _after_import(articles):
+    """То, что при обычном save() делают сигналы"""
+    search.index_articles(articles)
+    page_cache.invalidate_all()
+    for archive_year in ArchiveYear.objects.all():
+        archive.invalidate_period(archive_year)
+    sitemaps.mark_stale()
+
+
+def import_archive(manifest_path, source_dir=None, workers=None, batch_size=50, log=None):
+    """
+    Импортирует выпуски и статьи из манифеста. Возвращает словарь со счетчиками
+    issues/articles (создано), skipped (выпусков уже в БД) и списком errors.
+    """
+    entries = read_manifest(manifest_path)
+    source_dir = Path(source_dir or Path(manifest_path).parent)
+    plan, errors = _plan(entries, source_dir)
+    result = {'issues': 0, 'articles': 0, 'skipped': len(entries) - len(plan) - len(errors), 'errors': errors}
+    if not plan:
+        return result
+
+    files = _plan_files(plan, source_dir)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # Воркеры считают хэши наперед, пока основной процесс копирует и пишет пачки
+        # (по одному файлу на задачу: ошибка в пачке задач приписывалась бы первому файлу пачки)
+        hashed = pool.map(inspect_file, [path for path, _ in files], [is_image for _, is_image in files])
+        position = 0
+        for start in range(0, len(plan), batch_size):
+            batch = plan[start:start + batch_size]
+            count = len(_plan_files(batch, source_dir))
+            info = {}
+            for path, _ in files[position:position + count]:
+                try:
+                    info[path] = next(hashed)
+                except OSError as exc:
+                    # Уже импортированные пачки остаются в БД - после исправления файла запуск продолжится с этого места
+                    raise ManifestError(f"Не удалось прочитать {path}: {exc}")
+            position += count
+
+            issues_created, articles = _import_batch(batch, source_dir, info)
+            _after_import(articles)
+            result['issues'] += issues_created
+            result['articles'] += len(articles)
+            if log:
+                log(f"{start + len(batch)}/{len(plan)}: выпусков {result['issues']}, статей {result['articles']}")
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return result
@@ -0,0 +1,196 @@
+"""
+Отложенная запись сообщений обратной связи (write-behind).
+
+Представление contact не пишет в БД: проверенная форма кладется JSON-файлом
+в очередь (каталог QUEUE_DIR), а в ContactMessage сообщения переносятся
+пачками через bulk_create - одна короткая транзакция на BATCH_SIZE сообщений
+вместо транзакции на каждое. Так волна спама не держит блокировку записи
+SQLite и не останавливает чтение остального сайта.
+
+Пачка записывается, когда набралось BATCH_SIZE сообщений (в запросе, который
+ее дополнил), фоновым потоком раз в FLUSH_INTERVAL секунд и командой
+`python manage.py flush_contact_queue` (для cron). Очередь - файлы на диске,
+поэтому ее видят все процессы, а сообщения переживают перезапуск. Файлы
+перед записью переименовываются (захват), так что одно сообщение не попадет
+в БД дважды из разных процессов. Если процесс упадет между записью пачки и
+удалением ее файлов, через CLAIM_TIMEOUT пачка будет записана снова - дубли
+отсекает уникальный ContactMessage.queue_key (имя файла). Больше MAX_PENDING
+сообщений очередь не принимает.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ContactMessage
+
+QUEUE_SUFFIX = '.json'
+CLAIM_SUFFIX = '.claim'
+# Захваченные файлы процесса, упавшего посреди записи, возвращаются в очередь через
+CLAIM_TIMEOUT = 10 * 60
+
+logger = logging.getLogger(__name__)
+
+_flusher_lock = threading.Lock()
+_flusher = None
+
+
+class QueueFull(Exception):
+    """В очереди уже MAX_PENDING сообщений"""
+
+
+def _config(name, default):
+    return getattr(settings, 'JOURNAL_CONTACT', {}).get(name, default)
+
+
+def queue_dir():
+    return Path(_config('QUEUE_DIR', Path(settings.BASE_DIR) / 'contact-queue'))
+
+
+def _batch_size():
+    return max(int(_config('BATCH_SIZE', 50)), 1)
+
+
+def _pending(root):
+    try:
+        return sorted(entry.name for entry in os.scandir(root) if entry.name.endswith(QUEUE_SUFFIX))
+    except FileNotFoundError:
+        return []
+
+
+def pending_count():
+    return len(_pending(queue_dir()))
+
+
+def claimed_count():
+    """Сообщения, захваченные процессами для записи (в том числе упавшими)"""
+    try:
+        return sum(1 for entry in os.scandir(queue_dir()) if entry.name.endswith(CLAIM_SUFFIX))
+    except FileNotFoundError:
+        return 0
+
+
+def enqueue(data):
+    """
+    Кладет сообщение (cleaned_data формы) в очередь.
+    Если набралась пачка - сразу переносит очередь в БД.
+    """
+    root = queue_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    pending = len(_pending(root))
+    if pending >= int(_config('MAX_PENDING', 5000)):
+        raise QueueFull
+    record = {**data, 'created_at': timezone.now().isoformat()}
+    # Имя начинается со времени - в БД сообщения попадают в порядке отправки
+    name = f'{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+    temp = root / f'.{name}.tmp'
+    temp.write_text(json.dumps(record, ensure_ascii=False), encoding='utf-8')
+    os.replace(temp, root / f'{name}{QUEUE_SUFFIX}')
+
+    if pending + 1 >= _batch_size():
+        try:
+            flush()
+        except DatabaseError:
+            # Сообщение уже в очереди - запишет следующая попытка
+            logger.exception("Не удалось записать очередь сообщений")
+    else:
+        _start_flusher()
+
+
+def _claim(root, names):
+    """Переименовывает файлы в захваченные этим процессом; чужие пропускает"""
+    claimed = []
+    for name in names:
+        path = root / f'{name}.{os.getpid()}{CLAIM_SUFFIX}'
+        try:
+            os.rename(root / name, path)
+        except FileNotFoundError:
+            continue
+        os.utime(path)
+        claimed.append(path)
+    return claimed
+
+
+def _release(paths):
+    for path in paths:
+        os.rename(path, path.with_name(path.name.rsplit('.', 2)[0]))
+
+
+def _release_stale_claims(root):
+    deadline = time.time() - CLAIM_TIMEOUT
+    stale = [Path(entry.path) for entry in os.scandir(root)
+             if entry.name.endswith(CLAIM_SUFFIX) and entry.stat().st_mtime < deadline]
+    _release(stale)
+
+
+def _message(path):
+    record = json.loads(path.read_text(encoding='utf-8'))
+    created_at = parse_datetime(record.pop('created_at', '') or '') or timezone.now()
+    fields = {field.name for field in ContactMessage._meta.concrete_fields} - {'queue_key'}
+    # Ключ - имя файла без суффиксов захвата: одинаков при каждой попытке записи
+    queue_key = path.name.split('.', 1)[0]
+    return ContactMessage(created_at=created_at, queue_key=queue_key,
+                          **{k: v for k, v in record.items() if k in fields})
+
+
+def flush():
+    """Переносит очередь в БД пачками по BATCH_SIZE; возвращает число записанных сообщений"""
+    root = queue_dir()
+    if not root.is_dir():
+        return 0
+    _release_stale_claims(root)
+    names, batch_size = _pending(root), _batch_size()
+    written = 0
+    for start in range(0, len(names), batch_size):
+        claimed = _claim(root, names[start:start + batch_size])
+        messages, broken = [], []
+        for path in claimed:
+            try:
+                messages.append(_message(path))
+            except (ValueError, TypeError):
+                broken.append(path)
+        for path in broken:
+            logger.error("Поврежденный файл в очереди сообщений: %s", path)
+            os.rename(path, path.with_suffix('.broken'))
+        try:
+            ContactMessage.objects.bulk_create(messages, ignore_conflicts=True)
+        except DatabaseError:
+            _release([path for path in claimed if path not in broken])
+            raise
+        for path in claimed:
+            path.unlink(missing_ok=True)
+        written += len(messages)
+    return written
+
+
+def _flush_periodically(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Не удалось записать очередь сообщений")
+        finally:
+            connections.close_all()
+
+
+def _start_flusher():
+    """Фоновый поток записи - один на процесс, запускается с первым сообщением"""
+    global _flusher
+    interval = _config('FLUSH_INTERVAL', 5)
+    if not interval or _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_flush_periodically, args=(interval,), name='contact-queue-flush', daemon=True,
+            )
+            _flusher.start()
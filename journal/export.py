@@ -0,0 +1,287 @@
+"""
+Экспорт публичной части сайта в статические HTML-файлы (для CDN/статического хостинга).
+
+Каждая страница описывается ExportPage: адрес в Django, путь в каталоге
+экспорта и отпечаток исходных данных (строки моделей, от которых она
+зависит, плюс шаблоны). Манифест с отпечатками лежит в каталоге экспорта,
+поэтому повторный запуск перерисовывает только изменившиеся страницы и
+удаляет страницы исчезнувших объектов.
+
+В HTML ссылки на PDF/обложки (которые в Django отдают view) заменяются
+прямыми ссылками на файлы в media/, ?cursor=... - на /page/N/, а формы и поиск
+при необходимости направляются на живой Django (--dynamic-url).
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from .models import ArchiveYear, Article, EditorialBoard, JournalInfo, JournalIssue
+from .pagination import CURSOR_PARAM, CursorPaginator
+
+MANIFEST_NAME = '.export-manifest.json'
+
+# Страницы без параметров, которые экспортируются как есть
+STATIC_ROUTES = [
+    'home', 'archive', 'editorial_board', 'editorial_staff', 'history', 'journal_info', 'sections',
+    'focus_and_scope', 'peer_reviewing', 'ethics', 'copyright', 'conflict_of_interests', 'open_access',
+    'privacy_policy', 'fees', 'guidelines', 'text_design', 'references', 'articles',
+]
+# Адреса, которые остаются за живым Django (формы, поиск, админка)
+DYNAMIC_PREFIXES = ('/contact/', '/search/', '/api/', '/admin/')
+
+
+@dataclass
+class ExportPage:
+    url: str
+    path: str
+    signature: str
+    links: dict = field(default_factory=dict)
+
+
+def _rows_signature(*querysets):
+    """Отпечаток содержимого строк моделей"""
+    digest = hashlib.sha256()
+    for queryset in querysets:
+        for row in queryset.order_by('pk').values_list():
+            digest.update(repr(row).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def templates_signature():
+    """Отпечаток шаблонов: их изменение перерисовывает все страницы"""
+    digest = hashlib.sha256()
+    for directory in (d for config in settings.TEMPLATES for d in config.get('DIRS', [])):
+        for path in sorted(Path(directory).rglob('*.html')):
+            digest.update(path.as_posix().encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _output_path(url):
+    return url.strip('/') + '/index.html' if url.strip('/') else 'index.html'
+
+
+def _page(url, *signatures):
+    digest = hashlib.sha256('|'.join(signatures).encode()).hexdigest()
+    return ExportPage(url=url, path=_output_path(url), signature=digest)
+
+
+def _cursor_pages(view_class, url, *signatures):
+    """
+    Страницы списка с курсорной навигацией. Ссылки ?cursor=... на соседние
+    страницы записываются в ExportPage.links, чтобы заменить их на page/N/.
+    """
+    paginator = CursorPaginator(view_class().get_queryset(), view_class.paginate_by, view_class.cursor_ordering)
+    pages = []
+    cursor, number = None, 1
+    while True:
+        page = paginator.page(cursor)
+        export_page = _page(f'{url}?{CURSOR_PARAM}={cursor}' if cursor else url, *signatures)
+        path = url if number == 1 else f'{url}page/{number}/'
+        export_page.path = _output_path(path)
+        pages.append(export_page)
+        if page.has_previous():
+            export_page.links[f'{url}?{CURSOR_PARAM}={page.previous_cursor}'] = (
+                url if number == 2 else f'{url}page/{number - 1}/'
+            )
+        if not page.has_next():
+            return pages
+        cursor, number = page.next_cursor, number + 1
+        export_page.links[f'{url}?{CURSOR_PARAM}={cursor}'] = f'{url}page/{number}/'
+
+
+def collect_pages():
+    """Все экспортируемые страницы с отпечатками их исходных данных"""
+    base = templates_signature()
+    issues = JournalIssue.objects.all()
+    published = Article.objects.filter(is_published=True)
+    catalogue = _rows_signature(issues, published)
+
+    # Страницы, которые читают данные из БД; остальные зависят только от шаблонов
+    data = {
+        'editorial_board': _rows_signature(EditorialBoard.objects.all()),
+        'journal_info': _rows_signature(JournalInfo.objects.all()),
+        'archive': _rows_signature(ArchiveYear.objects.all()),
+        'articles': catalogue,
+    }
+    pages = [_page(reverse(name), base, data.get(name, '')) for name in STATIC_ROUTES]
+
+    # Список выпусков с постраничной навигацией: /issues/, /issues/page/2/, ...
+    from .views import IssueListView
+    pages += _cursor_pages(IssueListView, reverse('issues'), base, catalogue)
+
+    article_rows = list(published.order_by('pk').values())
+    issue_rows = {row['id']: row for row in issues.values()}
+    articles_by_issue = {}
+    for row in article_rows:
+        articles_by_issue.setdefault(row['issue_id'], []).append(row)
+
+    for issue_id, row in sorted(issue_rows.items()):
+        pages.append(_page(reverse('issue_detail', args=[issue_id]), base,
+                           repr((row, articles_by_issue.get(issue_id, [])))))
+
+    for row in article_rows:
+        pages.append(_page(reverse('article_detail', args=[row['id']]), base,
+                           repr((row, issue_rows.get(row['issue_id'])))))
+
+    for archive_year in ArchiveYear.objects.filter(is_active=True):
+        in_range = issues.filter(year__gte=archive_year.start_year, year__lte=archive_year.end_year)
+        pages.append(_page(reverse('archive_range', args=[archive_year.slug]), base,
+                           repr(archive_year.pk), _rows_signature(in_range)))
+    return pages
+
+
+def file_url_map():
+    """Адреса view, отдающих файлы -> прямые адреса файлов в media/"""
+    mapping = {}
+    for article in Article.objects.filter(is_published=True).exclude(pdf_file='').only('pk', 'pdf_file'):
+        for name in ('download_article_pdf', 'read_article_pdf'):
+            mapping[reverse(name, args=[article.pk])] = article.pdf_file.url
+    for issue in JournalIssue.objects.only('pk', 'cover', 'full_pdf', 'cover_sha256'):
+        if issue.full_pdf:
+            for name in ('download_issue_pdf', 'read_issue_pdf'):
+                mapping[reverse(name, args=[issue.pk])] = issue.full_pdf.url
+        if issue.cover:
+            mapping[issue.cover_url] = issue.cover.url
+            mapping[reverse('issue_cover', args=[issue.pk])] = issue.cover.url
+    return mapping
+
+
+_ATTR_RE = re.compile(r'(?P<attr>\b(?:href|src|action)=")(?P<url>[^"]*)"')
+_SRCSET_RE = re.compile(r'\bsrcset="[^"]*"')
+
+
+def rewrite_html(html, page_url, url_map, static_url=None, media_url=None, dynamic_url=None):
+    """Переписывает ссылки страницы под статический хостинг"""
+    static_prefix = '/' + settings.STATIC_URL.lstrip('/')
+    media_prefix = '/' + settings.MEDIA_URL.lstrip('/')
+
+    def rewrite(url):
+        key = url.replace('&amp;', '&')
+        if key.startswith('?'):
+            # Ссылка на другую страницу того же списка
+            key = page_url.split('?')[0] + key
+        url = url_map.get(key, url)
+        if static_url and url.startswith(static_prefix):
+            return static_url.rstrip('/') + '/' + url[len(static_prefix):]
+        if media_url and url.startswith(media_prefix):
+            return media_url.rstrip('/') + '/' + url[len(media_prefix):]
+        if dynamic_url and url.startswith(DYNAMIC_PREFIXES):
+            return dynamic_url.rstrip('/') + url
+        return url
+
+    html = _ATTR_RE.sub(lambda m: f'{m.group("attr")}{rewrite(m.group("url"))}"', html)
+    return _SRCSET_RE.sub(
+        lambda m: 'srcset="' + ', '.join(
+            ' '.join([rewrite(part.strip().split(' ')[0])] + part.strip().split(' ')[1:])
+            for part in m.group(0)[len('srcset="'):-1].split(',')
+        ) + '"',
+        html,
+    )
+
+
+def copy_if_changed(source, target):
+    """Копирует файл, если размер или время изменения отличаются; возвращает True при копировании"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.exists():
+        src_stat, dst_stat = source.stat(), target.stat()
+        if src_stat.st_size == dst_stat.st_size and int(src_stat.st_mtime) <= int(dst_stat.st_mtime):
+            return False
+    shutil.copy2(source, target)
+    return True
+
+
+def copy_assets(output_dir):
+    """Копирует статику (через finders) и media в каталог экспорта"""
+    copied = 0
+    static_root = output_dir / settings.STATIC_URL.strip('/')
+    for finder in finders.get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            copied += copy_if_changed(Path(storage.path(path)), static_root / path)
+    media_root = Path(settings.MEDIA_ROOT)
+    if media_root.exists():
+        for source in media_root.rglob('*'):
+            if source.is_file():
+                copied += copy_if_changed(source, output_dir / settings.MEDIA_URL.strip('/') / source.relative_to(media_root))
+    return copied
+
+
+def export_site(output_dir, workers=4, force=False, static_url=None, media_url=None,
+                dynamic_url=None, host='localhost', log=None):
+    """
+    Экспортирует сайт в output_dir. Возвращает словарь со счетчиками
+    rendered/skipped/removed/assets и списком failed - ошибок страниц, которые не
+    удалось отрендерить. Такие страницы не попадают в манифест и перерисуются при
+    следующем запуске; остальные записываются как обычно.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest = {} if force or not manifest_path.exists() else json.loads(manifest_path.read_text())
+
+    pages = collect_pages()
+    todo = [page for page in pages if manifest.get(page.path) != page.signature]
+    url_map = file_url_map()
+    failed = []
+
+    def render(page):
+        """(страница, текст ошибки или None)"""
+        try:
+            return page, render_page(page)
+        except Exception as exc:
+            return page, f'{page.url}: {exc}'
+
+    def render_page(page):
+        client = Client(SERVER_NAME=host)
+        response = client.get(page.url)
+        if response.status_code != 200:
+            return f'{page.url}: HTTP {response.status_code}'
+        html = rewrite_html(response.content.decode('utf-8'), page.url, {**url_map, **page.links},
+                            static_url=static_url, media_url=media_url, dynamic_url=dynamic_url)
+        target = output_dir / page.path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(html, encoding='utf-8')
+        if log:
+            log(page.url)
+        return None
+
+    # Рендерим напрямую, без полностраничного кэша
+    with override_settings(JOURNAL_PAGE_CACHE={'ENABLED': False}, ALLOWED_HOSTS=[host]):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for page, error in pool.map(render, todo):
+                if error is None:
+                    manifest[page.path] = page.signature
+                else:
+                    failed.append(error)
+                    manifest.pop(page.path, None)
+
+    # Страницы удаленных объектов
+    current = {page.path for page in pages}
+    removed = 0
+    for path in sorted(set(manifest) - current):
+        target = output_dir / path
+        if target.exists():
+            target.unlink()
+            try:
+                os.removedirs(target.parent)
+            except OSError:
+                pass
+        del manifest[path]
+        removed += 1
+
+    assets = copy_assets(output_dir)
+    manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return {
+        'rendered': len(todo) - len(failed), 'skipped': len(pages) - len(todo), 'removed': removed,
+        'assets': assets, 'failed': failed,
+    }
@@ -0,0 +1,375 @@
+"""
+Отдача PDF-файлов журнала с поддержкой HTTP Range (206 Partial Content).
+
+Браузерные просмотрщики PDF запрашивают файл частями, а менеджеры загрузок
+докачивают оборванные передачи - поэтому вместо простого FileResponse
+используем serve_file(), который понимает Range, multipart/byteranges и If-Range.
+
+Саму передачу байтов можно отдать фронт-прокси (nginx, Apache, lighttpd):
+бэкенд доставки выбирается настройкой JOURNAL_FILE_DELIVERY, например
+
+    JOURNAL_FILE_DELIVERY = {
+        'BACKEND': 'journal.files.NginxAccelDelivery',
+        'OPTIONS': {'location': '/protected-media/'},
+    }
+
+По умолчанию файл стримится из процесса Django (StreamingDelivery).
+Для async view есть aserve_file(): под ASGI файл читается кусками в пуле
+потоков и отдается асинхронным итератором, не занимая поток на всю передачу.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import secrets
+from functools import lru_cache
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from django.utils.module_loading import import_string
+
+CHUNK_SIZE = 64 * 1024
+# Больше диапазонов в одном запросе не обрабатываем - отдаем файл целиком
+MAX_RANGES = 16
+
+_RANGE_SPEC_RE = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+
+def parse_range_header(header, size):
+    """
+    Разбирает заголовок Range для файла размером size.
+
+    Возвращает отсортированный список пар (start, end) включительно,
+    None - если заголовок некорректен и его нужно проигнорировать,
+    [] - если ни один диапазон не попадает в файл (ответ 416).
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+
+    ranges = []
+    for spec in header[len('bytes='):].split(','):
+        match = _RANGE_SPEC_RE.match(spec)
+        if not match:
+            return None
+        first, last = match.groups()
+        if not first and not last:
+            return None
+
+        if first:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # "bytes=-500" - последние 500 байт
+            suffix = int(last)
+            if suffix == 0:
+                continue
+            start = max(size - suffix, 0)
+            end = size - 1
+        ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Склеиваем пересекающиеся и соседние диапазоны
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(request, etag=None, last_modified=None):
+    """Проверяет If-Range: при несовпадении Range игнорируется и отдается весь файл"""
+    value = request.META.get('HTTP_IF_RANGE')
+    if value is None:
+        return True
+    value = value.strip()
+    if value.startswith('W/'):
+        # Слабые ETag для If-Range не допускаются (RFC 9110, 13.1.5)
+        return False
+    if value.startswith('"'):
+        return etag is not None and value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and last_modified is not None and date == int(last_modified)
+
+
+def iter_file_range(storage, name, start, end, chunk_size=CHUNK_SIZE):
+    """Читает байты [start, end] файла из хранилища кусками"""
+    remaining = end - start + 1
+    with storage.open(name, 'rb') as fh:
+        fh.seek(start)
+        while remaining > 0:
+            chunk = fh.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def aiter_file_range(storage, name, start, end, chunk_size=CHUNK_SIZE):
+    """Асинхронный iter_file_range: открытие и чтение идут в пуле потоков, цикл событий свободен"""
+    remaining = end - start + 1
+    fh = await sync_to_async(storage.open, thread_sensitive=False)(name, 'rb')
+    try:
+        await sync_to_async(fh.seek, thread_sensitive=False)(start)
+        while remaining > 0:
+            chunk = await sync_to_async(fh.read, thread_sensitive=False)(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def file_sha256(storage, name, chunk_size=CHUNK_SIZE):
+    """sha256 содержимого файла из хранилища (hex)"""
+    digest = hashlib.sha256()
+    with storage.open(name, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_modified_time(field_file):
+    try:
+        return int(field_file.storage.get_modified_time(field_file.name).timestamp())
+    except (NotImplementedError, OSError):
+        return None
+
+
+class StreamingDelivery:
+    """Передача файла из процесса Django (режим по умолчанию)"""
+
+    def __init__(self, **options):
+        self.options = options
+
+    def serve(self, request, field_file, *, as_attachment, filename, etag, last_modified, asynchronous=False):
+        """
+        Без Range (или при несовпадении If-Range) возвращается обычный FileResponse,
+        для одного диапазона - 206 с Content-Range, для нескольких -
+        206 multipart/byteranges, для недостижимых диапазонов - 416.
+        asynchronous - тело ответа асинхронным итератором (для ASGI).
+        """
+        storage, name = field_file.storage, field_file.name
+        size = storage.size(name)
+        if last_modified is None:
+            last_modified = _file_modified_time(field_file)
+        content_type = _content_type(name)
+
+        ranges = None
+        if request.method in ('GET', 'HEAD') and if_range_matches(request, etag, last_modified):
+            ranges = parse_range_header(request.META.get('HTTP_RANGE'), size)
+
+        if ranges is None and asynchronous:
+            response = StreamingHttpResponse(aiter_file_range(storage, name, 0, size - 1), content_type=content_type)
+            response['Content-Length'] = str(size)
+        elif ranges is None:
+            response = FileResponse(
+                storage.open(name, 'rb'),
+                as_attachment=as_attachment,
+                filename=filename,
+                content_type=content_type,
+            )
+        elif not ranges:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            response = StreamingHttpResponse(
+                (aiter_file_range if asynchronous else iter_file_range)(storage, name, start, end),
+                status=206,
+                content_type=content_type,
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = _multipart_response(storage, name, ranges, size, content_type, asynchronous)
+
+        if response.status_code != 416:
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        response['Accept-Ranges'] = 'bytes'
+        _set_validators(response, last_modified, etag)
+        return response
+
+
+class ProxyDelivery(StreamingDelivery):
+    """
+    Базовый класс для передачи файла фронт-прокси.
+
+    Django отвечает пустым телом с заголовками (тип, имя файла, валидаторы)
+    и служебным заголовком, по которому прокси сам отдает файл с диска,
+    включая обработку Range. Если у хранилища нет локального пути,
+    используется потоковая отдача из Django.
+    """
+
+    def serve(self, request, field_file, *, as_attachment, filename, etag, last_modified, asynchronous=False):
+        storage, name = field_file.storage, field_file.name
+        try:
+            path = storage.path(name)
+        except NotImplementedError:
+            return super().serve(
+                request, field_file, as_attachment=as_attachment, filename=filename,
+                etag=etag, last_modified=last_modified, asynchronous=asynchronous,
+            )
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+
+        response = HttpResponse(content_type=_content_type(name))
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        response[self.header] = self.redirect_target(path, name)
+        if last_modified is None:
+            last_modified = _file_modified_time(field_file)
+        _set_validators(response, last_modified, etag)
+        return response
+
+    def redirect_target(self, path, name):
+        raise NotImplementedError
+
+
+class NginxAccelDelivery(ProxyDelivery):
+    """
+    nginx: X-Accel-Redirect на internal-location, смотрящий в MEDIA_ROOT.
+
+        location /protected-media/ {
+            internal;
+            alias /srv/gia/media/;
+        }
+    """
+    header = 'X-Accel-Redirect'
+
+    def redirect_target(self, path, name):
+        location = self.options.get('location', '/protected-media/')
+        return location.rstrip('/') + '/' + quote(name.replace(os.sep, '/'))
+
+
+class SendfileDelivery(ProxyDelivery):
+    """Apache (mod_xsendfile) и lighttpd: абсолютный путь в заголовке X-Sendfile"""
+
+    @property
+    def header(self):
+        return self.options.get('header', 'X-Sendfile')
+
+    def redirect_target(self, path, name):
+        return path
+
+
+@lru_cache(maxsize=None)
+def get_delivery_backend():
+    """Бэкенд доставки файлов из настройки JOURNAL_FILE_DELIVERY"""
+    config = getattr(settings, 'JOURNAL_FILE_DELIVERY', {})
+    backend_class = import_string(config.get('BACKEND', 'journal.files.StreamingDelivery'))
+    return backend_class(**config.get('OPTIONS', {}))
+
+
+@receiver(setting_changed)
+def _reset_delivery_backend(*, setting, **kwargs):
+    if setting == 'JOURNAL_FILE_DELIVERY':
+        get_delivery_backend.cache_clear()
+
+
+def serve_file(request, field_file, *, as_attachment=False, filename=None,
+               etag=None, last_modified=None, max_age=None, asynchronous=False):
+    """
+    Отдает файл из FileField через настроенный бэкенд доставки.
+
+    etag и last_modified (timestamp) берутся из сохраненного отпечатка файла:
+    по ним на If-None-Match / If-Modified-Since отвечаем 304, не трогая диск.
+    max_age - время кэширования в секундах (по умолчанию JOURNAL_FILE_CACHE_MAX_AGE).
+    Если файла нет в хранилище, поднимается FileNotFoundError.
+    asynchronous - отдавать тело асинхронным итератором (см. aserve_file).
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'JOURNAL_FILE_CACHE_MAX_AGE', 0)
+    if last_modified is not None:
+        last_modified = int(last_modified)
+
+    if etag or last_modified is not None:
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            _set_validators(response, last_modified, etag)
+            patch_cache_control(response, public=True, max_age=max_age)
+            return response
+
+    filename = filename or os.path.basename(field_file.name)
+    # Бэкенды без параметра asynchronous (свои, из настроек) работают как раньше под WSGI
+    backend_options = {'asynchronous': True} if asynchronous else {}
+    response = get_delivery_backend().serve(
+        request, field_file, as_attachment=as_attachment, filename=filename,
+        etag=etag, last_modified=last_modified, **backend_options,
+    )
+    if response.status_code in (200, 206):
+        patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+async def aserve_file(request, field_file, **kwargs):
+    """
+    serve_file для async view. Обращения к хранилищу (размер, время изменения)
+    выполняются в пуле потоков; под ASGI тело читается асинхронно, под WSGI -
+    как обычно (асинхронный итератор WSGI все равно собрал бы в память целиком).
+    """
+    return await sync_to_async(serve_file, thread_sensitive=False)(
+        request, field_file, asynchronous=isinstance(request, ASGIRequest), **kwargs
+    )
+
+
+def _content_type(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def _set_validators(response, last_modified, etag):
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    if etag:
+        response['ETag'] = etag
+
+
+def _multipart_response(storage, name, ranges, size, content_type, asynchronous=False):
+    """Ответ multipart/byteranges для нескольких диапазонов"""
+    boundary = secrets.token_hex(16)
+    headers = [
+        (
+            f'--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode('ascii')
+        for start, end in ranges
+    ]
+    closing = f'--{boundary}--\r\n'.encode('ascii')
+    length = sum(len(h) + (end - start + 1) + 2 for h, (start, end) in zip(headers, ranges))
+    length += len(closing)
+
+    def body():
+        for header, (start, end) in zip(headers, ranges):
+            yield header
+            yield from iter_file_range(storage, name, start, end)
+            yield b'\r\n'
+        yield closing
+
+    async def abody():
+        for header, (start, end) in zip(headers, ranges):
+            yield header
+            async for chunk in aiter_file_range(storage, name, start, end):
+                yield chunk
+            yield b'\r\n'
+        yield closing
+
+    response = StreamingHttpResponse(
+        abody() if asynchronous else body(), status=206, content_type=f'multipart/byteranges; boundary={boundary}'
+    )
+    response['Content-Length'] = str(length)
+    return response
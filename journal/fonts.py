@@ -0,0 +1,164 @@
+"""
+Сборка веб-шрифтов: подмножества глифов в WOFF2 и правила @font-face.
+
+Из полных TTF (static/fonts/...) для каждого шрифта делаются два файла -
+кириллица и латиница (плюс символы, встреченные в шаблонах), - и
+static/css/fonts.css с font-display и unicode-range: браузер качает
+только тот файл, глифы которого реально нужны на странице.
+
+Запускается командой `python manage.py build_fonts` и автоматически
+из collectstatic, если изменились исходные шрифты, шаблоны или настройки.
+Нужен fontTools с поддержкой WOFF2: pip install fonttools brotli.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+try:
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+except ImportError:  # pragma: no cover
+    subset = TTFont = None
+
+WEB_FONTS = [
+    {'family': 'Montserrat-Reg', 'source': 'Montserrat/static/Montserrat-Regular.ttf', 'slug': 'montserrat-regular'},
+    {'family': 'Montserrat-Light', 'source': 'Montserrat/static/Montserrat-Light.ttf', 'slug': 'montserrat-light'},
+    {'family': 'Montserrat-SemiBold', 'source': 'Montserrat/static/Montserrat-SemiBold.ttf', 'slug': 'montserrat-semibold'},
+    {'family': 'Montserrat-Bold', 'source': 'Montserrat/static/Montserrat-Bold.ttf', 'slug': 'montserrat-bold'},
+    {'family': 'Days One', 'source': 'Days_One/DaysOne-Regular.ttf', 'slug': 'days-one'},
+]
+
+# Базовые диапазоны подмножеств (как у Google Fonts)
+SUBSETS = {
+    'cyrillic': [(0x0400, 0x045F), (0x0490, 0x0491), (0x04B0, 0x04B1), (0x2116, 0x2116)],
+    'latin': [
+        (0x0000, 0x00FF), (0x0131, 0x0131), (0x0152, 0x0153), (0x02BB, 0x02BC), (0x02C6, 0x02C6),
+        (0x02DA, 0x02DA), (0x02DC, 0x02DC), (0x2000, 0x206F), (0x2074, 0x2074), (0x20AC, 0x20AC),
+        (0x2122, 0x2122), (0x2191, 0x2191), (0x2193, 0x2193), (0x2212, 0x2212), (0x2215, 0x2215),
+        (0xFEFF, 0xFEFF), (0xFFFD, 0xFFFD),
+    ],
+}
+# Символы из шаблонов вне базовых диапазонов добавляются в это подмножество
+EXTRA_SUBSET = 'latin'
+
+FONT_DISPLAY = 'swap'
+OUTPUT_DIR = 'web'
+MANIFEST_NAME = 'manifest.json'
+
+
+def template_characters(template_dirs):
+    """Все символы, встречающиеся в HTML-шаблонах"""
+    chars = set()
+    for directory in template_dirs:
+        for path in sorted(Path(directory).rglob('*.html')):
+            chars.update(ord(char) for char in path.read_text(encoding='utf-8'))
+    return chars
+
+
+def _in_ranges(codepoint, ranges):
+    return any(start <= codepoint <= end for start, end in ranges)
+
+
+def subset_codepoints(template_chars):
+    """{подмножество: набор кодовых точек}"""
+    result = {}
+    for name, ranges in SUBSETS.items():
+        result[name] = {cp for start, end in ranges for cp in range(start, end + 1)}
+    all_ranges = [r for ranges in SUBSETS.values() for r in ranges]
+    extra = {cp for cp in template_chars if cp > 0x20 and not _in_ranges(cp, all_ranges)}
+    result[EXTRA_SUBSET] |= extra
+    return result
+
+
+def unicode_range(codepoints):
+    """Набор кодовых точек -> значение unicode-range (U+0400-045F, U+2116)"""
+    parts = []
+    points = sorted(codepoints)
+    i = 0
+    while i < len(points):
+        j = i
+        while j + 1 < len(points) and points[j + 1] == points[j] + 1:
+            j += 1
+        start, end = points[i], points[j]
+        parts.append(f'U+{start:04X}' if start == end else f'U+{start:04X}-{end:04X}')
+        i = j + 1
+    return ', '.join(parts)
+
+
+def build_signature(fonts_dir, template_chars):
+    """Отпечаток входных данных сборки: шрифты, символы шаблонов и настройки"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([WEB_FONTS, SUBSETS, EXTRA_SUBSET, FONT_DISPLAY], sort_keys=True).encode())
+    digest.update(json.dumps(sorted(template_chars)).encode())
+    for font in WEB_FONTS:
+        digest.update(hashlib.sha256((Path(fonts_dir) / font['source']).read_bytes()).digest())
+    return digest.hexdigest()
+
+
+def _subset_font(source, output, codepoints):
+    """Пишет WOFF2 с глифами из codepoints; возвращает реально вошедшие кодовые точки"""
+    font = TTFont(source)
+    available = set(font.getBestCmap())
+    unicodes = sorted(codepoints & available)
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=unicodes)
+    subsetter.subset(font)
+    font.flavor = 'woff2'
+    font.save(output)
+    font.close()
+    return set(unicodes)
+
+
+def build_fonts(fonts_dir, css_path, template_dirs, force=False):
+    """
+    Собирает WOFF2-подмножества в <fonts_dir>/web/ и файл css_path.
+    Возвращает False, если входные данные не менялись и сборка пропущена.
+    """
+    if subset is None:
+        raise RuntimeError("Для сборки шрифтов установите fontTools: pip install fonttools brotli")
+
+    fonts_dir, css_path = Path(fonts_dir), Path(css_path)
+    output_dir = fonts_dir / OUTPUT_DIR
+    manifest_path = output_dir / MANIFEST_NAME
+    template_chars = template_characters(template_dirs)
+    signature = build_signature(fonts_dir, template_chars)
+
+    if not force and manifest_path.exists() and css_path.exists():
+        if json.loads(manifest_path.read_text()).get('signature') == signature:
+            return False
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for old in output_dir.glob('*.woff2'):
+        old.unlink()
+
+    rules = []
+    files = []
+    for font in WEB_FONTS:
+        for subset_name, codepoints in subset_codepoints(template_chars).items():
+            filename = f"{font['slug']}.{subset_name}.woff2"
+            included = _subset_font(fonts_dir / font['source'], output_dir / filename, codepoints)
+            if not included:
+                (output_dir / filename).unlink()
+                continue
+            files.append(filename)
+            url = Path('..', fonts_dir.name, OUTPUT_DIR, filename).as_posix()
+            rules.append(
+                f"/* {font['family']}, {subset_name} */\n"
+                "@font-face {\n"
+                f"    font-family: '{font['family']}';\n"
+                "    font-style: normal;\n"
+                f"    font-display: {FONT_DISPLAY};\n"
+                f"    src: url({url}) format('woff2');\n"
+                f"    unicode-range: {unicode_range(included)};\n"
+                "}\n"
+            )
+
+    css_path.write_text(
+        "/* Файл создан командой build_fonts - не редактируйте вручную */\n\n" + '\n'.join(rules),
+        encoding='utf-8',
+    )
+    manifest_path.write_text(json.dumps({'signature': signature, 'files': files}, indent=2))
+    return True
@@ -0,0 +1,109 @@
+"""
+Адаптивные производные изображений (обложки выпусков, фото редколлегии).
+
+При загрузке картинки создаются уменьшенные варианты в WebP и AVIF
+(если Pillow собран с поддержкой AVIF) и крошечная размытая заглушка
+(LQIP) в виде data URI. Описание вариантов хранится в JSON-поле модели:
+
+    {
+        "source": "covers/2025/1/gia.png",
+        "width": 1240, "height": 1754,
+        "lqip": "data:image/webp;base64,...",
+        "variants": [{"name": "...", "format": "webp", "width": 320, "height": 453}, ...]
+    }
+
+В шаблонах варианты выводятся тегом {% responsive_image %} из journal_images.
+"""
+import base64
+import io
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+# Ширины вариантов в пикселях: от миниатюр в сетке архива до retina-экранов
+DERIVATIVE_WIDTHS = (160, 320, 480, 640)
+LQIP_WIDTH = 16
+
+_FORMATS = {
+    'avif': {'format': 'AVIF', 'quality': 55, 'mime': 'image/avif'},
+    'webp': {'format': 'WEBP', 'quality': 80, 'mime': 'image/webp'},
+}
+
+
+def available_formats():
+    """Форматы вариантов, которые умеет писать установленный Pillow (лучшие первыми)"""
+    return [fmt for fmt in _FORMATS if features.check(fmt)]
+
+
+def mime_type(fmt):
+    return _FORMATS[fmt]['mime']
+
+
+def _encode(image, fmt, **extra):
+    options = _FORMATS[fmt]
+    buffer = io.BytesIO()
+    image.save(buffer, options['format'], quality=options['quality'], **extra)
+    return buffer.getvalue()
+
+
+def _prepare(image):
+    """Поворот по EXIF и перевод в RGB/RGBA для кодирования в WebP/AVIF"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'P') else 'RGB')
+    return image
+
+
+def build_derivatives(field_file, widths=DERIVATIVE_WIDTHS):
+    """Создает варианты изображения в хранилище и возвращает их описание"""
+    storage = field_file.storage
+    directory, filename = os.path.split(field_file.name)
+    stem = os.path.splitext(filename)[0]
+
+    with storage.open(field_file.name, 'rb') as fh:
+        with Image.open(fh) as original:
+            image = _prepare(original)
+            image.load()
+
+    width, height = image.size
+    # Не увеличиваем картинку: берем ширины меньше исходной, плюс саму исходную
+    targets = sorted({w for w in widths if w < width} | {min(width, max(widths))})
+
+    variants = []
+    for fmt in available_formats():
+        for target in targets:
+            resized = image if target == width else image.resize(
+                (target, max(1, round(height * target / width))), Image.LANCZOS
+            )
+            name = storage.save(
+                os.path.join('derivatives', directory, f'{stem}-{target}.{fmt}'),
+                ContentFile(_encode(resized, fmt)),
+            )
+            variants.append({'name': name, 'format': fmt, 'width': resized.width, 'height': resized.height})
+
+    lqip = image.resize((LQIP_WIDTH, max(1, round(height * LQIP_WIDTH / width))), Image.BILINEAR)
+    lqip_data = base64.b64encode(_encode(lqip, 'webp')).decode('ascii')
+
+    return {
+        'source': field_file.name,
+        'width': width,
+        'height': height,
+        'lqip': f'data:image/webp;base64,{lqip_data}',
+        'variants': variants,
+    }
+
+
+def delete_derivatives(storage, derivatives):
+    """Удаляет файлы вариантов (при замене или удалении исходной картинки)"""
+    for variant in (derivatives or {}).get('variants', []):
+        storage.delete(variant['name'])
+
+
+def srcset(storage, derivatives, fmt):
+    """Значение атрибута srcset для одного формата"""
+    return ', '.join(
+        f"{storage.url(variant['name'])} {variant['width']}w"
+        for variant in derivatives.get('variants', [])
+        if variant['format'] == fmt
+    )
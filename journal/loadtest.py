@@ -0,0 +1,318 @@
+"""
+Нагрузочный прогон сайта: `python manage.py loadtest`.
+
+Запускает локальный сервер (runserver в отдельном процессе, без автоперезагрузки)
+или берет уже запущенный (--url, например gunicorn/uvicorn с боевыми настройками)
+и в concurrency потоках без пауз шлет запросы к страницам из взвешенной смеси MIX.
+Адреса с параметрами берутся из БД: случайные выпуски, опубликованные статьи,
+архивные периоды, PDF - только у записей с файлом.
+
+По умолчанию каждый запрос идет в новом соединении: runserver не отключает
+алгоритм Нейгла, и на keep-alive соединении ответ ждет отложенного ACK
+клиента (~40 мс на запрос). Для gunicorn/uvicorn можно включить keep_alive.
+
+Итог по каждому имени маршрута - число запросов, ошибки (статус >= 400 и
+обрывы соединения), запросов в секунду и задержка p50/p95/p99 в миллисекундах.
+Результат сохраняется в JSON; compare() сравнивает два прогона и находит
+маршруты, у которых выросла задержка p95 или доля ошибок.
+"""
+import http.client
+import json
+import math
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import ArchiveYear, Article, JournalIssue
+
+# Маршрут -> вес в смеси запросов (примерно как ходят читатели журнала)
+MIX = {
+    'home': 10,
+    'issues': 10,
+    'issue_detail': 15,
+    'archive_range': 5,
+    'article_detail': 35,
+    'read_article_pdf': 10,
+    'download_article_pdf': 5,
+    'read_issue_pdf': 5,
+    'download_issue_pdf': 5,
+}
+# Сколько разных объектов каждого маршрута участвует в прогоне
+URL_POOL_SIZE = 500
+PERCENTILES = (50, 95, 99)
+# Рост p95 меньше этого (мс) считаем шумом, даже если в процентах он большой
+NOISE_FLOOR_MS = 2.0
+SERVER_START_TIMEOUT = 30
+REQUEST_TIMEOUT = 30
+
+
+class LoadTestError(Exception):
+    """Прогон невозможен: нет адресов, сервер не запустился"""
+
+
+# --- Адреса ---
+
+def _sample(queryset, pool_size, rng):
+    ids = list(queryset.order_by().values_list('pk', flat=True))
+    return rng.sample(ids, min(len(ids), pool_size))
+
+
+def build_url_pool(names, pool_size=URL_POOL_SIZE, rng=random):
+    """{маршрут: [адреса]}; маршруты без подходящих объектов получают пустой список"""
+    issues = JournalIssue.objects.all()
+    articles = Article.objects.filter(is_published=True)
+    with_pdf = {
+        'read_article_pdf': articles.exclude(Q(pdf_file='') | Q(pdf_file__isnull=True)),
+        'download_article_pdf': articles.exclude(Q(pdf_file='') | Q(pdf_file__isnull=True)),
+        'read_issue_pdf': issues.exclude(Q(full_pdf='') | Q(full_pdf__isnull=True)),
+        'download_issue_pdf': issues.exclude(Q(full_pdf='') | Q(full_pdf__isnull=True)),
+        'issue_detail': issues,
+        'article_detail': articles,
+    }
+    pool = {}
+    for name in names:
+        if name in with_pdf:
+            pool[name] = [reverse(name, args=[pk]) for pk in _sample(with_pdf[name], pool_size, rng)]
+        elif name == 'archive_range':
+            slugs = list(ArchiveYear.objects.filter(is_active=True).values_list('slug', flat=True))
+            pool[name] = [reverse(name, args=[slug]) for slug in slugs]
+        else:
+            pool[name] = [reverse(name)]
+    return pool
+
+
+def parse_mix(value):
+    """'home=10,article_detail=30' -> {маршрут: вес}"""
+    mix = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, weight = item.partition('=')
+        try:
+            mix[name.strip()] = float(weight) if weight else 1.0
+        except ValueError:
+            raise LoadTestError(f"Некорректный вес в смеси: {item!r}")
+    unknown = set(mix) - set(MIX)
+    if unknown:
+        raise LoadTestError(f"Неизвестные маршруты: {', '.join(sorted(unknown))}. Доступны: {', '.join(MIX)}")
+    return mix
+
+
+# --- Локальный сервер ---
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server():
+    """runserver на свободном порту; возвращает (процесс, адрес сайта)"""
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'django', 'runserver', f'127.0.0.1:{port}', '--noreload', '--skip-checks'],
+        cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise LoadTestError(f"runserver завершился с кодом {process.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise LoadTestError(f"runserver не начал принимать соединения за {SERVER_START_TIMEOUT} с")
+
+
+def default_host():
+    """Заголовок Host, который пропустит ALLOWED_HOSTS"""
+    hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*']
+    return hosts[0] if hosts else 'localhost'
+
+
+# --- Прогон ---
+
+def _worker(base_url, host, schedule, deadline, samples, lock, keep_alive):
+    target = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if target.scheme == 'https' else http.client.HTTPConnection
+    connection = connection_class(target.hostname, target.port, timeout=REQUEST_TIMEOUT)
+    results = []
+    try:
+        while time.monotonic() < deadline:
+            name, url = schedule()
+            if name is None:
+                break
+            started = time.perf_counter()
+            try:
+                connection.request('GET', target.path.rstrip('/') + url, headers={'Host': host})
+                response = connection.getresponse()
+                size = len(response.read())
+                status = response.status
+                if not keep_alive:
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                # Соединение оборвано: считаем ошибкой и открываем новое
+                connection.close()
+                status, size = 0, 0
+            results.append((name, status, time.perf_counter() - started, size))
+    finally:
+        connection.close()
+        with lock:
+            samples.extend(results)
+
+
+def percentile(values, q):
+    """Перцентиль методом ближайшего ранга по отсортированному списку"""
+    if not values:
+        return None
+    return values[max(math.ceil(q / 100 * len(values)) - 1, 0)]
+
+
+def summarize(samples, elapsed):
+    def stats(rows):
+        latencies = sorted(latency * 1000 for _, _, latency, _ in rows)
+        errors = sum(1 for _, status, _, _ in rows if status == 0 or status >= 400)
+        result = {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': round(errors / len(rows), 4) if rows else 0,
+            'rps': round(len(rows) / elapsed, 2) if elapsed else 0,
+            'bytes': sum(size for _, _, _, size in rows),
+            'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+            'max_ms': round(latencies[-1], 2) if latencies else None,
+        }
+        for q in PERCENTILES:
+            value = percentile(latencies, q)
+            result[f'p{q}_ms'] = round(value, 2) if value is not None else None
+        return result
+
+    by_name = {}
+    for row in samples:
+        by_name.setdefault(row[0], []).append(row)
+    return stats(samples), {name: stats(rows) for name, rows in sorted(by_name.items())}
+
+
+def _run_workers(base_url, host, concurrency, duration, schedule, samples, lock, keep_alive):
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=_worker, args=(base_url, host, schedule, deadline, samples, lock, keep_alive), daemon=True)
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run(base_url=None, concurrency=10, duration=30.0, requests=None, warmup=2.0, mix=None, host=None,
+        seed=None, keep_alive=False, log=None):
+    """
+    Прогон нагрузки. Без base_url поднимает локальный runserver.
+    Останавливается через duration секунд или после requests запросов.
+    Возвращает словарь результатов (его же сохраняет команда в JSON).
+    """
+    rng = random.Random(seed)
+    mix = mix or MIX
+    pool = build_url_pool(mix, rng=rng)
+    empty = sorted(name for name, urls in pool.items() if not urls)
+    weights = {name: weight for name, weight in mix.items() if pool[name] and weight > 0}
+    if not weights:
+        raise LoadTestError("Нет адресов для прогона: в базе нет выпусков и статей")
+    if log and empty:
+        log(f"Пропущены маршруты без объектов в базе: {', '.join(empty)}")
+
+    host = host or (default_host() if base_url is None else urlsplit(base_url).netloc)
+    lock = threading.Lock()
+    remaining = requests
+
+    def pick():
+        with lock:
+            name = rng.choices(list(weights), list(weights.values()))[0]
+            return name, rng.choice(pool[name])
+
+    def schedule():
+        nonlocal remaining
+        if requests is not None:
+            with lock:
+                if remaining <= 0:
+                    return None, None
+                remaining -= 1
+        return pick()
+
+    server = None
+    if base_url is None:
+        server, base_url = start_server()
+        if log:
+            log(f"Запущен runserver: {base_url}")
+    try:
+        if warmup:
+            # Прогрев кэшей страниц и соединений с БД - в результаты не входит
+            _run_workers(base_url, host, concurrency, warmup, pick, [], lock, keep_alive)
+        samples = []
+        started = time.monotonic()
+        _run_workers(base_url, host, concurrency, duration, schedule, samples, lock, keep_alive)
+        elapsed = time.monotonic() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    total, endpoints = summarize(samples, elapsed)
+    return {
+        'started_at': timezone.now().isoformat(timespec='seconds'),
+        'target': 'runserver' if server is not None else base_url,
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 2),
+        'mix': weights,
+        'seed': seed,
+        'keep_alive': keep_alive,
+        'total': total,
+        'endpoints': endpoints,
+    }
+
+
+# --- Сравнение прогонов ---
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Сравнивает результаты двух прогонов по маршрутам.
+    Возвращает список (маршрут, показатель, было, стало, регрессия?);
+    регрессия - p95 вырос больше чем на threshold (и на NOISE_FLOOR_MS)
+    или выросла доля ошибок.
+    """
+    rows = []
+    for name in sorted(set(baseline['endpoints']) | set(current['endpoints'])):
+        before, after = baseline['endpoints'].get(name), current['endpoints'].get(name)
+        if before is None or after is None:
+            continue
+        for metric in ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'error_rate'):
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None:
+                continue
+            if metric == 'p95_ms':
+                regression = new > old * (1 + threshold) and new - old > NOISE_FLOOR_MS
+            elif metric == 'error_rate':
+                regression = new > old
+            else:
+                regression = False
+            rows.append((name, metric, old, new, regression))
+    return rows
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as fh:
+        return json.load(fh)
+
+
+def save_results(path, results):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(results, fh, ensure_ascii=False, indent=2)
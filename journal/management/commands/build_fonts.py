@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.fonts import build_fonts
+
+
+def font_paths():
+    """(каталог шрифтов, путь к fonts.css, каталоги шаблонов) этого проекта"""
+    static_dir = settings.STATICFILES_DIRS[0]
+    template_dirs = [d for config in settings.TEMPLATES for d in config.get('DIRS', [])]
+    return static_dir / 'fonts', static_dir / 'css' / 'fonts.css', template_dirs
+
+
+class Command(BaseCommand):
+    help = "Собирает WOFF2-подмножества шрифтов (кириллица/латиница) и static/css/fonts.css"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Пересобрать, даже если ничего не менялось")
+
+    def handle(self, *args, **options):
+        fonts_dir, css_path, template_dirs = font_paths()
+        try:
+            rebuilt = build_fonts(fonts_dir, css_path, template_dirs, force=options['force'])
+        except RuntimeError as exc:
+            raise CommandError(exc)
+        if rebuilt:
+            self.stdout.write(self.style.SUCCESS(f"Шрифты собраны: {css_path}"))
+        else:
+            self.stdout.write("Шрифты не изменились - сборка пропущена.")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from journal.sitemaps import sitemaps_root, update_sitemaps
+
+
+class Command(BaseCommand):
+    help = "Обновляет файлы карты сайта (перезаписываются только части с изменившимися объектами)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Перезаписать все части")
+        parser.add_argument('--base-url', help="Адрес сайта (по умолчанию JOURNAL_SITEMAPS['BASE_URL'])")
+
+    def handle(self, *args, **options):
+        result = update_sitemaps(force=options['force'], base_url=options['base_url'])
+        if options['verbosity'] > 1:
+            for part in result['written']:
+                self.stdout.write(f"  записано: {part}")
+            for part in result['removed']:
+                self.stdout.write(f"  удалено: {part}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Карта сайта в {sitemaps_root()}: частей записано {len(result['written'])}, "
+            f"без изменений {result['unchanged']}, удалено {len(result['removed'])}"
+        ))
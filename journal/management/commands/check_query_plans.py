@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from journal.query_plans import explain_all
+
+
+class Command(BaseCommand):
+    help = "Выполняет EXPLAIN QUERY PLAN для запросов страниц и админки и проверяет, что они идут по индексам"
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Проверка планов рассчитана на SQLite (EXPLAIN QUERY PLAN)")
+
+        failed = 0
+        for label, sql, plan, problems in explain_all():
+            if problems:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"{label}: {'; '.join(problems)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{label}: OK"))
+            if options['verbosity'] > 1 or problems:
+                self.stdout.write(f"    {sql}")
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if failed:
+            raise CommandError(f"Запросов без подходящего индекса: {failed}")
@@ -0,0 +1,20 @@
+from django.contrib.staticfiles.management.commands.collectstatic import Command as CollectStaticCommand
+from django.core.management import call_command
+
+from journal.fonts import subset
+
+
+class Command(CollectStaticCommand):
+    """collectstatic, который перед сбором пересобирает веб-шрифты, если они устарели"""
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--skip-fonts', action='store_true', help="Не пересобирать веб-шрифты")
+
+    def handle(self, **options):
+        if not options['skip_fonts'] and not options['dry_run']:
+            if subset is None:
+                self.stderr.write("fontTools не установлен - используются ранее собранные шрифты.")
+            else:
+                call_command('build_fonts', verbosity=options['verbosity'], stdout=self.stdout)
+        return super().handle(**options)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.export import export_site
+
+
+class Command(BaseCommand):
+    help = "Экспортирует публичные страницы сайта в статические HTML-файлы (перерисовываются только изменившиеся)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help="Каталог для экспорта")
+        parser.add_argument('--workers', type=int, default=4, help="Число потоков рендеринга")
+        parser.add_argument('--force', action='store_true', help="Перерисовать все страницы")
+        parser.add_argument('--static-url', help="Адрес статики на CDN, например https://cdn.example.org/static/")
+        parser.add_argument('--media-url', help="Адрес медиафайлов на CDN")
+        parser.add_argument('--dynamic-url', help="Адрес живого Django для форм, поиска и админки")
+        parser.add_argument('--host', default='localhost', help="Имя хоста для рендеринга страниц")
+
+    def handle(self, *args, **options):
+        log = (lambda url: self.stdout.write(f"  {url}")) if options['verbosity'] > 1 else None
+        result = export_site(
+            options['output_dir'],
+            workers=options['workers'],
+            force=options['force'],
+            static_url=options['static_url'],
+            media_url=options['media_url'],
+            dynamic_url=options['dynamic_url'],
+            host=options['host'],
+            log=log,
+        )
+        summary = (
+            f"Страниц перерисовано: {result['rendered']}, без изменений: {result['skipped']}, "
+            f"удалено: {result['removed']}, файлов скопировано: {result['assets']}"
+        )
+        if result['failed']:
+            self.stdout.write(summary)
+            for error in result['failed']:
+                self.stderr.write(f"  {error}")
+            raise CommandError(
+                f"Не удалось экспортировать страниц: {len(result['failed'])} (перерисуются при следующем запуске)"
+            )
+        self.stdout.write(self.style.SUCCESS(summary))
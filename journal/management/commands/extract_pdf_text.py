@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.models import Article
+from journal.text_extraction import run_extraction
+
+
+class Command(BaseCommand):
+    help = "Извлекает текст из PDF статей и выпусков в пуле процессов и обновляет индекс поиска"
+
+    def add_arguments(self, parser):
+        parser.add_argument('article_ids', nargs='*', type=int, help="id статей (по умолчанию все)")
+        parser.add_argument('--workers', type=int, default=None, help="Число процессов (по умолчанию - по числу ядер)")
+        parser.add_argument('--force', action='store_true', help="Извлекать заново, даже если PDF не менялся")
+
+    def handle(self, *args, **options):
+        articles = Article.objects.all()
+        if options['article_ids']:
+            articles = articles.filter(pk__in=options['article_ids'])
+
+        def on_error(article_ids, exc):
+            self.stderr.write(f"Статьи {article_ids}: ошибка извлечения текста - {exc}")
+
+        try:
+            updated = run_extraction(articles, workers=options['workers'], force=options['force'], on_error=on_error)
+        except RuntimeError as exc:
+            raise CommandError(exc)
+        self.stdout.write(self.style.SUCCESS(f"Обновлено текстов статей: {updated}"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from journal.contact_queue import flush, queue_dir
+
+
+class Command(BaseCommand):
+    help = "Записывает в БД сообщения обратной связи из очереди (для cron)"
+
+    def handle(self, *args, **options):
+        written = flush()
+        self.stdout.write(self.style.SUCCESS(f"Из очереди {queue_dir()} записано сообщений: {written}"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from journal.models import EditorialBoard, JournalIssue
+
+
+class Command(BaseCommand):
+    help = "Создает адаптивные WebP/AVIF-варианты обложек и фото редколлегии"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Пересоздать варианты, даже если они уже есть")
+
+    def handle(self, *args, **options):
+        count = 0
+        for model in (JournalIssue, EditorialBoard):
+            for obj in model.objects.all():
+                for field_name, target in obj.derivative_fields.items():
+                    if not getattr(obj, field_name):
+                        continue
+                    if options['force'] or not getattr(obj, target).get('variants'):
+                        # Сброс source заставляет ImageDerivativesMixin пересоздать варианты
+                        setattr(obj, target, {**getattr(obj, target), 'source': None})
+                        obj.save()
+                        count += 1
+        self.stdout.write(self.style.SUCCESS(f"Обработано изображений: {count}"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.bulk_import import ManifestError, import_archive
+
+
+class Command(BaseCommand):
+    help = "Импортирует архивные выпуски и статьи из манифеста (JSON/CSV) и каталога с PDF и обложками"
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help="Файл манифеста .json или .csv")
+        parser.add_argument('--source-dir', help="Каталог с файлами (по умолчанию - каталог манифеста)")
+        parser.add_argument('--workers', type=int, default=None, help="Число процессов для хэшей (по умолчанию - по числу ядер)")
+        parser.add_argument('--batch-size', type=int, default=50, help="Выпусков в одной транзакции")
+
+    def handle(self, *args, **options):
+        log = (lambda message: self.stdout.write(f"  {message}")) if options['verbosity'] > 1 else None
+        try:
+            result = import_archive(
+                options['manifest'],
+                source_dir=options['source_dir'],
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                log=log,
+            )
+        except ManifestError as exc:
+            raise CommandError(exc)
+        for error in result['errors']:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано выпусков: {result['issues']}, статей: {result['articles']}, "
+            f"уже были в базе: {result['skipped']}, пропущено с ошибками: {len(result['errors'])}"
+        ))
+        if result['issues'] or result['articles']:
+            self.stdout.write("Дальше: generate_image_derivatives (варианты обложек) и extract_pdf_text (поиск по PDF)")
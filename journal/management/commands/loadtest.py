@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from journal.loadtest import LoadTestError, compare, load_results, parse_mix, run, save_results
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный прогон: смесь запросов к страницам и PDF, задержки p50/p95/p99 по маршрутам"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Адрес уже запущенного сайта (по умолчанию поднимается runserver)")
+        parser.add_argument('--host', help="Заголовок Host (по умолчанию - из ALLOWED_HOSTS или --url)")
+        parser.add_argument('--concurrency', '-c', type=int, default=10, help="Одновременных клиентов")
+        parser.add_argument('--duration', '-d', type=float, default=30, help="Длительность прогона, секунды")
+        parser.add_argument('--requests', '-n', type=int, help="Остановиться после N запросов")
+        parser.add_argument('--warmup', type=float, default=2, help="Прогрев перед замером, секунды")
+        parser.add_argument('--mix', help="Веса маршрутов: home=10,article_detail=30 (по умолчанию journal.loadtest.MIX)")
+        parser.add_argument('--keep-alive', action='store_true',
+                            help="Переиспользовать соединения (для gunicorn/uvicorn; с runserver искажает задержки)")
+        parser.add_argument('--seed', type=int, help="Зерно генератора - одинаковая последовательность адресов")
+        parser.add_argument('--output', '-o', help="Сохранить результаты в JSON")
+        parser.add_argument('--compare', help="JSON прошлого прогона: сравнить и завершиться с ошибкой при регрессии")
+        parser.add_argument('--threshold', type=float, default=20,
+                            help="Допустимый рост p95 при сравнении, процентов (по умолчанию 20)")
+
+    def handle(self, *args, **options):
+        try:
+            results = run(
+                base_url=options['url'],
+                concurrency=options['concurrency'],
+                duration=options['duration'],
+                requests=options['requests'],
+                warmup=options['warmup'],
+                mix=parse_mix(options['mix']) if options['mix'] else None,
+                host=options['host'],
+                seed=options['seed'],
+                keep_alive=options['keep_alive'],
+                log=self.stdout.write,
+            )
+        except LoadTestError as exc:
+            raise CommandError(exc)
+
+        self._report(results)
+        if options['output']:
+            save_results(options['output'], results)
+            self.stdout.write(f"Результаты сохранены в {options['output']}")
+        if options['compare']:
+            self._compare(load_results(options['compare']), results, options['threshold'] / 100)
+
+    def _report(self, results):
+        header = f"{'маршрут':<22}{'запросов':>9}{'ошибок':>8}{'зап/с':>9}{'p50':>9}{'p95':>9}{'p99':>9}  мс"
+        self.stdout.write(header)
+        rows = list(results['endpoints'].items()) + [('ВСЕГО', results['total'])]
+        for name, stats in rows:
+            self.stdout.write(
+                f"{name:<22}{stats['requests']:>9}{stats['errors']:>8}{stats['rps']:>9}"
+                + ''.join(f"{stats[key] if stats[key] is not None else '-':>9}" for key in ('p50_ms', 'p95_ms', 'p99_ms'))
+            )
+        self.stdout.write(f"Клиентов: {results['concurrency']}, длительность: {results['duration_s']} с")
+
+    def _compare(self, baseline, results, threshold):
+        regressions = []
+        for name, metric, old, new, regression in compare(baseline, results, threshold):
+            change = f"{(new - old) / old * 100:+.0f}%" if old else ''
+            line = f"{name:<22}{metric:<12}{old:>10} -> {new:<10}{change}"
+            if regression:
+                regressions.append(f"{name} {metric}")
+                self.stdout.write(self.style.ERROR(line))
+            elif metric == 'p95_ms':
+                self.stdout.write(line)
+        if regressions:
+            raise CommandError(f"Регрессии относительно прошлого прогона: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS("Регрессий нет"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from journal import search
+
+
+class Command(BaseCommand):
+    help = "Перестраивает полнотекстовый индекс статей (SQLite FTS5)"
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            self.stdout.write(self.style.WARNING("FTS5 доступен только на SQLite - индекс не нужен."))
+            return
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Проиндексировано статей: {count}"))
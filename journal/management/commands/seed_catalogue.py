@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from django.utils import timezone
+
+from journal.models import ArchiveYear, Article, JournalIssue
+from journal.synthetic import clear_catalogue, generate_catalogue
+
+
+class Command(BaseCommand):
+    help = "Создает синтетический каталог (выпуски с 1957 года, статьи, архивные периоды) для проверки под нагрузкой"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=10000, help="Число статей (по умолчанию 10 000)")
+        parser.add_argument('--start-year', type=int, default=1957, help="Первый год выпусков")
+        parser.add_argument('--end-year', type=int, help="Последний год выпусков (по умолчанию текущий)")
+        parser.add_argument('--issues-per-year', type=int, default=6, help="Выпусков в год")
+        parser.add_argument('--archive-span', type=int, default=10, help="Лет в одном архивном периоде")
+        parser.add_argument('--seed', type=int, default=1, help="Зерно генератора: один seed - один каталог")
+        parser.add_argument('--files', action='store_true', help="Создать PDF-заглушки и обложки в MEDIA_ROOT")
+        parser.add_argument('--pdf-kb', type=int, default=200, help="Размер PDF статьи, КиБ (PDF выпуска - в 4 раза больше)")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Строк в одном INSERT")
+        parser.add_argument('--clear', action='store_true',
+                            help="Сначала удалить все выпуски, статьи и архивные периоды")
+        parser.add_argument('--no-index', action='store_true',
+                            help="Не строить поисковый индекс (потом: python manage.py rebuild_search_index)")
+
+    def handle(self, *args, **options):
+        if options['articles'] < 0 or options['issues_per_year'] < 1 or options['archive_span'] < 1:
+            raise CommandError("--articles, --issues-per-year и --archive-span должны быть положительными")
+        end_year = options['end_year'] or timezone.now().year
+        if options['start_year'] > end_year:
+            raise CommandError(f"--start-year ({options['start_year']}) позже последнего года ({end_year})")
+        if not options['clear'] and (JournalIssue.objects.exists() or Article.objects.exists()):
+            raise CommandError("В базе уже есть выпуски или статьи: добавьте --clear, чтобы заменить их")
+        # Без выпусков в базе могут быть только периоды меню из миграции 0008 - их заменяют новые
+        if options['clear'] or ArchiveYear.objects.exists():
+            clear_catalogue()
+
+        log = (lambda message: self.stdout.write(f"  {message}")) if options['verbosity'] > 1 else None
+        try:
+            result = generate_catalogue(
+                articles=options['articles'],
+                start_year=options['start_year'],
+                end_year=end_year,
+                issues_per_year=options['issues_per_year'],
+                seed=options['seed'],
+                files=options['files'],
+                pdf_kb=options['pdf_kb'],
+                archive_span=options['archive_span'],
+                batch_size=options['batch_size'],
+                index=not options['no_index'],
+                log=log,
+            )
+        except NotImplementedError:
+            raise CommandError("--files работает только с локальным хранилищем файлов")
+        except DatabaseError as exc:
+            raise CommandError(f"Не удалось записать каталог: {exc}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано выпусков: {result['issues']}, статей: {result['articles']}, "
+            f"архивных периодов: {result['archive_periods']}"
+        ))
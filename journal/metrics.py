@@ -0,0 +1,395 @@
+"""
+Метрики в формате Prometheus: /metrics (text exposition format 0.0.4).
+
+Счетчики и гистограммы ведутся в памяти процесса, у каждого потока свои
+(threading.local): запрос обновляет только словари своего потока, без
+блокировок и общих структур. Блокировка берется один раз - когда поток
+записывает первое значение.
+
+Несколько воркеров (gunicorn, uvicorn --workers): фоновый поток каждого
+процесса раз в FLUSH_INTERVAL секунд записывает снимок своих значений в
+DIR/<pid>-<метка>.json (запись во временный файл и переименование).
+/metrics в любом воркере складывает файлы всех процессов, а свои значения
+берет из памяти - данные других воркеров отстают не больше чем на
+FLUSH_INTERVAL. Файлы завершившихся процессов сливаются в один, поэтому
+счетчики не уменьшаются при перезапуске воркеров. Каталог DIR - локальный
+для машины (живость процесса проверяется по pid). Без DIR видны только
+значения процесса, ответившего на /metrics.
+
+Размеры очередей (gauge) считаются в момент запроса /metrics.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.cache import add_never_cache_headers
+
+from . import contact_queue
+from .throttling import client_ip
+
+try:
+    import fcntl
+except ImportError:  # Windows: файлы завершившихся процессов не сливаются
+    fcntl = None
+
+# Границы гистограммы времени ответа, секунды
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Представления, для которых считается объем отданных файлов
+FILE_VIEWS = frozenset({'download_article_pdf', 'read_article_pdf', 'download_issue_pdf', 'read_issue_pdf'})
+
+# Имя -> (тип, описание)
+METRICS = {
+    'journal_http_request_duration_seconds': (
+        'histogram', 'Время ответа до передачи заголовков (тело потоковых ответов не входит), по маршрутам'),
+    'journal_http_responses_total': ('counter', 'Ответы по маршрутам и статусам'),
+    'journal_db_queries_total': ('counter', 'SQL-запросы по маршрутам'),
+    'journal_db_query_seconds_total': ('counter', 'Суммарное время SQL-запросов по маршрутам'),
+    'journal_file_bytes_served_total': ('counter', 'Байт PDF, отданных из Django (по Content-Length ответа)'),
+    'journal_cache_requests_total': ('counter', 'Обращения к кэшам: hit, stale (отдано устаревшее) и miss'),
+    'journal_contact_queue_pending': ('gauge', 'Сообщения обратной связи, ожидающие записи в БД'),
+    'journal_contact_queue_claimed': ('gauge', 'Сообщения обратной связи, которые сейчас записываются'),
+}
+SNAPSHOT_SUFFIX = '.json'
+ARCHIVE_NAME = 'finished.json'
+LOCK_NAME = '.lock'
+
+logger = logging.getLogger(__name__)
+
+
+def _config(name, default):
+    return getattr(settings, 'JOURNAL_METRICS', {}).get(name, default)
+
+
+def enabled():
+    return _config('ENABLED', True)
+
+
+def metrics_dir():
+    path = _config('DIR', None)
+    return Path(path) if path else None
+
+
+# --- Значения процесса ---
+
+class _Registry:
+    """Значения одного потока: {(имя, метки): число} и {(имя, метки): [счетчики корзин..., сумма]}"""
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.counters = {}
+        self.histograms = {}
+
+    def merge(self, counters, histograms):
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, values in histograms.items():
+            current = self.histograms.get(key)
+            self.histograms[key] = list(values) if current is None else [a + b for a, b in zip(current, values)]
+
+
+_local = threading.local()
+_registries = []
+_finished_threads = _Registry()
+_registries_lock = threading.Lock()
+_flusher = None
+_flusher_pid = None
+_process_name = None
+
+
+def _registry():
+    registry = getattr(_local, 'registry', None)
+    if registry is None:
+        registry = _local.registry = _Registry()
+        with _registries_lock:
+            _registries.append(registry)
+        _start_flusher()
+    return registry
+
+
+def inc(name, labels, value=1):
+    """Увеличивает счетчик name с метками labels - кортежем пар (метка, значение)"""
+    counters = _registry().counters
+    key = (name, labels)
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name, labels, value, buckets=DURATION_BUCKETS):
+    """Добавляет наблюдение value в гистограмму name"""
+    histograms = _registry().histograms
+    key = (name, labels)
+    values = histograms.get(key)
+    if values is None:
+        values = histograms[key] = [0] * (len(buckets) + 2)
+    values[bisect_left(buckets, value)] += 1
+    values[-1] += value
+
+
+def cache_lookup(cache_name, result):
+    """Обращение к кэшу: result - 'hit', 'stale' или 'miss'"""
+    inc('journal_cache_requests_total', (('cache', cache_name), ('result', result)))
+
+
+def observe_request(request, response, measure):
+    """Метрики завершенного запроса по замеру timing.RequestTiming (см. ServerTimingMiddleware)"""
+    match = request.resolver_match
+    view = match.view_name if match else 'unresolved'
+    labels = (('view', view),)
+    observe('journal_http_request_duration_seconds', labels, measure.total)
+    inc('journal_http_responses_total', (('view', view), ('status', str(response.status_code))))
+    if measure.queries:
+        inc('journal_db_queries_total', labels, measure.queries)
+        inc('journal_db_query_seconds_total', labels, measure.db)
+    if view in FILE_VIEWS and request.method == 'GET' and response.status_code in (200, 206):
+        # При отдаче через X-Accel-Redirect/X-Sendfile тело пустое - объем виден только в логах прокси
+        inc('journal_file_bytes_served_total', labels, int(response.get('Content-Length') or 0))
+    page_cache = response.get('X-Page-Cache')
+    if page_cache:
+        cache_lookup('page', page_cache.lower())
+
+
+def snapshot():
+    """Сумма значений всех потоков процесса; потоки, которые завершились, сливаются в один"""
+    with _registries_lock:
+        alive = []
+        for registry in _registries:
+            if registry.thread.is_alive():
+                alive.append(registry)
+            else:
+                _finished_threads.merge(registry.counters, registry.histograms)
+        _registries[:] = alive
+        total = _Registry()
+        for registry in [_finished_threads, *alive]:
+            # Копия словаря создается без переключения потоков (GIL), поток может продолжать запись
+            total.merge(dict(registry.counters), {key: list(values) for key, values in list(registry.histograms.items())})
+    return total
+
+
+# --- Файлы процессов ---
+
+def _encode(registry):
+    return {
+        'counters': [[name, list(labels), value] for (name, labels), value in registry.counters.items()],
+        'histograms': [[name, list(labels), values] for (name, labels), values in registry.histograms.items()],
+    }
+
+
+def _decode(data):
+    registry = _Registry()
+    registry.merge(
+        {(name, tuple(map(tuple, labels))): value for name, labels, value in data.get('counters', [])},
+        {(name, tuple(map(tuple, labels))): values for name, labels, values in data.get('histograms', [])},
+    )
+    return registry
+
+
+def _write_json(path, data):
+    tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+    tmp.write_text(json.dumps(data), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        logger.error("Поврежденный файл метрик: %s", path)
+        return None
+
+
+def _snapshot_name():
+    return f'{os.getpid()}-{_process_name}{SNAPSHOT_SUFFIX}'
+
+
+def write_snapshot():
+    """Записывает значения процесса в DIR; вызывается фоновым потоком и при выходе"""
+    root = metrics_dir()
+    if root is None or _process_name is None:
+        return
+    root.mkdir(parents=True, exist_ok=True)
+    _write_json(root / _snapshot_name(), _encode(snapshot()))
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _snapshot_files(root):
+    """{имя файла: pid} снимков процессов"""
+    files = {}
+    for entry in os.scandir(root):
+        pid, _, rest = entry.name.partition('-')
+        if entry.name.endswith(SNAPSHOT_SUFFIX) and rest and pid.isdigit():
+            files[entry.name] = int(pid)
+    return files
+
+
+class _DirectoryLock:
+    """Исключительная блокировка каталога на время сборки (только между запросами /metrics)"""
+
+    def __init__(self, root):
+        self.path = root / LOCK_NAME
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+
+def collect():
+    """Значения всех процессов: свои - из памяти, остальные - из файлов DIR"""
+    total = snapshot()
+    root = metrics_dir()
+    if root is None or not root.is_dir():
+        return total
+    own = _snapshot_name() if _process_name is not None else None
+    with _DirectoryLock(root):
+        files = _snapshot_files(root)
+        finished = {name for name, pid in files.items() if name != own and not _process_alive(pid)}
+        archive = _read_json(root / ARCHIVE_NAME) or {}
+        if finished and fcntl is not None:
+            merged = _decode(archive)
+            for name in finished:
+                data = _read_json(root / name)
+                if data is not None:
+                    merged.merge(*_counts(_decode(data)))
+            archive = _encode(merged)
+            _write_json(root / ARCHIVE_NAME, archive)
+            for name in finished:
+                (root / name).unlink(missing_ok=True)
+            files = {name: pid for name, pid in files.items() if name not in finished}
+        total.merge(*_counts(_decode(archive)))
+        for name in files:
+            if name == own:
+                continue
+            data = _read_json(root / name)
+            if data is not None:
+                total.merge(*_counts(_decode(data)))
+    return total
+
+
+def _counts(registry):
+    return registry.counters, registry.histograms
+
+
+def _flush_periodically(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_snapshot()
+        except OSError:
+            logger.exception("Не удалось записать метрики процесса")
+
+
+def _start_flusher():
+    """Фоновый поток записи снимков - один на процесс"""
+    global _flusher, _flusher_pid, _process_name
+    if _flusher_pid == os.getpid():
+        return
+    with _registries_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+        _process_name = uuid.uuid4().hex[:12]
+        interval = _config('FLUSH_INTERVAL', 5)
+        if metrics_dir() is not None and interval:
+            _flusher = threading.Thread(
+                target=_flush_periodically, args=(interval,), name='metrics-flush', daemon=True,
+            )
+            _flusher.start()
+            atexit.register(write_snapshot)
+
+
+def _reset_after_fork():
+    """Дочерний процесс (gunicorn --preload) начинает со своих значений"""
+    global _local, _registries, _finished_threads, _registries_lock, _flusher, _flusher_pid, _process_name
+    _local = threading.local()
+    _registries = []
+    _finished_threads = _Registry()
+    _registries_lock = threading.Lock()
+    _flusher = _flusher_pid = _process_name = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# --- Экспозиция ---
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render(registry, gauges, buckets=DURATION_BUCKETS):
+    lines = []
+    by_name = {}
+    for (name, labels), value in registry.counters.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for (name, labels), values in registry.histograms.items():
+        by_name.setdefault(name, []).append((labels, values))
+    for name, value in gauges.items():
+        by_name[name] = [((), value)]
+
+    for name in sorted(by_name):
+        kind, help_text = METRICS.get(name, ('untyped', ''))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(by_name[name]):
+            if kind != 'histogram':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip([*map(str, buckets), '+Inf'], value[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(value[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def gauges():
+    return {
+        'journal_contact_queue_pending': contact_queue.pending_count(),
+        'journal_contact_queue_claimed': contact_queue.claimed_count(),
+    }
+
+
+def metrics_view(request):
+    """Метрики для Prometheus; доступны только с адресов ALLOWED_IPS"""
+    if not enabled() or client_ip(request) not in _config('ALLOWED_IPS', ['127.0.0.1', '::1']):
+        raise Http404
+    response = HttpResponse(render(collect(), gauges()), content_type='text/plain; version=0.0.4; charset=utf-8')
+    add_never_cache_headers(response)
+    return response
@@ -0,0 +1,218 @@
+import logging
+import mimetypes
+import os
+import random
+import re
+from functools import lru_cache
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from . import metrics, timing
+from .storage import ENCODING_SUFFIXES
+
+# Имена вида main.3f2a1b9c0d1e.css - содержимое по такому адресу никогда не меняется
+_HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.')
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+timing_logger = logging.getLogger('journal.timing')
+
+
+@lru_cache(maxsize=None)
+def _static_prefix():
+    return '/' + settings.STATIC_URL.lstrip('/')
+
+
+def _accepted_encodings(request):
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Отдает статику из STATIC_ROOT, выбирая заранее сжатую копию (.br/.gz)
+    по Accept-Encoding. Файлам с хэшем в имени ставится кэш на год, остальным -
+    на час; повторная проверка (If-None-Match / If-Modified-Since) получает 304.
+
+    Нужен, когда статику отдает сам Django (например, без nginx);
+    если файла в STATIC_ROOT нет (режим разработки), запрос идет дальше.
+    Работает и под ASGI, не переводя остальную цепочку в синхронный режим.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _is_static(self, request):
+        return request.method in ('GET', 'HEAD') and settings.STATIC_ROOT and request.path.startswith(_static_prefix())
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve(request) if self._is_static(request) else None
+        return response or self.get_response(request)
+
+    async def __acall__(self, request):
+        response = None
+        if self._is_static(request):
+            response = await sync_to_async(self.serve, thread_sensitive=False)(request)
+        return response or await self.get_response(request)
+
+    def serve(self, request):
+        name = request.path[len(_static_prefix()):]
+        root = os.path.realpath(settings.STATIC_ROOT)
+        path = os.path.realpath(os.path.join(root, name))
+        if not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return None
+
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        accepted = _accepted_encodings(request)
+        served_path, encoding = path, None
+        for candidate, suffix in ENCODING_SUFFIXES.items():
+            if candidate in accepted and os.path.isfile(path + suffix):
+                served_path, encoding = path + suffix, candidate
+                break
+
+        stat = os.stat(served_path)
+        # Тег различает варианты: у .br/.gz-копии другие байты
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            response = FileResponse(open(served_path, 'rb'), content_type=content_type)
+            # Имя .gz/.br-копии браузеру знать незачем
+            del response['Content-Disposition']
+            response['Content-Length'] = str(stat.st_size)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if any(os.path.isfile(path + suffix) for suffix in ENCODING_SUFFIXES.values()):
+            patch_vary_headers(response, ['Accept-Encoding'])
+        if _HASHED_NAME_RE.search(os.path.basename(name)):
+            patch_cache_control(response, public=True, max_age=STATIC_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=60 * 60)
+        return response
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+class ServerTimingMiddleware:
+    """
+    Время ответа, SQL (время и число запросов) и рендера шаблонов (см. timing.py).
+
+    Сотрудникам (is_staff) - заголовок Server-Timing на каждом ответе (видно во
+    вкладке Network браузера); в журнал journal.timing - поля по доле SAMPLE_RATE
+    всех запросов. У потоковых ответов (PDF, API) в журнал дополнительно пишутся
+    время и объем отдачи тела - оно читается уже после ответа middleware, поэтому
+    в заголовок не попадает. Если включены метрики (JOURNAL_METRICS, см. metrics.py),
+    замеряется каждый запрос и замер попадает в /metrics; иначе остальные запросы
+    не замеряются.
+    Стоит первым в MIDDLEWARE, чтобы замер включал и остальные middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        timing.install_on_open_connections()
+
+    def _plan(self, request):
+        """(писать в журнал?, может ли быть сотрудник?, замерять?) - без обращения к БД"""
+        rate = getattr(settings, 'JOURNAL_SERVER_TIMING', {}).get('SAMPLE_RATE', 0)
+        sampled, maybe_staff = random.random() < rate, settings.SESSION_COOKIE_NAME in request.COOKIES
+        return sampled, maybe_staff, sampled or maybe_staff or metrics.enabled()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sampled, maybe_staff, measured = self._plan(request)
+        if not measured:
+            return self.get_response(request)
+        measure, token = timing.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            timing.stop(token)
+        measure.finish()
+        user = getattr(request, 'user', None)
+        return self._finish(request, response, measure, maybe_staff and user is not None and user.is_staff, sampled)
+
+    async def __acall__(self, request):
+        sampled, maybe_staff, measured = self._plan(request)
+        if not measured:
+            return await self.get_response(request)
+        measure, token = timing.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timing.stop(token)
+        measure.finish()
+        staff = maybe_staff and hasattr(request, 'auser') and (await request.auser()).is_staff
+        return self._finish(request, response, measure, staff, sampled)
+
+    def _finish(self, request, response, measure, staff, sampled):
+        if metrics.enabled():
+            metrics.observe_request(request, response, measure)
+        if staff:
+            response['Server-Timing'] = ', '.join([
+                f'app;dur={_ms(measure.total)};desc="view and middleware"',
+                f'db;dur={_ms(measure.db)};desc="{measure.queries} queries"',
+                f'tpl;dur={_ms(measure.template)};desc="templates"',
+            ])
+        if sampled:
+            fields = {
+                'method': request.method,
+                'path': request.path,
+                'view': request.resolver_match.view_name if request.resolver_match else '',
+                'status': response.status_code,
+                'total_ms': _ms(measure.total),
+                'db_ms': _ms(measure.db),
+                'db_queries': measure.queries,
+                'template_ms': _ms(measure.template),
+            }
+            if response.streaming:
+                # Обертка отключает wsgi.file_wrapper (sendfile) - только для запросов из выборки
+                wrap = self._astream if response.is_async else self._stream
+                response.streaming_content = wrap(response.streaming_content, fields)
+            else:
+                self._log(fields)
+        return response
+
+    def _log(self, fields):
+        timing_logger.info(' '.join(f'{key}={value}' for key, value in fields.items()), extra={'timing': fields})
+
+    def _stream(self, content, fields):
+        started, size = perf_counter(), 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            self._log({**fields, 'stream_ms': _ms(perf_counter() - started), 'bytes': size})
+
+    async def _astream(self, content, fields):
+        started, size = perf_counter(), 0
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            self._log({**fields, 'stream_ms': _ms(perf_counter() - started), 'bytes': size})
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:10
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def file_sha256(storage, name, chunk_size=64 * 1024):
+    """sha256 содержимого файла (копия journal.files.file_sha256 на момент миграции)"""
+    digest = hashlib.sha256()
+    with storage.open(name, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fill_fingerprints(apps, schema_editor):
+    """Считает отпечатки для уже загруженных файлов"""
+    specs = [
+        ('Article', [('pdf_file', 'pdf')]),
+        ('JournalIssue', [('cover', 'cover'), ('full_pdf', 'full_pdf')]),
+    ]
+    for model_name, fields in specs:
+        model = apps.get_model('journal', model_name)
+        for obj in model.objects.iterator():
+            changes = {}
+            for field_name, prefix in fields:
+                field_file = getattr(obj, field_name)
+                if not field_file:
+                    continue
+                try:
+                    changes[f'{prefix}_size'] = field_file.storage.size(field_file.name)
+                    changes[f'{prefix}_mtime'] = field_file.storage.get_modified_time(field_file.name)
+                    changes[f'{prefix}_sha256'] = file_sha256(field_file.storage, field_file.name)
+                except OSError:
+                    # Файл отсутствует на диске - отпечаток посчитается при следующем сохранении
+                    for suffix in ('size', 'mtime', 'sha256'):
+                        changes.pop(f'{prefix}_{suffix}', None)
+            if changes:
+                model.objects.filter(pk=obj.pk).update(**changes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0003_alter_archiveyear_options_alter_article_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='pdf_mtime',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Изменение PDF'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='pdf_sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256 PDF'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='pdf_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Размер PDF'),
+        ),
+        migrations.AddField(
+            model_name='journalissue',
+            name='cover_mtime',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Изменение обложки'),
+        ),
+        migrations.AddField(
+            model_name='journalissue',
+            name='cover_sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256 обложки'),
+        ),
+        migrations.AddField(
+            model_name='journalissue',
+            name='cover_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Размер обложки'),
+        ),
+        migrations.AddField(
+            model_name='journalissue',
+            name='full_pdf_mtime',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Изменение PDF выпуска'),
+        ),
+        migrations.AddField(
+            model_name='journalissue',
+            name='full_pdf_sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='SHA-256 PDF выпуска'),
+        ),
+        migrations.AddField(
+            model_name='journalissue',
+            name='full_pdf_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Размер PDF выпуска'),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+    ]
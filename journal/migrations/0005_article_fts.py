@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_fts_table(apps, schema_editor):
+    """
+    Виртуальная таблица FTS5 для поиска по статьям (только SQLite).
+    Индекс заполняется после migrate (journal.signals.fill_search_index): нормализация текста
+    живет в journal.search и меняется, а миграция должна давать один и тот же результат.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS journal_article_fts "
+        "USING fts5(title, authors, abstract, tokenize='porter unicode61 remove_diacritics 2')"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS journal_article_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0004_file_fingerprints'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:12
+
+import django.db.models.deletion
+
+from django.db import migrations, models
+
+
+def add_fts_body_column(apps, schema_editor):
+    """
+    Пересоздает индекс FTS5 с колонкой body для текста из PDF.
+    Пересозданный индекс пуст - его заполняет обработчик post_migrate вместе
+    с уже извлеченными текстами (journal.signals.fill_search_index, см. 0005_article_fts).
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS journal_article_fts")
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE journal_article_fts "
+        "USING fts5(title, authors, abstract, body, tokenize='porter unicode61 remove_diacritics 2')"
+    )
+
+
+def remove_fts_body_column(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS journal_article_fts")
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE journal_article_fts "
+        "USING fts5(title, authors, abstract, tokenize='porter unicode61 remove_diacritics 2')"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0005_article_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalissue',
+            name='full_pdf_first_page',
+            field=models.IntegerField(default=1, help_text='Номер страницы журнала, с которой начинается полный PDF (для разбиения по статьям)', verbose_name='Номер первой страницы в PDF выпуска'),
+        ),
+        migrations.CreateModel(
+            name='ArticleText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_hash', models.CharField(max_length=100, verbose_name='Хэш источника')),
+                ('compressed_text', models.BinaryField(verbose_name='Текст (zlib)')),
+                ('extracted_at', models.DateTimeField(auto_now=True, verbose_name='Дата извлечения')),
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='extracted_text', to='journal.article', verbose_name='Статья')),
+            ],
+            options={
+                'verbose_name': 'Текст статьи',
+                'verbose_name_plural': 'Тексты статей',
+            },
+        ),
+        migrations.RunPython(add_fts_body_column, remove_fts_body_column),
+    ]
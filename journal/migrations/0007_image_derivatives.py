@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:13
+
+import journal.models
+from django.db import migrations, models
+from PIL import Image
+
+
+def fill_dimensions(apps, schema_editor):
+    """Размеры уже загруженных картинок - чтобы Django не открывал файлы при каждой загрузке модели"""
+    for model_name, field_name in (('JournalIssue', 'cover'), ('EditorialBoard', 'photo')):
+        model = apps.get_model('journal', model_name)
+        for obj in model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}):
+            field_file = getattr(obj, field_name)
+            try:
+                with field_file.storage.open(field_file.name, 'rb') as fh, Image.open(fh) as image:
+                    width, height = image.size
+            except (OSError, ValueError):
+                continue
+            model.objects.filter(pk=obj.pk).update(**{f'{field_name}_width': width, f'{field_name}_height': height})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0006_article_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='editorialboard',
+            name='photo_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты фото'),
+        ),
+        migrations.AddField(
+            model_name='editorialboard',
+            name='photo_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота фото'),
+        ),
+        migrations.AddField(
+            model_name='editorialboard',
+            name='photo_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина фото'),
+        ),
+        migrations.AddField(
+            model_name='journalissue',
+            name='cover_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты обложки'),
+        ),
+        migrations.AddField(
+            model_name='journalissue',
+            name='cover_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота обложки'),
+        ),
+        migrations.AddField(
+            model_name='journalissue',
+            name='cover_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина обложки'),
+        ),
+        migrations.AlterField(
+            model_name='editorialboard',
+            name='photo',
+            field=models.ImageField(blank=True, height_field='photo_height', null=True, upload_to='editorial/', verbose_name='Фото', width_field='photo_width'),
+        ),
+        migrations.AlterField(
+            model_name='journalissue',
+            name='cover',
+            field=models.ImageField(blank=True, height_field='cover_height', null=True, upload_to=journal.models.issue_cover_path, verbose_name='Обложка (картинка)', width_field='cover_width'),
+        ),
+        migrations.RunPython(fill_dimensions, migrations.RunPython.noop),
+    ]
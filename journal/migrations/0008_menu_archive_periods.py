@@ -0,0 +1,25 @@
+from django.db import migrations
+
+# Периоды, на которые ссылается меню "Архив" в base.html
+MENU_PERIODS = [(2020, 2025), (2010, 2019), (2000, 2009)]
+
+
+def create_menu_periods(apps, schema_editor):
+    """Страница архива открывается только для существующих периодов - создаем те, что есть в меню"""
+    ArchiveYear = apps.get_model('journal', 'ArchiveYear')
+    for start_year, end_year in MENU_PERIODS:
+        ArchiveYear.objects.get_or_create(
+            slug=f'{start_year}-{end_year}',
+            defaults={'start_year': start_year, 'end_year': end_year},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0007_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_menu_periods, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:25
+
+import re
+
+from django.db import migrations, models
+
+_LEADING_NUMBER_RE = re.compile(r'\d+')
+
+
+def issue_number_key(number):
+    """Числовой ключ номера выпуска (копия journal.models.issue_number_key на момент миграции)"""
+    match = _LEADING_NUMBER_RE.search(number or '')
+    return int(match.group()) if match else 0
+
+
+def fill_number_sort(apps, schema_editor):
+    JournalIssue = apps.get_model('journal', 'JournalIssue')
+    for issue in JournalIssue.objects.only('pk', 'number'):
+        JournalIssue.objects.filter(pk=issue.pk).update(number_sort=issue_number_key(issue.number))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0008_menu_archive_periods'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='journalissue',
+            options={'ordering': ['-year', '-number_sort', '-number'], 'verbose_name': 'Выпуск', 'verbose_name_plural': 'Выпуски'},
+        ),
+        migrations.AddField(
+            model_name='journalissue',
+            name='number_sort',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Номер для сортировки'),
+        ),
+        migrations.RunPython(fill_number_sort, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['issue', 'page_start'], name='article_issue_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['issue', 'page_start'], name='article_issue_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['page_start'], name='article_published_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['created_at'], name='contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='editorialboard',
+            index=models.Index(fields=['order', 'name'], name='board_order_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalissue',
+            index=models.Index(fields=['year', 'number_sort', 'number'], name='issue_year_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalissue',
+            index=models.Index(condition=models.Q(('is_current', True)), fields=['year', 'number_sort', 'number'], name='issue_current_idx'),
+        ),
+    ]
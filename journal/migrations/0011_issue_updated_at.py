@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:34
+
+from django.db import migrations, models
+
+
+def fill_updated_at(apps, schema_editor):
+    JournalIssue = apps.get_model('journal', 'JournalIssue')
+    JournalIssue.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0010_article_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalissue',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения записи'),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,14 @@
 import os
-from django.db import models
+import re
+import zlib
+from functools import partial
+
+from django.db import models, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .files import file_sha256
+from .images import build_derivatives, delete_derivatives
 
 # --- Вспомогательные функции для путей сохранения ---
 def issue_cover_path(instance, filename):
@@ -11,31 +20,193 @@ def issue_pdf_path(instance, filename):
 def article_pdf_path(instance, filename):
     return f'articles/{instance.issue.year}/{instance.issue.number}/{filename}'
 
+# --- Числовой ключ сортировки номера выпуска ---
+_LEADING_NUMBER_RE = re.compile(r'\d+')
+
+
+def issue_number_key(number):
+    """'10' -> 10, '3-4' -> 3, 'Спецвыпуск' -> 0: номер выпуска для сортировки по числу, а не по строке"""
+    match = _LEADING_NUMBER_RE.search(number or '')
+    return int(match.group()) if match else 0
+
+# --- Отпечатки файлов (хэш, размер, время изменения) ---
+
+class FileFingerprintMixin:
+    """
+    Хранит sha256, размер и время изменения файлов рядом с полями FileField.
+    Считается один раз после сохранения загруженного файла и дальше
+    используется как ETag / Last-Modified без обращения к диску.
+
+    Сохранение вместе с отпечатками идет в одной транзакции: обработчики
+    post_save через transaction.on_commit видят уже записанные хэши.
+    """
+    # {'имя FileField': 'префикс полей <префикс>_sha256/_size/_mtime'}
+    fingerprint_fields = {}
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            self._save_with_fingerprints(*args, **kwargs)
+
+    def _save_with_fingerprints(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        changes = {}
+        for field_name, prefix in self.fingerprint_fields.items():
+            changes.update(self._fingerprint_changes(getattr(self, field_name), prefix))
+        if changes:
+            for attr, value in changes.items():
+                setattr(self, attr, value)
+            type(self)._default_manager.filter(pk=self.pk).update(**changes)
+
+    def _fingerprint_changes(self, field_file, prefix):
+        names = (f'{prefix}_sha256', f'{prefix}_size', f'{prefix}_mtime')
+        current = tuple(getattr(self, name) for name in names)
+
+        if not field_file:
+            new = ('', None, None)
+        else:
+            try:
+                size = field_file.storage.size(field_file.name)
+                mtime = field_file.storage.get_modified_time(field_file.name)
+            except (OSError, NotImplementedError):
+                return {}
+            # Файл не менялся - хэш не пересчитываем
+            if current[0] and current[1:] == (size, mtime):
+                return {}
+            new = (file_sha256(field_file.storage, field_file.name), size, mtime)
+
+        if new == current:
+            return {}
+        return dict(zip(names, new))
+
+    def file_validators(self, prefix):
+        """(ETag, Last-Modified timestamp) для файла с данным префиксом"""
+        sha256 = getattr(self, f'{prefix}_sha256')
+        mtime = getattr(self, f'{prefix}_mtime')
+        etag = f'"{sha256}"' if sha256 else None
+        return etag, (mtime.timestamp() if mtime else None)
+
+
+# --- Адаптивные варианты изображений ---
+
+class ImageDerivativesMixin:
+    """
+    После загрузки картинки создает ее уменьшенные WebP/AVIF-варианты
+    и LQIP-заглушку (см. images.py) и сохраняет их описание в JSON-поле.
+    """
+    # {'имя ImageField': 'имя JSONField с описанием вариантов'}
+    derivative_fields = {}
+
+    def save(self, *args, **kwargs):
+        # Как и отпечатки файлов - в одной транзакции с сохранением (см. FileFingerprintMixin)
+        with transaction.atomic(using=kwargs.get('using')):
+            self._save_with_derivatives(*args, **kwargs)
+
+    def _save_with_derivatives(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        changes = {}
+        for field_name, target in self.derivative_fields.items():
+            field_file = getattr(self, field_name)
+            current = getattr(self, target) or {}
+            source = field_file.name if field_file else ''
+            if current.get('source', '') == source:
+                continue
+            # Варианты прежней картинки удаляются после фиксации: при откате запись ссылается на них
+            transaction.on_commit(partial(delete_derivatives, field_file.storage, current), using=kwargs.get('using'))
+            try:
+                changes[target] = build_derivatives(field_file) if field_file else {}
+            except (OSError, ValueError):
+                # Файл не открылся как картинка - отдаем оригинал без вариантов
+                changes[target] = {'source': source}
+        if changes:
+            for attr, value in changes.items():
+                setattr(self, attr, value)
+            type(self)._default_manager.filter(pk=self.pk).update(**changes)
+
+    def delete_derivative_files(self):
+        """Удаляет файлы вариантов всех картинок (при удалении записи, см. signals.py)"""
+        for field_name, target in self.derivative_fields.items():
+            delete_derivatives(getattr(self, field_name).storage, getattr(self, target))
+
+
 # --- Основные модели ---
 
-class JournalIssue(models.Model):
+class JournalIssue(ImageDerivativesMixin, FileFingerprintMixin, models.Model):
     """Модель выпуска журнала"""
     year = models.IntegerField(verbose_name="Год издания", default=2024)
     volume = models.CharField(max_length=50, verbose_name="Том (например, 67)", blank=True)
     number = models.CharField(max_length=50, verbose_name="Номер выпуска")
+    # Заполняется из number при сохранении: "10" должен идти после "9"
+    number_sort = models.PositiveIntegerField(default=0, editable=False, verbose_name="Номер для сортировки")
     publication_date = models.DateField(verbose_name="Дата выхода", blank=True, null=True)
     is_current = models.BooleanField(default=False, verbose_name="Текущий выпуск (на главной)")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания записи")
+    # lastmod в карте сайта
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения записи")
     
     # Файлы
-    cover = models.ImageField(upload_to=issue_cover_path, verbose_name="Обложка (картинка)", blank=True, null=True)
+    cover = models.ImageField(upload_to=issue_cover_path, verbose_name="Обложка (картинка)", blank=True, null=True,
+                              width_field='cover_width', height_field='cover_height')
     full_pdf = models.FileField(upload_to=issue_pdf_path, verbose_name="Полный PDF выпуска", blank=True, null=True)
 
+    # Размеры и адаптивные варианты обложки (заполняются автоматически)
+    cover_width = models.PositiveIntegerField(blank=True, null=True, editable=False, verbose_name="Ширина обложки")
+    cover_height = models.PositiveIntegerField(blank=True, null=True, editable=False, verbose_name="Высота обложки")
+    cover_derivatives = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Варианты обложки")
+
+    # Отпечатки файлов (заполняются автоматически при сохранении)
+    cover_sha256 = models.CharField(max_length=64, blank=True, editable=False, verbose_name="SHA-256 обложки")
+    cover_size = models.PositiveBigIntegerField(blank=True, null=True, editable=False, verbose_name="Размер обложки")
+    cover_mtime = models.DateTimeField(blank=True, null=True, editable=False, verbose_name="Изменение обложки")
+    full_pdf_sha256 = models.CharField(max_length=64, blank=True, editable=False, verbose_name="SHA-256 PDF выпуска")
+    full_pdf_size = models.PositiveBigIntegerField(blank=True, null=True, editable=False, verbose_name="Размер PDF выпуска")
+    full_pdf_mtime = models.DateTimeField(blank=True, null=True, editable=False, verbose_name="Изменение PDF выпуска")
+    full_pdf_first_page = models.IntegerField(
+        default=1, verbose_name="Номер первой страницы в PDF выпуска",
+        help_text="Номер страницы журнала, с которой начинается полный PDF (для разбиения по статьям)",
+    )
+
+    fingerprint_fields = {'cover': 'cover', 'full_pdf': 'full_pdf'}
+    derivative_fields = {'cover': 'cover_derivatives'}
+
     def __str__(self):
         return f"{self.year}. Т.{self.volume}. №{self.number}"
 
+    def save(self, *args, **kwargs):
+        self.number_sort = issue_number_key(self.number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'number_sort'}
+        super().save(*args, **kwargs)
+
+    @property
+    def cover_version(self):
+        """Версия обложки для адреса (?v=...); пустая, пока хэш не посчитан"""
+        return self.cover_sha256[:12]
+
+    @property
+    def cover_url(self):
+        """URL обложки с версией по хэшу - такой адрес можно кэшировать навсегда"""
+        if not self.cover:
+            return ''
+        url = reverse('issue_cover', args=[self.pk])
+        return f"{url}?v={self.cover_version}" if self.cover_version else url
+
     class Meta:
         verbose_name = "Выпуск"
         verbose_name_plural = "Выпуски"
-        ordering = ['-year', '-number']
+        ordering = ['-year', '-number_sort', '-number']
+        # SQLite читает индекс и в обратную сторону, так что возрастающие индексы
+        # покрывают сортировку по убыванию (вместе с -pk, который добавляет админка)
+        indexes = [
+            # Списки выпусков, архив по диапазону лет (year__gte/lte) и сортировка по умолчанию
+            models.Index(fields=['year', 'number_sort', 'number'], name='issue_year_number_idx'),
+            # Текущий выпуск: в индексе только строки с is_current=True
+            models.Index(fields=['year', 'number_sort', 'number'], condition=models.Q(is_current=True),
+                         name='issue_current_idx'),
+        ]
 
 
-class Article(models.Model):
+class Article(FileFingerprintMixin, models.Model):
     """Модель отдельной статьи"""
     issue = models.ForeignKey(JournalIssue, on_delete=models.CASCADE, related_name='articles', verbose_name="Выпуск")
     
@@ -46,30 +217,83 @@ class Article(models.Model):
     
     # Файл
     pdf_file = models.FileField(upload_to=article_pdf_path, verbose_name="PDF файл статьи", blank=True, null=True)
+    pdf_sha256 = models.CharField(max_length=64, blank=True, editable=False, verbose_name="SHA-256 PDF")
+    pdf_size = models.PositiveBigIntegerField(blank=True, null=True, editable=False, verbose_name="Размер PDF")
+    pdf_mtime = models.DateTimeField(blank=True, null=True, editable=False, verbose_name="Изменение PDF")
+
+    fingerprint_fields = {'pdf_file': 'pdf'}
     
     # Дополнительно
     page_start = models.IntegerField(verbose_name="Стр. начало", default=0)
     page_end = models.IntegerField(verbose_name="Стр. конец", default=0)
     is_published = models.BooleanField(default=True, verbose_name="Опубликовано")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    # Для выборочного сбора метаданных (OAI-PMH from/until); обновляется и при изменении выпуска
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата изменения")
 
     def __str__(self):
         return self.title[:50] + "..."
 
+    def get_absolute_url(self):
+        return reverse('article_detail', args=[self.pk])
+
     class Meta:
         verbose_name = "Статья"
         verbose_name_plural = "Статьи"
         ordering = ['page_start']
+        indexes = [
+            # Статьи выпуска по порядку страниц (issue.articles.all, prefetch в IssueDetailView)
+            models.Index(fields=['issue', 'page_start'], name='article_issue_page_idx'),
+            # Опубликованные статьи выпуска
+            models.Index(fields=['issue', 'page_start'], condition=models.Q(is_published=True),
+                         name='article_issue_published_idx'),
+            # Список опубликованных статей (ArticleListView, поиск)
+            models.Index(fields=['page_start'], condition=models.Q(is_published=True),
+                         name='article_published_page_idx'),
+            # Выдача OAI-PMH по дате изменения
+            models.Index(fields=['updated_at'], condition=models.Q(is_published=True),
+                         name='article_published_updated_idx'),
+        ]
 
 
-class EditorialBoard(models.Model):
+class ArticleText(models.Model):
+    """Текст статьи, извлеченный из PDF (хранится в сжатом виде)"""
+    article = models.OneToOneField(Article, on_delete=models.CASCADE, related_name='extracted_text', verbose_name="Статья")
+    # sha256 исходного PDF (для PDF выпуска - с диапазоном страниц), чтобы не извлекать повторно
+    source_hash = models.CharField(max_length=100, verbose_name="Хэш источника")
+    compressed_text = models.BinaryField(verbose_name="Текст (zlib)")
+    extracted_at = models.DateTimeField(auto_now=True, verbose_name="Дата извлечения")
+
+    def __str__(self):
+        return f"Текст: {self.article}"
+
+    @property
+    def text(self):
+        return zlib.decompress(self.compressed_text).decode('utf-8') if self.compressed_text else ''
+
+    @text.setter
+    def text(self, value):
+        self.compressed_text = zlib.compress(value.encode('utf-8'), 9)
+
+    class Meta:
+        verbose_name = "Текст статьи"
+        verbose_name_plural = "Тексты статей"
+
+
+class EditorialBoard(ImageDerivativesMixin, models.Model):
     """Редакционная коллегия"""
     name = models.CharField(max_length=200, verbose_name="ФИО")
     position = models.CharField(max_length=200, verbose_name="Должность/Статус", blank=True)
     institution = models.CharField(max_length=300, verbose_name="Организация", blank=True)
-    photo = models.ImageField(upload_to='editorial/', verbose_name="Фото", blank=True, null=True)
+    photo = models.ImageField(upload_to='editorial/', verbose_name="Фото", blank=True, null=True,
+                              width_field='photo_width', height_field='photo_height')
+    photo_width = models.PositiveIntegerField(blank=True, null=True, editable=False, verbose_name="Ширина фото")
+    photo_height = models.PositiveIntegerField(blank=True, null=True, editable=False, verbose_name="Высота фото")
+    photo_derivatives = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Варианты фото")
     order = models.IntegerField(default=0, verbose_name="Порядок сортировки")
 
+    derivative_fields = {'photo': 'photo_derivatives'}
+
     def __str__(self):
         return self.name
 
@@ -77,6 +301,7 @@ class EditorialBoard(models.Model):
         verbose_name = "Член редсовета"
         verbose_name_plural = "Редакционная коллегия"
         ordering = ['order', 'name']
+        indexes = [models.Index(fields=['order', 'name'], name='board_order_name_idx')]
 
 
 class ContactMessage(models.Model):
@@ -85,8 +310,12 @@ class ContactMessage(models.Model):
     email = models.EmailField(verbose_name="Email")
     phone = models.CharField(max_length=20, verbose_name="Телефон", blank=True, null=True) 
     message = models.TextField(verbose_name="Сообщение")
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата отправки")
+    # Не auto_now_add: сообщения пишутся из очереди пачкой, а дата - время отправки формы
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Дата отправки")
     is_processed = models.BooleanField(default=False, verbose_name="Обработано")
+    # Имя файла очереди (см. contact_queue.py): повторная запись той же пачки не создает дублей
+    queue_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False,
+                                 verbose_name="Ключ очереди")
 
     def __str__(self):
         return f"Сообщение от {self.name} ({self.created_at})"
@@ -94,6 +323,8 @@ class ContactMessage(models.Model):
     class Meta:
         verbose_name = "Сообщение"
         verbose_name_plural = "Сообщения с сайта"
+        # Список сообщений в админке - новые сверху
+        indexes = [models.Index(fields=['created_at'], name='contact_created_idx')]
 
 
 class JournalInfo(models.Model):
@@ -0,0 +1,482 @@
+"""
+OAI-PMH 2.0 для сборщиков метаданных (eLibrary, DOAJ, BASE, Google Scholar): /oai/
+
+Записи - опубликованные статьи, идентификатор oai:<REPOSITORY_IDENTIFIER>:article/<id>,
+дата записи - Article.updated_at (меняется и при изменении выпуска).
+- форматы: oai_dc (Dublin Core) и jats (заголовок статьи в стиле JATS);
+- наборы: year:<год> и year:<год>:issue:<id выпуска>;
+- ListRecords/ListIdentifiers отдают по PAGE_SIZE записей потоком и
+  resumptionToken со следующей страницей; страницы выбираются курсором
+  по (updated_at, id) через индекс, поэтому любая страница стоит одного запроса.
+Удаления не отслеживаются (deletedRecord = no).
+"""
+import base64
+import binascii
+import datetime
+import json
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+from django.db.models import Min
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from .models import Article, JournalInfo, JournalIssue
+from .pagination import FORWARD, CursorPaginator, InvalidCursor
+
+DATESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+# Сколько строк читать из БД за раз при потоковой отдаче
+STREAM_CHUNK_SIZE = 200
+ORDERING = ['updated_at', 'pk']
+
+JATS_SCHEMA = 'https://jats.nlm.nih.gov/publishing/1.1/xsd/JATS-journalpublishing1.xsd'
+
+# Префикс -> (схема, metadataNamespace). У элементов JATS нет пространства имен:
+# в записи <article xmlns=""> со схемой в xsi:noNamespaceSchemaLocation, а
+# metadataNamespace (обязателен в OAI-PMH) - адрес описания JATS Publishing 1.1
+METADATA_FORMATS = {
+    'oai_dc': ('http://www.openarchives.org/OAI/2.0/oai_dc.xsd', 'http://www.openarchives.org/OAI/2.0/oai_dc/'),
+    'jats': (JATS_SCHEMA, 'https://jats.nlm.nih.gov/publishing/1.1/'),
+}
+
+# Обязательные и необязательные аргументы каждого запроса (кроме verb)
+VERBS = {
+    'Identify': (set(), set()),
+    'ListMetadataFormats': (set(), {'identifier'}),
+    'ListSets': (set(), set()),
+    'GetRecord': ({'identifier', 'metadataPrefix'}, set()),
+    'ListIdentifiers': ({'metadataPrefix'}, {'from', 'until', 'set'}),
+    'ListRecords': ({'metadataPrefix'}, {'from', 'until', 'set'}),
+}
+
+_SET_RE = re.compile(r'^year:(\d{4})(?::issue:(\d+))?$')
+# Управляющие символы, недопустимые в XML 1.0
+_INVALID_XML_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class OaiError(Exception):
+    """Ошибка протокола: код из спецификации OAI-PMH и пояснение"""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def _config(name, default):
+    return getattr(settings, 'JOURNAL_OAI', {}).get(name, default)
+
+
+def _text(value):
+    return escape(_INVALID_XML_RE.sub('', str(value)))
+
+
+def _element(tag, value, **attrs):
+    """<tag pub-type="...">значение</tag> (pub_type=...); пустые значения пропускаются"""
+    if value is None or value == '':
+        return ''
+    attributes = ''.join(f' {name.replace("_", "-")}={quoteattr(str(v))}' for name, v in attrs.items())
+    return f'<{tag}{attributes}>{_text(value)}</{tag}>'
+
+
+def _datestamp(value):
+    return value.astimezone(datetime.timezone.utc).strftime(DATESTAMP_FORMAT)
+
+
+def _identifier(article_id):
+    return f"oai:{_config('REPOSITORY_IDENTIFIER', 'localhost')}:article/{article_id}"
+
+
+def _article_id(identifier):
+    prefix = _identifier('')
+    if not identifier.startswith(prefix) or not identifier[len(prefix):].isdigit():
+        raise OaiError('idDoesNotExist', f"Неизвестный идентификатор {identifier}")
+    return int(identifier[len(prefix):])
+
+
+def _authors(article):
+    return [name.strip() for name in re.split(r'[,;]', article.authors) if name.strip()]
+
+
+def _parse_datestamp(value, argument):
+    """(момент, точность) для from/until: YYYY-MM-DD или YYYY-MM-DDThh:mm:ssZ"""
+    for fmt, step in ((DATESTAMP_FORMAT, datetime.timedelta(seconds=1)), ('%Y-%m-%d', datetime.timedelta(days=1))):
+        try:
+            moment = datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        return moment.replace(tzinfo=datetime.timezone.utc), step
+    raise OaiError('badArgument', f"Некорректная дата в {argument}: {value}")
+
+
+def _arguments(params):
+    """verb и аргументы запроса с проверкой по VERBS"""
+    verb = params.get('verb')
+    if verb not in VERBS or len(params.getlist('verb')) != 1:
+        raise OaiError('badVerb', "Неизвестный или повторенный verb")
+    arguments = {}
+    for name in params:
+        if name == 'verb':
+            continue
+        if len(params.getlist(name)) != 1:
+            raise OaiError('badArgument', f"Аргумент {name} повторяется")
+        arguments[name] = params[name]
+
+    required, optional = VERBS[verb]
+    if 'resumptionToken' in arguments and verb in ('ListIdentifiers', 'ListRecords'):
+        if len(arguments) > 1:
+            raise OaiError('badArgument', "resumptionToken нельзя сочетать с другими аргументами")
+        return verb, arguments
+    unknown = set(arguments) - required - optional
+    missing = required - set(arguments)
+    if unknown or missing:
+        raise OaiError('badArgument', f"Лишние аргументы: {', '.join(sorted(unknown)) or '-'}; "
+                                      f"не хватает: {', '.join(sorted(missing)) or '-'}")
+    return verb, arguments
+
+
+# --- Маркер продолжения ---
+
+def encode_token(arguments, cursor, position):
+    data = json.dumps([arguments, cursor, position], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """(исходные аргументы списка, курсор, номер первой записи) из resumptionToken"""
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        arguments, cursor, position = json.loads(data)
+    except (binascii.Error, ValueError, TypeError):
+        raise OaiError('badResumptionToken', "Некорректный resumptionToken")
+    if not isinstance(arguments, dict) or not isinstance(cursor, str) or not isinstance(position, int):
+        raise OaiError('badResumptionToken', "Некорректный resumptionToken")
+    return arguments, cursor, position
+
+
+# --- Выборка записей ---
+
+def _records_queryset(arguments):
+    """Опубликованные статьи по аргументам ListRecords/ListIdentifiers (от самых старых изменений)"""
+    if arguments['metadataPrefix'] not in METADATA_FORMATS:
+        raise OaiError('cannotDisseminateFormat', f"Формат {arguments['metadataPrefix']} не поддерживается")
+    queryset = Article.objects.filter(is_published=True)
+
+    bounds = {}
+    for argument in ('from', 'until'):
+        if argument in arguments:
+            bounds[argument] = _parse_datestamp(arguments[argument], argument)
+    if len({step for _, step in bounds.values()}) > 1:
+        raise OaiError('badArgument', "У from и until разная точность")
+    if 'from' in bounds:
+        queryset = queryset.filter(updated_at__gte=bounds['from'][0])
+    if 'until' in bounds:
+        # until включительно: до конца указанного дня или секунды
+        moment, step = bounds['until']
+        queryset = queryset.filter(updated_at__lt=moment + step)
+    if 'from' in bounds and 'until' in bounds and bounds['from'][0] > bounds['until'][0]:
+        raise OaiError('badArgument', "from позже until")
+
+    if 'set' in arguments:
+        match = _SET_RE.match(arguments['set'])
+        if not match:
+            raise OaiError('noRecordsMatch', f"Набор {arguments['set']} не существует")
+        queryset = queryset.filter(issue__year=int(match.group(1)))
+        if match.group(2):
+            queryset = queryset.filter(issue_id=int(match.group(2)))
+    return queryset
+
+
+def _set_specs(issue):
+    return [f'year:{issue.year}', f'year:{issue.year}:issue:{issue.pk}']
+
+
+# --- Запись в XML ---
+
+def _header(article):
+    parts = [
+        _element('identifier', _identifier(article.pk)),
+        _element('datestamp', _datestamp(article.updated_at)),
+        *(_element('setSpec', spec) for spec in _set_specs(article.issue)),
+    ]
+    return '<header>' + ''.join(parts) + '</header>'
+
+
+def _source(article, journal):
+    issue = article.issue
+    parts = [journal.title if journal else '', str(issue.year)]
+    if issue.volume:
+        parts.append(f'Т. {issue.volume}')
+    parts.append(f'№ {issue.number}')
+    if article.page_start:
+        parts.append(f'С. {article.page_start}-{article.page_end}' if article.page_end else f'С. {article.page_start}')
+    return '. '.join(filter(None, parts))
+
+
+def _dublin_core(article, journal, request):
+    issue = article.issue
+    url = request.build_absolute_uri(article.get_absolute_url())
+    parts = [
+        _element('dc:title', article.title),
+        *(_element('dc:creator', name) for name in _authors(article)),
+        _element('dc:subject', article.rubric),
+        _element('dc:description', article.abstract),
+        _element('dc:publisher', journal.publisher if journal else ''),
+        _element('dc:date', (issue.publication_date or issue.year)),
+        _element('dc:type', 'Text'),
+        _element('dc:type', 'info:eu-repo/semantics/article'),
+        _element('dc:format', 'application/pdf' if article.pdf_file else ''),
+        _element('dc:identifier', url),
+        _element('dc:identifier', request.build_absolute_uri(reverse('download_article_pdf', args=[article.pk]))
+                 if article.pdf_file else ''),
+        _element('dc:source', _source(article, journal)),
+        _element('dc:source', f'ISSN {journal.issn_print}' if journal and journal.issn_print else ''),
+        _element('dc:source', f'ISSN {journal.issn_online}' if journal and journal.issn_online else ''),
+        _element('dc:language', 'rus'),
+    ]
+    return (
+        '<oai_dc:dc xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/" '
+        'xsi:schemaLocation="http://www.openarchives.org/OAI/2.0/oai_dc/ '
+        'http://www.openarchives.org/OAI/2.0/oai_dc.xsd">' + ''.join(parts) + '</oai_dc:dc>'
+    )
+
+
+def _jats(article, journal, request):
+    issue = article.issue
+    journal_meta = ''
+    if journal:
+        journal_meta = (
+            '<journal-meta><journal-title-group>' + _element('journal-title', journal.title) +
+            '</journal-title-group>' + _element('issn', journal.issn_print, pub_type='ppub') +
+            _element('issn', journal.issn_online, pub_type='epub') +
+            '<publisher>' + _element('publisher-name', journal.publisher) + '</publisher></journal-meta>'
+        )
+    authors = ''.join(
+        f'<contrib contrib-type="author">{_element("string-name", name)}</contrib>' for name in _authors(article)
+    )
+    pub_date = ''.join([
+        '<pub-date pub-type="collection">',
+        _element('day', issue.publication_date.day if issue.publication_date else None),
+        _element('month', issue.publication_date.month if issue.publication_date else None),
+        _element('year', issue.year),
+        '</pub-date>',
+    ])
+    self_uri = ''
+    if article.pdf_file:
+        pdf_url = request.build_absolute_uri(reverse('download_article_pdf', args=[article.pk]))
+        self_uri = f'<self-uri content-type="application/pdf" xlink:href={quoteattr(pdf_url)}/>'
+    article_meta = ''.join([
+        '<article-meta>',
+        _element('article-id', article.pk, pub_id_type='publisher-id'),
+        '<article-categories><subj-group>' + _element('subject', article.rubric) + '</subj-group></article-categories>'
+        if article.rubric else '',
+        '<title-group>' + _element('article-title', article.title) + '</title-group>',
+        f'<contrib-group>{authors}</contrib-group>' if authors else '',
+        pub_date,
+        _element('volume', issue.volume),
+        _element('issue', issue.number),
+        _element('fpage', article.page_start or None),
+        _element('lpage', article.page_end or None),
+        f'<self-uri xlink:href={quoteattr(request.build_absolute_uri(article.get_absolute_url()))}/>',
+        self_uri,
+        '<abstract>' + _element('p', article.abstract) + '</abstract>' if article.abstract else '',
+        '</article-meta>',
+    ])
+    return (
+        # xmlns="" - иначе article унаследует пространство имен OAI-PMH
+        '<article xmlns="" xmlns:xlink="http://www.w3.org/1999/xlink" '
+        'article-type="research-article" xml:lang="ru" '
+        f'xsi:noNamespaceSchemaLocation={quoteattr(JATS_SCHEMA)}>'
+        f'<front>{journal_meta}{article_meta}</front></article>'
+    )
+
+
+METADATA_WRITERS = {'oai_dc': _dublin_core, 'jats': _jats}
+
+
+def _record(article, metadata_prefix, journal, request):
+    metadata = METADATA_WRITERS[metadata_prefix](article, journal, request)
+    return f'<record>{_header(article)}<metadata>{metadata}</metadata></record>'
+
+
+# --- Ответы ---
+
+def _envelope_start(request, verb=None, arguments=None):
+    """Начало ответа; при badVerb/badArgument атрибуты запроса не повторяются"""
+    attributes = ''
+    if verb:
+        attributes = f' verb={quoteattr(verb)}' + ''.join(
+            f' {name}={quoteattr(value)}' for name, value in sorted((arguments or {}).items())
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        'xsi:schemaLocation="http://www.openarchives.org/OAI/2.0/ '
+        'http://www.openarchives.org/OAI/2.0/OAI-PMH.xsd">'
+        f'<responseDate>{_datestamp(timezone.now())}</responseDate>'
+        f'<request{attributes}>{_text(request.build_absolute_uri(reverse("oai")))}</request>'
+    )
+
+
+def _xml_response(body):
+    return HttpResponse(body, content_type='text/xml; charset=utf-8')
+
+
+def _error_response(request, error, verb=None, arguments=None):
+    echo = error.code not in ('badVerb', 'badArgument')
+    body = (
+        _envelope_start(request, verb if echo else None, arguments if echo else None)
+        + f'<error code={quoteattr(error.code)}>{_text(error)}</error></OAI-PMH>'
+    )
+    return _xml_response(body)
+
+
+def _identify(request):
+    journal = JournalInfo.objects.first()
+    earliest = Article.objects.filter(is_published=True).aggregate(earliest=Min('updated_at'))['earliest']
+    return ''.join([
+        '<Identify>',
+        _element('repositoryName', journal.title if journal else _config('REPOSITORY_IDENTIFIER', 'localhost')),
+        _element('baseURL', request.build_absolute_uri(reverse('oai'))),
+        '<protocolVersion>2.0</protocolVersion>',
+        _element('adminEmail', _config('ADMIN_EMAIL', settings.DEFAULT_FROM_EMAIL)),
+        _element('earliestDatestamp', _datestamp(earliest or timezone.now())),
+        '<deletedRecord>no</deletedRecord>',
+        '<granularity>YYYY-MM-DDThh:mm:ssZ</granularity>',
+        '<description><oai-identifier xmlns="http://www.openarchives.org/OAI/2.0/oai-identifier" '
+        'xsi:schemaLocation="http://www.openarchives.org/OAI/2.0/oai-identifier '
+        'http://www.openarchives.org/OAI/2.0/oai-identifier.xsd">',
+        '<scheme>oai</scheme>',
+        _element('repositoryIdentifier', _config('REPOSITORY_IDENTIFIER', 'localhost')),
+        '<delimiter>:</delimiter>',
+        _element('sampleIdentifier', _identifier(1)),
+        '</oai-identifier></description></Identify>',
+    ])
+
+
+def _list_metadata_formats(arguments):
+    if 'identifier' in arguments:
+        article_id = _article_id(arguments['identifier'])
+        if not Article.objects.filter(is_published=True, pk=article_id).exists():
+            raise OaiError('idDoesNotExist', f"Неизвестный идентификатор {arguments['identifier']}")
+    formats = ''.join(
+        '<metadataFormat>' + _element('metadataPrefix', prefix) + _element('schema', schema)
+        + _element('metadataNamespace', namespace) + '</metadataFormat>'
+        for prefix, (schema, namespace) in METADATA_FORMATS.items()
+    )
+    return f'<ListMetadataFormats>{formats}</ListMetadataFormats>'
+
+
+def _issues_by_year():
+    by_year = {}
+    for issue in JournalIssue.objects.only('pk', 'year', 'volume', 'number'):
+        by_year.setdefault(issue.year, []).append(issue)
+    return list(by_year.items())
+
+
+def _list_sets():
+    sets = []
+    for year, issues in _issues_by_year():
+        sets.append(f'<set>{_element("setSpec", f"year:{year}")}{_element("setName", f"{year} год")}</set>')
+        for issue in issues:
+            sets.append(f'<set>{_element("setSpec", _set_specs(issue)[1])}{_element("setName", f"Выпуск {issue}")}</set>')
+    return '<ListSets>' + ''.join(sets) + '</ListSets>'
+
+
+def _get_record(request, arguments):
+    prefix = arguments['metadataPrefix']
+    if prefix not in METADATA_FORMATS:
+        raise OaiError('cannotDisseminateFormat', f"Формат {prefix} не поддерживается")
+    article_id = _article_id(arguments['identifier'])
+    article = Article.objects.select_related('issue').filter(is_published=True, pk=article_id).first()
+    if article is None:
+        raise OaiError('idDoesNotExist', f"Неизвестный идентификатор {arguments['identifier']}")
+    journal = JournalInfo.objects.first()
+    return f'<GetRecord>{_record(article, prefix, journal, request)}</GetRecord>'
+
+
+def _list(request, verb, arguments):
+    """Потоковый ответ ListRecords/ListIdentifiers с resumptionToken следующей страницы"""
+    page_size = _config('PAGE_SIZE', 100)
+    cursor, position = None, 0
+    list_arguments = arguments
+    if 'resumptionToken' in arguments:
+        list_arguments, cursor, position = decode_token(arguments['resumptionToken'])
+        if set(list_arguments) - VERBS[verb][0] - VERBS[verb][1] or 'metadataPrefix' not in list_arguments:
+            raise OaiError('badResumptionToken', "Некорректный resumptionToken")
+    try:
+        queryset = _records_queryset(list_arguments)
+    except OaiError as exc:
+        if cursor is not None:
+            raise OaiError('badResumptionToken', str(exc))
+        raise
+    prefix = list_arguments['metadataPrefix']
+
+    if verb == 'ListIdentifiers':
+        queryset = queryset.select_related('issue').only('pk', 'updated_at', 'issue__id', 'issue__year')
+    else:
+        queryset = queryset.select_related('issue')
+    paginator = CursorPaginator(queryset, page_size, ORDERING)
+    try:
+        page_queryset = paginator.page_queryset(cursor)[0]
+    except InvalidCursor:
+        raise OaiError('badResumptionToken', "Некорректный resumptionToken")
+
+    # Первая строка читается до начала ответа: пустой список - это ошибка noRecordsMatch
+    rows = page_queryset.iterator(chunk_size=STREAM_CHUNK_SIZE)
+    first = next(rows, None)
+    if first is None:
+        raise OaiError('noRecordsMatch', "Нет записей с такими условиями")
+    journal = JournalInfo.objects.first() if verb == 'ListRecords' else None
+
+    def stream():
+        yield _envelope_start(request, verb, arguments) + f'<{verb}>'
+        count = 0
+        last = None
+        for article in _chain(first, rows):
+            count += 1
+            if count > page_size:
+                break
+            last = article
+            yield _header(article) if verb == 'ListIdentifiers' else _record(article, prefix, journal, request)
+        if count > page_size:
+            token = encode_token(list_arguments, paginator.cursor_for(FORWARD, last), position + page_size)
+            yield f'<resumptionToken cursor="{position}">{token}</resumptionToken>'
+        elif cursor is not None:
+            # Последняя страница списка - пустой маркер
+            yield f'<resumptionToken cursor="{position}"/>'
+        yield f'</{verb}></OAI-PMH>'
+
+    return StreamingHttpResponse((chunk.encode('utf-8') for chunk in stream()),
+                                 content_type='text/xml; charset=utf-8')
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'HEAD', 'POST'])
+def oai_pmh(request):
+    """Точка доступа OAI-PMH (GET или POST с application/x-www-form-urlencoded)"""
+    params = request.POST if request.method == 'POST' else request.GET
+    verb, arguments = None, None
+    try:
+        verb, arguments = _arguments(params)
+        if verb in ('ListRecords', 'ListIdentifiers'):
+            return _list(request, verb, arguments)
+        body = {
+            'Identify': lambda: _identify(request),
+            'ListMetadataFormats': lambda: _list_metadata_formats(arguments),
+            'ListSets': _list_sets,
+            'GetRecord': lambda: _get_record(request, arguments),
+        }[verb]()
+    except OaiError as exc:
+        return _error_response(request, exc, verb, arguments)
+    return _xml_response(_envelope_start(request, verb, arguments) + body + '</OAI-PMH>')
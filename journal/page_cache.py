@@ -0,0 +1,230 @@
+"""
+Полностраничный кэш для публичных страниц.
+
+Декоратор cached_page() кэширует готовый HTML по URL и языку:
+- одновременные промахи по одной странице объединяются - рендерит один
+  запрос, остальные ждут его результат (без "эффекта собачьей стаи");
+- после истечения срока свежести страница еще stale_timeout секунд
+  отдается из кэша, а обновляется в фоновом потоке;
+- при сохранении/удалении выпусков, статей, информации о журнале и архивных
+  периодов (см. signals.py) весь кэш страниц сбрасывается сменой поколения.
+
+Кэшируются только GET/HEAD-запросы без сессии и сообщений и только ответы
+200 без cookie и CSRF-токена: страницы с формой POST ({% csrf_token %}) не
+кэшируются никогда - токен в них принадлежит посетителю. Заголовок X-Page-Cache
+показывает HIT/MISS/STALE. Декоратор подходит и для async view - тогда ожидание
+чужого рендера не занимает поток.
+
+Сброс виден только процессам с тем же кэшем. С LocMemCache (у каждого воркера
+свой) остальные воркеры отдают прежние страницы, пока те не выйдут из кэша -
+до TIMEOUT + STALE_TIMEOUT секунд; с общим кэшем (Redis, Memcached,
+FileBasedCache) сброс действует сразу.
+"""
+import asyncio
+import logging
+import threading
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponse
+from django.utils.translation import get_language
+
+GENERATION_KEY = 'page-cache:generation'
+
+logger = logging.getLogger(__name__)
+
+
+def _config(name, default):
+    return getattr(settings, 'JOURNAL_PAGE_CACHE', {}).get(name, default)
+
+
+def get_cache():
+    return caches[_config('CACHE_ALIAS', 'default')]
+
+
+def invalidate_all():
+    """Сбрасывает все закэшированные страницы (новое поколение ключей)"""
+    cache = get_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def _is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    # У редакторов и посетителей с сообщениями страницы персональные
+    return not (settings.SESSION_COOKIE_NAME in request.COOKIES or 'messages' in request.COOKIES)
+
+
+def _is_cacheable_response(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    # Страница с CSRF-токеном уникальна для посетителя - даже если cookie у него уже был
+    # (get_token ставит CSRF_COOKIE_NEEDS_UPDATE, Django до 4.1 - CSRF_COOKIE_USED)
+    if request.META.get('CSRF_COOKIE_USED') or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return False
+    cache_control = response.get('Cache-Control', '')
+    return 'private' not in cache_control and 'no-store' not in cache_control
+
+
+def page_key(request, generation):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return f'page-cache:{generation}:{get_language()}:{request.get_host()}:{request.path}?{query}'
+
+
+def _pack(response, fresh_timeout):
+    return {
+        'content': response.content,
+        'status': response.status_code,
+        'headers': [(k, v) for k, v in response.items() if k.lower() != 'content-length'],
+        'fresh_until': time.time() + fresh_timeout,
+    }
+
+
+def _unpack(entry, state):
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    response['X-Page-Cache'] = state
+    return response
+
+
+def cached_page(timeout=None, stale_timeout=None):
+    """
+    Декоратор view: timeout - сколько секунд страница свежая,
+    stale_timeout - сколько еще ее можно отдавать, обновляя в фоне.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            return _async_cached_page(view_func, timeout, stale_timeout)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _config('ENABLED', True) or not _is_cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+
+            fresh, stale, lock_timeout = _timeouts(timeout, stale_timeout)
+            cache = get_cache()
+            generation = cache.get(GENERATION_KEY, 0)
+            key = page_key(request, generation)
+            lock_key = key + ':lock'
+
+            def render_and_store():
+                response = view_func(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response = response.render()
+                if _is_cacheable_response(request, response):
+                    cache.set(key, _pack(response, fresh), fresh + stale)
+                return response
+
+            entry = cache.get(key)
+            if entry is not None:
+                if entry['fresh_until'] > time.time():
+                    return _unpack(entry, 'HIT')
+                # Протухла: отдаем как есть, а обновляет один фоновый поток
+                if cache.add(lock_key, 1, lock_timeout):
+                    threading.Thread(
+                        target=_revalidate, args=(render_and_store, cache, lock_key), daemon=True
+                    ).start()
+                return _unpack(entry, 'STALE')
+
+            # Промах: рендерит тот, кто взял блокировку, остальные ждут
+            if cache.add(lock_key, 1, lock_timeout):
+                try:
+                    response = render_and_store()
+                finally:
+                    cache.delete(lock_key)
+                response['X-Page-Cache'] = 'MISS'
+                return response
+
+            deadline = time.monotonic() + _config('WAIT_TIMEOUT', 5)
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = cache.get(key)
+                if entry is not None:
+                    return _unpack(entry, 'HIT')
+                if cache.get(lock_key) is None:
+                    # Рендер закончился, но страница не попала в кэш (404, CSRF и т.п.)
+                    break
+            # Не дождались (рендер упал или слишком долгий) - рендерим сами
+            return view_func(request, *args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def _timeouts(timeout, stale_timeout):
+    """(сколько страница свежая, сколько еще отдается устаревшей, время блокировки рендера)"""
+    fresh = timeout if timeout is not None else _config('TIMEOUT', 10 * 60)
+    stale = stale_timeout if stale_timeout is not None else _config('STALE_TIMEOUT', 60 * 60)
+    return fresh, stale, _config('LOCK_TIMEOUT', 30)
+
+
+def _async_cached_page(view_func, timeout, stale_timeout):
+    """cached_page для async view - та же логика на асинхронном API кэша"""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if not _config('ENABLED', True) or not _is_cacheable_request(request):
+            return await view_func(request, *args, **kwargs)
+
+        fresh, stale, lock_timeout = _timeouts(timeout, stale_timeout)
+        cache = get_cache()
+        generation = await cache.aget(GENERATION_KEY, 0)
+        key = page_key(request, generation)
+        lock_key = key + ':lock'
+
+        async def render_and_store():
+            response = await view_func(request, *args, **kwargs)
+            if _is_cacheable_response(request, response):
+                await cache.aset(key, _pack(response, fresh), fresh + stale)
+            return response
+
+        entry = await cache.aget(key)
+        if entry is not None:
+            if entry['fresh_until'] > time.time():
+                return _unpack(entry, 'HIT')
+            if await cache.aadd(lock_key, 1, lock_timeout):
+                threading.Thread(
+                    target=_revalidate, args=(async_to_sync(render_and_store), cache, lock_key), daemon=True
+                ).start()
+            return _unpack(entry, 'STALE')
+
+        if await cache.aadd(lock_key, 1, lock_timeout):
+            try:
+                response = await render_and_store()
+            finally:
+                await cache.adelete(lock_key)
+            response['X-Page-Cache'] = 'MISS'
+            return response
+
+        deadline = time.monotonic() + _config('WAIT_TIMEOUT', 5)
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            entry = await cache.aget(key)
+            if entry is not None:
+                return _unpack(entry, 'HIT')
+            if await cache.aget(lock_key) is None:
+                break
+        return await view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _revalidate(render_and_store, cache, lock_key):
+    """Фоновое обновление протухшей страницы"""
+    try:
+        render_and_store()
+    except Exception:
+        # Страница остается прежней до следующей попытки
+        logger.exception("Не удалось обновить страницу в кэше")
+    finally:
+        cache.delete(lock_key)
+        # У потока свое соединение с БД - закрываем его
+        connections.close_all()
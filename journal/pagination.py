@@ -0,0 +1,219 @@
+"""
+Постраничный вывод по курсору (keyset pagination).
+
+Вместо ?page=N с COUNT(*) и OFFSET следующая страница выбирается условием
+"после последней строки текущей" по полям сортировки, поэтому любая
+страница стоит столько же, сколько первая (запрос идет по индексу).
+Курсор - непрозрачная строка с направлением и значениями полей
+граничной строки. Общее число строк приблизительное: COUNT(*) считается
+раз в APPROXIMATE_COUNT_TIMEOUT секунд и берется из кэша.
+
+Подключение к ListView - CursorPaginationMixin с cursor_ordering.
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import Http404, HttpResponsePermanentRedirect, HttpResponseRedirect
+
+CURSOR_PARAM = 'cursor'
+APPROXIMATE_COUNT_TIMEOUT = 10 * 60
+
+FORWARD, BACKWARD = 'n', 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder обрезает время до миллисекунд - в курсоре нужно точное значение"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    data = json.dumps([direction, values], cls=_CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, values = json.loads(data)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(token)
+    if direction not in (FORWARD, BACKWARD) or not isinstance(values, list):
+        raise InvalidCursor(token)
+    return direction, values
+
+
+class CursorPage:
+    def __init__(self, paginator, object_list, has_next, has_previous):
+        self.paginator = paginator
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.cursor_for(FORWARD, self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.cursor_for(BACKWARD, self.object_list[0])
+
+
+class CursorPaginator:
+    """
+    ordering - поля сортировки ('-year', 'page_start', ...); последнее поле
+    должно быть уникальным (pk), иначе строки с равными ключами потеряются.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.fields = []
+        for name in self.ordering:
+            attname = name.lstrip('-')
+            field = queryset.model._meta.pk if attname == 'pk' else queryset.model._meta.get_field(attname)
+            self.fields.append((attname, field, name.startswith('-')))
+
+    def cursor_for(self, direction, obj):
+        return encode_cursor(direction, [getattr(obj, attname) for attname, _, _ in self.fields])
+
+    def _values(self, raw_values):
+        if len(raw_values) != len(self.fields):
+            raise InvalidCursor(raw_values)
+        try:
+            return [field.to_python(value) for (_, field, _), value in zip(self.fields, raw_values)]
+        except ValidationError:
+            raise InvalidCursor(raw_values)
+
+    def _after(self, values, backward, inclusive=False):
+        """Условие "строка идет после values" (или до - при backward) в порядке сортировки"""
+        condition = Q()
+        equal = Q()
+        for (attname, _, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending != backward else 'gt'
+            condition |= equal & Q(**{f'{attname}__{lookup}': value})
+            equal &= Q(**{attname: value})
+        if inclusive:
+            condition |= equal
+        # Избыточная граница по первому полю - по ней база начинает чтение индекса
+        # сразу с нужного места, а не фильтрует строки от начала
+        attname, _, descending = self.fields[0]
+        lookup = 'lte' if descending != backward else 'gte'
+        return Q(**{f'{attname}__{lookup}': values[0]}) & condition
+
+    def page_queryset(self, cursor=None):
+        """(запрос строк страницы с одной лишней строкой, направление назад?, значения курсора)"""
+        direction, values = FORWARD, None
+        if cursor:
+            direction, raw_values = decode_cursor(cursor)
+            values = self._values(raw_values)
+        backward = direction == BACKWARD
+
+        ordering = self.ordering
+        if backward:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, backward))
+        return queryset[:self.per_page + 1], backward, values
+
+    def object_at(self, index):
+        """Строка с номером index (от 0) в порядке сортировки; OFFSET - только для старых ?page=N"""
+        rows = list(self.queryset.order_by(*self.ordering)[index:index + 1])
+        return rows[0] if rows else None
+
+    def page(self, cursor=None):
+        queryset, backward, values = self.page_queryset(cursor)
+        rows = list(queryset)
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backward:
+            rows.reverse()
+            return CursorPage(self, rows, has_next=True, has_previous=more)
+        return CursorPage(self, rows, has_next=more, has_previous=values is not None)
+
+    @property
+    def approximate_count(self):
+        """Число строк из кэша (пересчитывается не чаще раза в APPROXIMATE_COUNT_TIMEOUT)"""
+        sql = str(self.queryset.order_by().query)
+        key = 'cursor-count:' + hashlib.md5(sql.encode()).hexdigest()
+        return cache.get_or_set(key, self.queryset.count, APPROXIMATE_COUNT_TIMEOUT)
+
+
+class CursorPaginationMixin:
+    """
+    Для ListView: paginate_by строк на страницу, переход по ?cursor=...
+    Старые адреса ?page=N ведут на ту же страницу: ?page=1 - постоянным
+    редиректом на адрес без номера, остальные - временным на курсор
+    (строки, с которой начинается N-я страница, со временем меняются).
+    Номер за концом списка или не число - 404.
+    """
+    cursor_ordering = None
+
+    def get(self, request, *args, **kwargs):
+        if 'page' in request.GET and self.get_paginate_by(None):
+            return self._legacy_page_redirect(request)
+        return super().get(request, *args, **kwargs)
+
+    def _legacy_page_redirect(self, request):
+        query = request.GET.copy()
+        try:
+            number = int(query.pop('page')[-1])
+        except ValueError:
+            raise Http404("Некорректный номер страницы")
+        if number < 1:
+            raise Http404("Некорректный номер страницы")
+        query.pop(CURSOR_PARAM, None)
+        redirect_class = HttpResponsePermanentRedirect
+        if number > 1:
+            per_page = self.get_paginate_by(None)
+            paginator = CursorPaginator(self.get_queryset(), per_page, self.cursor_ordering)
+            # Курсор "после последней строки предыдущей страницы"
+            boundary = paginator.object_at((number - 1) * per_page - 1)
+            if boundary is None:
+                raise Http404("Страница за концом списка")
+            query[CURSOR_PARAM] = paginator.cursor_for(FORWARD, boundary)
+            redirect_class = HttpResponseRedirect
+        return redirect_class(request.path + (f'?{query.urlencode()}' if query else ''))
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(CURSOR_PARAM))
+        except InvalidCursor:
+            raise Http404("Некорректный курсор страницы")
+        return paginator, page, page.object_list, page.has_other_pages()
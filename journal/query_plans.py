@@ -0,0 +1,77 @@
+"""
+Запросы страниц сайта и админки для проверки планов выполнения.
+
+QUERIES повторяет выборки из views.py и admin.py; команда
+`python manage.py check_query_plans` выполняет для каждой EXPLAIN QUERY PLAN
+(SQLite) и сообщает о полном просмотре таблиц и сортировке во временном
+B-дереве - признаках того, что запросу не хватает индекса.
+"""
+import re
+
+from .models import ArchiveYear, Article, ContactMessage, EditorialBoard, JournalInfo, JournalIssue
+from .pagination import FORWARD, CursorPaginator, encode_cursor
+from .oai import ORDERING as OAI_ORDERING
+from .views import ArticleListView, IssueListView
+
+# Таблицы из нескольких строк - полный просмотр для них дешевле индекса
+SMALL_TABLES = {'journal_archiveyear', 'journal_journalinfo'}
+# Запросы, где сортировка во временном B-дереве ожидаема: админка сортирует
+# статьи по полям выпуска (через JOIN), индекс одной таблицы это не покрывает
+SORT_ALLOWED = {'admin: статьи'}
+
+
+def _cursor_queryset(view_class, values):
+    """Запрос страницы списка view_class после курсора с заданными значениями полей"""
+    paginator = CursorPaginator(view_class().get_queryset(), view_class.paginate_by, view_class.cursor_ordering)
+    return paginator.page_queryset(encode_cursor(FORWARD, values))[0]
+
+
+def _queries():
+    issues = JournalIssue.objects.all()
+    published = Article.objects.filter(is_published=True)
+    return [
+        ('issues: страница списка', issues[:10]),
+        ('issues: следующая страница', _cursor_queryset(IssueListView, [2020, 1, '1', 100])),
+        ('articles: следующая страница', _cursor_queryset(ArticleListView, [10, 100])),
+        ('issues: текущий выпуск', JournalIssue.objects.filter(is_current=True)[:1]),
+        ('issue_detail: статьи выпуска', Article.objects.filter(issue_id=1)),
+        ('issue_detail: опубликованные статьи', published.filter(issue_id=1)),
+        ('articles: страница списка', published.select_related('issue')[:10]),
+        ('article_detail', Article.objects.select_related('issue').filter(pk=1)),
+        ('download_article_pdf', published.filter(pk=1)),
+        ('oai: следующая страница записей', CursorPaginator(published.select_related('issue'), 100, OAI_ORDERING)
+         .page_queryset(encode_cursor(FORWARD, ['2024-01-01T00:00:00+00:00', 100]))[0]),
+        ('archive_range: выпуски периода', issues.filter(year__gte=2020, year__lte=2025)),
+        ('archive_range: периоды', ArchiveYear.objects.filter(is_active=True)),
+        ('editorial_board', EditorialBoard.objects.all()),
+        ('journal_info', JournalInfo.objects.order_by('pk')[:1]),
+        ('admin: выпуски', issues.order_by('-year', '-number_sort', '-number', '-pk')[:100]),
+        ('admin: выпуски за год', issues.filter(year=2024).order_by('-year', '-number_sort', '-number', '-pk')[:100]),
+        ('admin: статьи', Article.objects.select_related('issue')
+         .order_by('-issue__year', 'issue__number_sort', 'page_start', '-pk')[:100]),
+        ('admin: сообщения', ContactMessage.objects.order_by('-created_at', '-pk')[:100]),
+    ]
+
+
+def problems(plan, allow_sort=False):
+    """Строки плана, указывающие на нехватку индекса"""
+    found = []
+    for line in plan.splitlines():
+        # Строка плана Django для SQLite: "<id> <parent> <notused> <detail>"
+        detail = re.sub(r'^[\d\s]+', '', line).strip(' -|`')
+        if detail.startswith('SCAN ') and ' USING ' not in detail:
+            table = detail.split()[1]
+            if table not in SMALL_TABLES:
+                found.append(detail)
+        elif 'USE TEMP B-TREE' in detail and not allow_sort:
+            found.append(detail)
+    return found
+
+
+def explain_all():
+    """[(название, SQL, план, проблемы)] для всех запросов из списка"""
+    results = []
+    for label, queryset in _queries():
+        plan = queryset.explain()
+        results.append((label, str(queryset.query), plan, problems(plan, label in SORT_ALLOWED)))
+    return results
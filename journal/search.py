@@ -0,0 +1,304 @@
+"""
+Полнотекстовый поиск по статьям на SQLite FTS5.
+
+Индекс - виртуальная таблица journal_article_fts (rowid = id статьи)
+по метаданным и тексту из PDF (ArticleText, см. text_extraction.py),
+которая синхронизируется с Article сигналами (см. signals.py) и
+перестраивается командой `python manage.py rebuild_search_index`.
+Миграции только создают таблицу; пустой индекс при имеющихся статьях
+строится после migrate (ensure_index из обработчика post_migrate).
+
+Русские слова приводятся к основе стеммером Snowball прямо в Python
+(и при индексации, и в запросе), английские - токенайзером porter FTS5.
+На других СУБД поиск работает через icontains без ранжирования.
+"""
+import re
+from functools import lru_cache
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Article, ArticleText
+
+FTS_TABLE = 'journal_article_fts'
+# Веса колонок для bm25(): title, authors, abstract, body (текст из PDF)
+FTS_WEIGHTS = (10.0, 5.0, 1.0, 0.5)
+_FTS_INSERT = f'INSERT INTO {FTS_TABLE} (rowid, title, authors, abstract, body) VALUES (%s, %s, %s, %s, %s)'
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_CYRILLIC_RE = re.compile(r'[а-яё]')
+
+
+# --- Стеммер Snowball для русского языка ---
+
+_VOWELS = 'аеиоуыэюя'
+
+_PERFECTIVE_GERUND_1 = ('вшись', 'вши', 'в')  # после а/я
+_PERFECTIVE_GERUND_2 = ('ывшись', 'ившись', 'ывши', 'ивши', 'ыв', 'ив')
+_REFLEXIVE = ('ся', 'сь')
+_ADJECTIVE = (
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое', 'ей', 'ий',
+    'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+)
+_PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')  # после а/я
+_PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+_VERB_1 = (
+    'ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет', 'ют',
+    'ны', 'ть', 'й', 'л', 'н',
+)  # после а/я
+_VERB_2 = (
+    'ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило', 'ыло', 'ено',
+    'ует', 'уют', 'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй', 'ил', 'ыл', 'им', 'ым',
+    'ен', 'ят', 'ит', 'ыт', 'ую', 'ю',
+)
+_NOUN = (
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие', 'ье', 'еи',
+    'ии', 'ей', 'ой', 'ий', 'ям', 'ем', 'ам', 'ом', 'ах', 'ях', 'ию', 'ью', 'ия',
+    'ья', 'а', 'е', 'и', 'й', 'о', 'у', 'ы', 'ь', 'ю', 'я',
+)
+_DERIVATIONAL = ('ость', 'ост')
+_SUPERLATIVE = ('ейше', 'ейш')
+
+# Окончания проверяются от длинных к коротким - сортируем один раз
+(_PERFECTIVE_GERUND_1, _PERFECTIVE_GERUND_2, _REFLEXIVE, _ADJECTIVE, _PARTICIPLE_1, _PARTICIPLE_2,
+ _VERB_1, _VERB_2, _NOUN, _DERIVATIONAL, _SUPERLATIVE) = (
+    tuple(sorted(group, key=len, reverse=True)) for group in (
+        _PERFECTIVE_GERUND_1, _PERFECTIVE_GERUND_2, _REFLEXIVE, _ADJECTIVE, _PARTICIPLE_1, _PARTICIPLE_2,
+        _VERB_1, _VERB_2, _NOUN, _DERIVATIONAL, _SUPERLATIVE,
+    )
+)
+
+
+def _find_ending(word, endings, after=None):
+    """Самое длинное окончание из endings (для групп 1 - только после а/я); endings - от длинных к коротким"""
+    for ending in endings:
+        if word.endswith(ending):
+            if after is None:
+                return ending
+            if len(word) > len(ending) and word[-len(ending) - 1] in after:
+                return ending
+    return None
+
+
+def _region_start(word, start=0):
+    """Начало региона R1 (R2) - после первой согласной, идущей за гласной"""
+    for i in range(start + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            return i + 1
+    return len(word)
+
+
+# Словарь текстов невелик, а слова повторяются - основы кэшируются
+@lru_cache(maxsize=100000)
+def stem_ru(word):
+    """Основа русского слова по алгоритму Snowball (Porter)"""
+    word = word.lower().replace('ё', 'е')
+    for i, char in enumerate(word):
+        if char in _VOWELS:
+            break
+    else:
+        return word
+    head, rv = word[:i + 1], word[i + 1:]
+
+    # Шаг 1: деепричастия, иначе возвратность + прилагательные/глаголы/существительные
+    ending = _find_ending(rv, _PERFECTIVE_GERUND_1, 'ая') or _find_ending(rv, _PERFECTIVE_GERUND_2)
+    if ending:
+        rv = rv[:-len(ending)]
+    else:
+        ending = _find_ending(rv, _REFLEXIVE)
+        if ending:
+            rv = rv[:-len(ending)]
+        ending = _find_ending(rv, _ADJECTIVE)
+        if ending:
+            rv = rv[:-len(ending)]
+            ending = _find_ending(rv, _PARTICIPLE_1, 'ая') or _find_ending(rv, _PARTICIPLE_2)
+            if ending:
+                rv = rv[:-len(ending)]
+        else:
+            ending = (_find_ending(rv, _VERB_1, 'ая') or _find_ending(rv, _VERB_2)
+                      or _find_ending(rv, _NOUN))
+            if ending:
+                rv = rv[:-len(ending)]
+
+    # Шаг 2
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательные суффиксы в R2
+    word = head + rv
+    r2 = _region_start(word, _region_start(word))
+    ending = _find_ending(word, _DERIVATIONAL)
+    if ending and len(word) - len(ending) >= r2:
+        word = word[:-len(ending)]
+
+    # Шаг 4
+    if word.endswith('нн') and len(word) - 1 > len(head):
+        word = word[:-1]
+    else:
+        ending = _find_ending(word[len(head):], _SUPERLATIVE)
+        if ending:
+            word = word[:-len(ending)]
+            if word.endswith('нн'):
+                word = word[:-1]
+        elif word.endswith('ь') and len(word) > len(head):
+            word = word[:-1]
+    return word
+
+
+# --- Нормализация текста ---
+
+@lru_cache(maxsize=200000)
+def _token(word):
+    return stem_ru(word) if _CYRILLIC_RE.search(word) else word
+
+
+def tokenize(text):
+    """Слова текста: русские приводятся к основе, остальные - в нижний регистр"""
+    return [_token(word) for word in _WORD_RE.findall((text or '').lower())]
+
+
+def normalize(text):
+    return ' '.join(tokenize(text))
+
+
+def build_match_query(query):
+    """Строка поиска пользователя -> выражение MATCH (все слова, по префиксу)"""
+    return ' AND '.join(f'"{token}"*' for token in tokenize(query))
+
+
+# --- Работа с индексом ---
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def _index_row(pk, title, authors, abstract, text=''):
+    return [pk, normalize(title), normalize(authors), normalize(abstract), normalize(text)]
+
+
+def _article_text(article_id):
+    record = ArticleText.objects.filter(article_id=article_id).first()
+    return record.text if record else ''
+
+
+def index_article(article, text=None):
+    """
+    Добавляет/обновляет статью в индексе (неопубликованные удаляются).
+    text - извлеченный текст PDF; если не передан, берется из ArticleText.
+    """
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [article.pk])
+        if article.is_published:
+            if text is None:
+                text = _article_text(article.pk)
+            cursor.execute(_FTS_INSERT, _index_row(article.pk, article.title, article.authors, article.abstract, text))
+
+
+def index_articles(articles):
+    """Добавляет/обновляет в индексе пачку статей (текст PDF - из ArticleText)"""
+    if not fts_available():
+        return
+    articles = list(articles)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [[a.pk] for a in articles])
+        _insert_batch(cursor, [(a.pk, a.title, a.authors, a.abstract) for a in articles if a.is_published])
+
+
+def remove_article(article_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [article_id])
+
+
+def clear_index():
+    """Удаляет из индекса все статьи"""
+    if not fts_available():
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        _recreate_table(cursor)
+
+
+def rebuild_index(batch_size=500):
+    """Полностью перестраивает индекс, возвращает число проиндексированных статей"""
+    if not fts_available():
+        return 0
+    count = 0
+    # Кортежи вместо моделей: на сотнях тысяч статей создание объектов заметно
+    rows = Article.objects.filter(is_published=True).values_list('pk', 'title', 'authors', 'abstract')
+    # Одна транзакция: в режиме autocommit каждая строка индекса фиксировалась бы отдельно
+    with transaction.atomic(), connection.cursor() as cursor:
+        _recreate_table(cursor)
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                count += _insert_batch(cursor, batch)
+                batch = []
+        count += _insert_batch(cursor, batch)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+def ensure_index():
+    """Строит индекс, если он пуст, а опубликованные статьи есть; возвращает число статей"""
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT 1 FROM {FTS_TABLE} LIMIT 1')
+        if cursor.fetchone():
+            return 0
+    if not Article.objects.filter(is_published=True).exists():
+        return 0
+    return rebuild_index()
+
+
+def _recreate_table(cursor):
+    """Пустая таблица индекса с той же схемой: DELETE из FTS5 удаляет строки по одной"""
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+    (schema,), = cursor.fetchall()
+    cursor.execute(f'DROP TABLE {FTS_TABLE}')
+    cursor.execute(schema)
+
+
+def _insert_batch(cursor, rows):
+    """rows - кортежи (id, title, authors, abstract)"""
+    if rows:
+        texts = {
+            record.article_id: record.text
+            for record in ArticleText.objects.filter(article_id__in=[row[0] for row in rows])
+        }
+        cursor.executemany(_FTS_INSERT, [_index_row(*row, texts.get(row[0], '')) for row in rows])
+    return len(rows)
+
+
+def search_article_ids(query, limit=50, offset=0):
+    """id опубликованных статей, подходящих под запрос, в порядке релевантности"""
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    if not fts_available():
+        condition = Q()
+        for word in _WORD_RE.findall(query):
+            condition &= Q(title__icontains=word) | Q(authors__icontains=word) | Q(abstract__icontains=word)
+        queryset = Article.objects.filter(condition, is_published=True).values_list('pk', flat=True)
+        return list(queryset[offset:offset + limit])
+
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s OFFSET %s',
+            [match, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_articles(query, limit=50, offset=0):
+    """Статьи (с выпусками) по запросу в порядке релевантности"""
+    ids = search_article_ids(query, limit=limit, offset=offset)
+    articles = Article.objects.select_related('issue').in_bulk(ids)
+    return [articles[pk] for pk in ids if pk in articles]
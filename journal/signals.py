@@ -0,0 +1,112 @@
+"""Обработчики сигналов моделей журнала"""
+from django.db import connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from gia_journal.database import WRITE_ALIAS
+
+from . import archive, page_cache, search, sitemaps, text_extraction
+from .models import ArchiveYear, Article, EditorialBoard, JournalInfo, JournalIssue
+
+
+@receiver(post_save, sender=Article)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """Держим полнотекстовый индекс в актуальном состоянии"""
+    if raw:
+        return
+    search.index_article(instance)
+
+
+@receiver(post_migrate)
+def fill_search_index(sender, using=WRITE_ALIAS, verbosity=1, **kwargs):
+    """
+    Миграции только создают таблицу индекса (нормализация текста живет в search.py
+    и меняется, а миграция должна давать один результат) - заполняем ее здесь,
+    когда схема journal доведена до последней миграции.
+    """
+    if sender.label != 'journal' or using != WRITE_ALIAS:
+        return
+    executor = MigrationExecutor(connections[using])
+    journal_leaves = [node for node in executor.loader.graph.leaf_nodes() if node[0] == 'journal']
+    if executor.migration_plan(journal_leaves):
+        return
+    count = search.ensure_index()
+    if count and verbosity >= 1:
+        print(f"  Индекс поиска построен: {count} статей")
+
+
+@receiver(post_save, sender=Article)
+def schedule_article_text(sender, instance, raw=False, **kwargs):
+    """Текст загруженного PDF статьи - в фоне после фиксации транзакции"""
+    if raw:
+        return
+    article_ids = [instance.pk]
+    transaction.on_commit(lambda: text_extraction.schedule(article_ids))
+
+
+@receiver(post_save, sender=JournalIssue)
+def schedule_issue_texts(sender, instance, raw=False, **kwargs):
+    """Из PDF выпуска берется текст статей без собственного PDF"""
+    if raw or not instance.full_pdf:
+        return
+    issue_id = instance.pk
+    transaction.on_commit(lambda: text_extraction.schedule(
+        Article.objects.filter(issue_id=issue_id).values_list('pk', flat=True)
+    ))
+
+
+@receiver(post_delete, sender=Article)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_article(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=JournalIssue)
+@receiver([post_save, post_delete], sender=Article)
+@receiver([post_save, post_delete], sender=JournalInfo)
+@receiver([post_save, post_delete], sender=ArchiveYear)
+def invalidate_page_cache(sender, **kwargs):
+    """
+    Сбрасываем кэш страниц после фиксации транзакции. save() выпусков и статей
+    сам открывает транзакцию (см. FileFingerprintMixin), поэтому и без внешней
+    транзакции сброс идет после записи хэшей и вариантов файлов.
+    """
+    transaction.on_commit(page_cache.invalidate_all)
+
+
+@receiver([post_save, post_delete], sender=JournalIssue)
+@receiver([post_save, post_delete], sender=Article)
+@receiver([post_save, post_delete], sender=ArchiveYear)
+def mark_sitemaps_stale(sender, **kwargs):
+    """Следующий запрос карты сайта сверит ее части с БД, не дожидаясь CHECK_INTERVAL"""
+    transaction.on_commit(sitemaps.mark_stale)
+
+
+@receiver([post_save, post_delete], sender=JournalIssue)
+def update_archive_ranges(sender, instance, raw=False, **kwargs):
+    """Обновляем периоды архива, в которые попадает выпуск (после записи хэшей обложки)"""
+    if raw:
+        return
+    issue_id = instance.pk
+    transaction.on_commit(lambda: archive.update_issue(issue_id))
+
+
+@receiver(post_delete, sender=JournalIssue)
+@receiver(post_delete, sender=EditorialBoard)
+def delete_image_derivatives(sender, instance, **kwargs):
+    """WebP/AVIF-варианты удаляются вместе с записью - после фиксации, чтобы откат их не терял"""
+    transaction.on_commit(instance.delete_derivative_files)
+
+
+@receiver(post_save, sender=JournalIssue)
+def touch_issue_articles(sender, instance, raw=False, **kwargs):
+    """Метаданные статей включают данные выпуска - сдвигаем их дату изменения для OAI-PMH"""
+    if raw:
+        return
+    Article.objects.filter(issue=instance).update(updated_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=ArchiveYear)
+def invalidate_archive_period(sender, instance, **kwargs):
+    transaction.on_commit(lambda: archive.invalidate_period(instance))
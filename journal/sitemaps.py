@@ -0,0 +1,223 @@
+"""
+Карты сайта для поисковиков: /sitemap.xml (индекс) и /sitemap-<часть>.xml.
+
+Части: pages - главная, политика журнала, списки и архивные периоды;
+issues-<N> и articles-<N> - выпуски и статьи, разбитые по id на шарды
+по SHARD_SIZE адресов (лимит протокола - 50 000). lastmod берется из
+updated_at моделей.
+
+Файлы лежат в ROOT под теми же именами, что и адреса, рядом - сжатые
+.gz-копии (их можно отдавать и веб-сервером: gzip_static on). Манифест
+хранит отпечаток каждой части, поэтому update_sitemaps() перезаписывает
+только части с изменившимися объектами и удаляет опустевшие.
+Проверка запускается командой build_sitemaps или при запросе карты -
+не чаще раза в CHECK_INTERVAL секунд (после сохранения моделей - сразу).
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Q, Sum
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .export import STATIC_ROUTES
+from .middleware import _accepted_encodings
+from .models import ArchiveYear, Article, JournalIssue
+from .storage import compress_gzip
+
+MAX_SHARD_SIZE = 50000
+MANIFEST_NAME = '.sitemap-manifest.json'
+INDEX_NAME = 'sitemap.xml'
+CHECK_KEY = 'sitemaps:checked'
+SITEMAP_MAX_AGE = 60 * 60
+
+
+def _config(name, default):
+    return getattr(settings, 'JOURNAL_SITEMAPS', {}).get(name, default)
+
+
+def sitemaps_root():
+    return Path(_config('ROOT', Path(settings.BASE_DIR) / 'sitemaps'))
+
+
+def _shard_size():
+    return min(int(_config('SHARD_SIZE', MAX_SHARD_SIZE)), MAX_SHARD_SIZE)
+
+
+def _file_name(part):
+    return f'sitemap-{part}.xml'
+
+
+def _latest(*values):
+    return max(filter(None, values), default=None)
+
+
+def _w3c(value):
+    return value.isoformat(timespec='seconds') if value else None
+
+
+# --- Части карты: {имя: (отпечаток, функция -> [(адрес, lastmod)])} ---
+
+def _pages_part():
+    issue_years = dict(JournalIssue.objects.order_by().values_list('year').annotate(last=Max('updated_at')))
+    articles_updated = Article.objects.filter(is_published=True).aggregate(last=Max('updated_at'))['last']
+    catalogue = _latest(articles_updated, *issue_years.values())
+    # Страницы только из шаблонов lastmod не получают - в моделях для них даты нет
+    lastmod = {'home': catalogue, 'archive': catalogue, 'articles': articles_updated}
+    urls = [(reverse('issues'), catalogue)] + [(reverse(name), lastmod.get(name)) for name in STATIC_ROUTES]
+    for slug, start_year, end_year in (ArchiveYear.objects.filter(is_active=True).order_by('pk')
+                                       .values_list('slug', 'start_year', 'end_year')):
+        in_range = [last for year, last in issue_years.items() if start_year <= year <= end_year]
+        urls.append((reverse('archive_range', args=[slug]), _latest(*in_range)))
+    return repr(urls), lambda: urls
+
+
+def _issue_parts(size):
+    """Шарды выпусков; страница выпуска меняется и вместе с его статьями"""
+    shards = {}
+    rows = JournalIssue.objects.order_by('pk').annotate(
+        articles_updated=Max('articles__updated_at', filter=Q(articles__is_published=True)),
+    ).values_list('pk', 'updated_at', 'articles_updated')
+    for pk, updated_at, articles_updated in rows:
+        shards.setdefault(pk // size, []).append(
+            (reverse('issue_detail', args=[pk]), _latest(updated_at, articles_updated))
+        )
+    return {f'issues-{shard}': (repr(urls), lambda urls=urls: urls) for shard, urls in shards.items()}
+
+
+def _article_urls(shard, size):
+    rows = (Article.objects.filter(is_published=True, pk__gte=shard * size, pk__lt=(shard + 1) * size)
+            .order_by('pk').values_list('pk', 'updated_at'))
+    return [(reverse('article_detail', args=[pk]), updated_at) for pk, updated_at in rows.iterator(chunk_size=2000)]
+
+
+def _article_parts(size):
+    """Шарды статей: отпечаток - число строк, сумма id и последнее изменение (без чтения самих строк)"""
+    rows = (Article.objects.filter(is_published=True).annotate(shard=F('pk') / size).order_by('shard')
+            .values('shard').annotate(count=Count('pk'), ids=Sum('pk'), last=Max('updated_at')))
+    return {
+        f"articles-{row['shard']}": (repr((row['count'], row['ids'], row['last'])),
+                                     lambda shard=row['shard']: _article_urls(shard, size))
+        for row in rows
+    }
+
+
+def _parts(size):
+    return {'pages': _pages_part(), **_issue_parts(size), **_article_parts(size)}
+
+
+# --- Запись файлов ---
+
+def _urlset(base_url, urls):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for url, lastmod in urls:
+        lastmod = f'<lastmod>{_w3c(lastmod)}</lastmod>' if lastmod else ''
+        lines.append(f'<url><loc>{escape(base_url + url)}</loc>{lastmod}</url>')
+    lines.append('</urlset>')
+    return '\n'.join(lines).encode('utf-8')
+
+
+def _index(base_url, manifest):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for part, entry in sorted(manifest.items()):
+        url = base_url + reverse('sitemap_part', args=[part])
+        lastmod = f"<lastmod>{entry['lastmod']}</lastmod>" if entry['lastmod'] else ''
+        lines.append(f'<sitemap><loc>{escape(url)}</loc>{lastmod}</sitemap>')
+    lines.append('</sitemapindex>')
+    return '\n'.join(lines).encode('utf-8')
+
+
+def _write_atomic(path, data):
+    temp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    temp.write_bytes(data)
+    os.replace(temp, path)
+
+
+def _write(path, data):
+    """Файл и его .gz-копия; читатели никогда не видят недописанный файл"""
+    _write_atomic(path.with_name(path.name + '.gz'), compress_gzip(data))
+    _write_atomic(path, data)
+
+
+def _read_manifest(root):
+    try:
+        return json.loads((root / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def update_sitemaps(force=False, base_url=None):
+    """
+    Перезаписывает части карты, отпечатки которых изменились, и индекс.
+    Возвращает {'written': [...], 'removed': [...], 'unchanged': N}.
+    """
+    root = sitemaps_root()
+    root.mkdir(parents=True, exist_ok=True)
+    base_url = (base_url or _config('BASE_URL', 'http://localhost:8000')).rstrip('/')
+    manifest = _read_manifest(root)
+
+    written, new_manifest = [], {}
+    for part, (signature, get_urls) in _parts(_shard_size()).items():
+        signature = hashlib.sha256(f'{base_url}|{signature}'.encode()).hexdigest()
+        entry = manifest.get(part)
+        if not force and entry and entry['signature'] == signature and (root / _file_name(part)).exists():
+            new_manifest[part] = entry
+            continue
+        urls = get_urls()
+        _write(root / _file_name(part), _urlset(base_url, urls))
+        new_manifest[part] = {'signature': signature, 'lastmod': _w3c(_latest(*(lastmod for _, lastmod in urls)))}
+        written.append(part)
+
+    removed = sorted(set(manifest) - set(new_manifest))
+    for part in removed:
+        for name in (_file_name(part), _file_name(part) + '.gz'):
+            (root / name).unlink(missing_ok=True)
+
+    if written or removed or force or not (root / INDEX_NAME).exists():
+        _write(root / INDEX_NAME, _index(base_url, new_manifest))
+        _write_atomic(root / MANIFEST_NAME, json.dumps(new_manifest, indent=1).encode())
+    return {'written': written, 'removed': removed, 'unchanged': len(new_manifest) - len(written)}
+
+
+def ensure_fresh():
+    """Проверяет части карты не чаще раза в CHECK_INTERVAL секунд"""
+    if cache.add(CHECK_KEY, True, _config('CHECK_INTERVAL', 5 * 60)):
+        update_sitemaps()
+
+
+def mark_stale():
+    """После изменения моделей: следующий запрос карты проверит части сразу"""
+    cache.delete(CHECK_KEY)
+
+
+def sitemap_view(request, part=None):
+    """Индекс или часть карты сайта; сжатая копия - если клиент принимает gzip"""
+    ensure_fresh()
+    path = sitemaps_root() / (INDEX_NAME if part is None else _file_name(part))
+    served_path, encoding = path, None
+    if 'gzip' in _accepted_encodings(request) and path.with_name(path.name + '.gz').is_file():
+        served_path, encoding = path.with_name(path.name + '.gz'), 'gzip'
+    try:
+        handle = open(served_path, 'rb')
+    except FileNotFoundError:
+        raise Http404("Нет такой части карты сайта")
+
+    stat = os.fstat(handle.fileno())
+    response = FileResponse(handle, content_type='application/xml; charset=utf-8')
+    del response['Content-Disposition']
+    response['Content-Length'] = str(stat.st_size)
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, public=True, max_age=SITEMAP_MAX_AGE)
+    return response
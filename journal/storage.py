@@ -0,0 +1,72 @@
+"""
+Хранилище статики для продакшна.
+
+collectstatic через CompressedManifestStaticFilesStorage:
+- добавляет хэш содержимого в имена файлов (main.css -> main.3f2a1b.css)
+  и переписывает ссылки url(...) внутри CSS на хэшированные имена;
+- рядом с текстовыми файлами кладет сжатые копии .gz и .br
+  (brotli - необязательная зависимость: pip install brotli).
+
+Отдает такие файлы PrecompressedStaticMiddleware (см. middleware.py)
+или веб-сервер (nginx: gzip_static on; brotli_static on;).
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Форматы, которые имеет смысл сжимать (woff2, png, jpg и т.п. уже сжаты)
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.txt', '.json', '.xml', '.html', '.map', '.ttf', '.otf', '.eot'}
+# Сжатую копию не пишем, если она экономит меньше 5%
+MIN_COMPRESSION_RATIO = 0.95
+
+
+def compress_gzip(data):
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+def available_encodings():
+    """{'br': функция, 'gzip': функция} в порядке предпочтения"""
+    encodings = {}
+    if brotli is not None:
+        encodings['br'] = compress_brotli
+    encodings['gzip'] = compress_gzip
+    return encodings
+
+
+# Расширение файла для кодировки из Accept-Encoding
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage, который дополнительно пишет .gz и .br копии"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            self.compress_file(name)
+
+    def compress_file(self, name):
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return
+        with self.open(name) as fh:
+            data = fh.read()
+        for encoding, compress in available_encodings().items():
+            compressed = compress(data)
+            target = name + ENCODING_SUFFIXES[encoding]
+            if self.exists(target):
+                self.delete(target)
+            if len(compressed) < len(data) * MIN_COMPRESSION_RATIO:
+                self._save(target, ContentFile(compressed))
@@ -0,0 +1,306 @@
+"""
+Синтетический каталог для проверки под нагрузкой: `python manage.py seed_catalogue`.
+
+Создает выпуски за каждый год с start_year (по умолчанию 1957 - первый год
+журнала), статьи с русскими названиями, авторами и аннотациями, архивные
+периоды по archive_span лет и, по желанию, файлы-заглушки: PDF статей и
+выпусков заданного размера и обложки. Одинаковый seed дает одинаковый каталог -
+с файлами и без: содержимое файлов берется из отдельного генератора.
+
+Записи создаются через bulk_create пачками в одной транзакции, сигналы не
+вызываются - индекс поиска и кэши обновляются в конце. PDF-заглушки на диске -
+жесткие ссылки на один файл, поэтому 100 000 статей занимают место одного PDF.
+"""
+import hashlib
+import io
+import os
+import random
+import shutil
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from . import archive, page_cache, search, sitemaps
+from .models import ArchiveYear, Article, ArticleText, JournalIssue, issue_number_key
+
+# --- Словарь ---
+
+RUBRICS = [
+    'Геодезия', 'Прикладная геодезия', 'Аэрокосмические съемки, фотограмметрия',
+    'Картография и геоинформатика', 'Землеустройство, кадастр и мониторинг земель',
+    'Экономика и управление', 'Из истории науки',
+]
+TITLE_HEADS = [
+    'Методика', 'Алгоритм', 'Оценка точности', 'Исследование', 'Применение методов',
+    'Разработка технологии', 'Анализ результатов', 'Совершенствование методов',
+    'Математическая модель', 'Опыт применения', 'Автоматизация', 'Вопросы',
+]
+# В родительном падеже - после TITLE_HEADS и "вопросы ..."
+TOPICS = [
+    'геодезического мониторинга', 'спутникового позиционирования', 'построения цифровых моделей рельефа',
+    'аэрофотосъемки', 'лазерного сканирования', 'картографической генерализации', 'кадастрового учета',
+    'гравиметрических измерений', 'высокоточного нивелирования', 'фотограмметрической обработки снимков',
+    'дистанционного зондирования Земли', 'геоинформационного картографирования',
+    'уравнивания геодезических сетей', 'определения деформаций', 'инерциальной навигации',
+    'трансформации систем координат', 'тематического дешифрирования', 'оценки земель',
+]
+CONTEXTS = [
+    'инженерных сооружений', 'в условиях городской застройки', 'на территории Арктической зоны',
+    'по данным ГНСС-наблюдений', 'с использованием беспилотных летательных аппаратов',
+    'для целей землеустройства', 'в горной местности', 'при строительстве метрополитена',
+    'с учетом влияния атмосферы', 'на основе нейронных сетей', 'в системе ГЛОНАСС',
+    'для мониторинга береговой линии', 'на геодинамических полигонах', 'в Московском регионе',
+]
+USAGES = [
+    'создании опорных геодезических сетей', 'обновлении топографических карт',
+    'ведении Единого государственного реестра недвижимости', 'проектировании линейных сооружений',
+    'мониторинге опасных природных процессов', 'подготовке специалистов',
+]
+SENTENCES = [
+    'В статье рассматриваются вопросы {topic} {context}.',
+    'Приведены результаты экспериментальных исследований {topic}.',
+    'Предложена методика, позволяющая повысить точность {topic} на {percent} %.',
+    'Выполнен сравнительный анализ существующих подходов к задачам {topic}.',
+    'Показано, что средняя квадратическая погрешность не превышает {mm} мм.',
+    'Полученные результаты могут быть использованы при {usage}.',
+    'Обработка измерений выполнена в программном комплексе собственной разработки.',
+    'Рассмотрены источники систематических ошибок и способы их учета.',
+]
+SURNAMES = [
+    'Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов', 'Новиков',
+    'Морозов', 'Волков', 'Соловьев', 'Васильев', 'Зайцев', 'Павлов', 'Семенов', 'Голубев', 'Виноградов',
+    'Богданов', 'Воробьев', 'Федоров', 'Михайлов', 'Беляев', 'Тарасов', 'Белов', 'Комаров', 'Орлов',
+    'Киселев', 'Макаров', 'Андреев', 'Ковалев', 'Ильин', 'Гусев', 'Титов', 'Кузьмин', 'Кудрявцев',
+    'Баранов', 'Куликов', 'Алексеев', 'Степанов', 'Яковлев', 'Сорокин', 'Сергеев', 'Романов',
+    'Захаров', 'Борисов', 'Королев', 'Герасимов', 'Пономарев', 'Григорьев', 'Лазарев', 'Медведев',
+    'Ершов', 'Никитин', 'Соболев', 'Рябов', 'Поляков', 'Цветков', 'Данилов', 'Жуков', 'Фролов',
+    'Журавлев', 'Николаев', 'Крылов', 'Максимов', 'Сидоров', 'Осипов', 'Белоусов', 'Федотов',
+    'Дорофеев', 'Егоров', 'Матвеев', 'Бобров', 'Дмитриев', 'Калинин', 'Анисимов', 'Петухов',
+    'Антонов', 'Тимофеев', 'Никифоров', 'Веселов', 'Филиппов', 'Марков', 'Большаков', 'Суханов',
+    'Миронов', 'Ширяев', 'Александров', 'Коновалов', 'Шестаков', 'Казаков', 'Ефимов', 'Денисов',
+    'Громов', 'Фомин', 'Давыдов', 'Мельников', 'Щербаков', 'Блинов', 'Колесников', 'Карпов',
+    'Афанасьев', 'Власов', 'Маслов', 'Исаков', 'Тихонов', 'Аксенов', 'Гаврилов', 'Родионов',
+    'Котов', 'Горбунов', 'Кудряшов', 'Быков', 'Зуев', 'Третьяков', 'Савельев', 'Панов', 'Рыбаков',
+    'Суворов', 'Абрамов', 'Воронов', 'Мухин', 'Архипов', 'Трофимов', 'Мартынов', 'Емельянов',
+    'Горшков', 'Чернов', 'Овчинников', 'Селезнев', 'Панфилов', 'Копылов', 'Михеев', 'Галкин',
+    'Назаров', 'Лобанов', 'Лукин', 'Беляков', 'Потапов', 'Некрасов', 'Хохлов', 'Жданов', 'Наумов',
+    'Шилов', 'Воронцов', 'Ермаков', 'Дроздов', 'Игнатьев', 'Савин', 'Логинов', 'Сафонов', 'Капустин',
+    'Кириллов', 'Моисеев', 'Елисеев', 'Кошелев', 'Костин', 'Горбачев', 'Орехов', 'Ефремов',
+    'Исаев', 'Евдокимов', 'Калашников', 'Кабанов', 'Носков', 'Юдин', 'Кулагин', 'Лапин', 'Прохоров',
+    'Нестеров', 'Харитонов', 'Агафонов', 'Муравьев', 'Ларионов', 'Федосеев', 'Зимин', 'Пахомов',
+    'Шубин', 'Игнатов', 'Филатов', 'Крюков', 'Рогов', 'Кулаков', 'Терентьев', 'Молчанов', 'Владимиров',
+    'Артемьев', 'Гурьев', 'Зиновьев', 'Гришин', 'Кононов', 'Дементьев', 'Ситников', 'Симонов',
+    'Мишин', 'Фадеев', 'Комиссаров', 'Мамонтов', 'Носов', 'Гуляев', 'Шаров', 'Устинов', 'Вишняков',
+    'Евсеев', 'Лаврентьев', 'Брагин', 'Константинов', 'Корнилов', 'Авдеев', 'Зыков', 'Бирюков',
+    'Шарапов', 'Никонов', 'Щукин', 'Дьячков', 'Одинцов', 'Сазонов', 'Якушев', 'Красильников',
+    'Гордеев', 'Самойлов', 'Князев', 'Беспалов', 'Уваров', 'Шашков', 'Бобылев', 'Доронин',
+    'Белозеров', 'Рожков', 'Самсонов', 'Мясников', 'Лихачев', 'Буров', 'Сысоев', 'Фомичев',
+    'Русаков', 'Стрелков', 'Гущин', 'Тетерин', 'Колобов', 'Субботин', 'Фокин', 'Блохин',
+    'Селиверстов', 'Пестов', 'Кондратьев', 'Силин', 'Меркушев', 'Лыткин', 'Туров',
+]
+INITIALS = 'АБВГДЕИКЛМНОПРСТФЮЯ'
+
+COVER_SIZE = (420, 595)
+
+
+def _surname(rng):
+    surname = rng.choice(SURNAMES)
+    if rng.random() < 0.35:
+        # Женская форма: Иванов -> Иванова, Ильин -> Ильина
+        surname += 'а'
+    return surname
+
+
+def _authors(rng):
+    count = rng.choices((1, 2, 3, 4), weights=(30, 40, 22, 8))[0]
+    return ', '.join(f'{_surname(rng)} {rng.choice(INITIALS)}. {rng.choice(INITIALS)}.' for _ in range(count))
+
+
+def _title(rng):
+    return f'{rng.choice(TITLE_HEADS)} {rng.choice(TOPICS)} {rng.choice(CONTEXTS)}'
+
+
+def _abstract(rng):
+    sentences = rng.sample(SENTENCES, rng.randint(3, 5))
+    return ' '.join(sentence.format(
+        topic=rng.choice(TOPICS), context=rng.choice(CONTEXTS), usage=rng.choice(USAGES),
+        percent=rng.randint(10, 45), mm=rng.choice((1, 2, 3, 5, 8, 10, 15)),
+    ) for sentence in sentences)
+
+
+# --- Файлы-заглушки ---
+
+def placeholder_pdf(size, rng):
+    """Одностраничный PDF около size байт (несжимаемый поток-наполнитель)"""
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>',
+    ]
+    filler = rng.randbytes(max(size - 400, 0))
+    objects.append(b'<< /Length %d >>\nstream\n' % len(filler) + filler + b'\nendstream')
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    out.write(b''.join(b'%010d 00000 n \n' % offset for offset in offsets))
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def placeholder_cover(issue, rng):
+    """Обложка-заглушка: цвет по десятилетию, год и номер выпуска"""
+    hue = (issue.year // 10 * 37) % 255
+    image = Image.new('RGB', COVER_SIZE, (hue, 90 + rng.randint(0, 60), 255 - hue))
+    draw = ImageDraw.Draw(image)
+    draw.text((40, 60), f'{issue.year}  No {issue.number}', fill=(255, 255, 255))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=80)
+    return buffer.getvalue()
+
+
+class _FileWriter:
+    """Пишет файлы в локальное хранилище поля; одинаковое содержимое - жесткими ссылками"""
+
+    def __init__(self):
+        self.sources = {}
+
+    def place(self, instance, field_name, filename, content):
+        """Кладет файл по upload_to поля; возвращает (имя, sha256, размер, mtime)"""
+        field = instance._meta.get_field(field_name)
+        name = field.generate_filename(instance, filename)
+        path = field.storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.lexists(path):
+            os.remove(path)
+        digest = hashlib.sha256(content).hexdigest()
+        source = self.sources.get(digest)
+        if source is None:
+            with open(path, 'wb') as fh:
+                fh.write(content)
+            self.sources[digest] = path
+        else:
+            try:
+                os.link(source, path)
+            except OSError:
+                shutil.copyfile(source, path)
+        mtime = datetime.fromtimestamp(os.stat(path).st_mtime, tz=dt_timezone.utc)
+        return name, digest, len(content), mtime
+
+
+# --- Генерация ---
+
+def clear_catalogue():
+    """
+    Удаляет выпуски, статьи, их тексты, архивные периоды и поисковый индекс - по
+    одному DELETE на таблицу, без сигналов на каждую строку. Файлы на диске остаются.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for model in (ArticleText, Article, JournalIssue, ArchiveYear):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+        search.clear_index()
+
+
+def _distribute(total, parts, rng):
+    """total статей по parts выпускам: поровну с разбросом +-30%, в сумме ровно total"""
+    weights = [rng.uniform(0.7, 1.3) for _ in range(parts)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for index in rng.sample(range(parts), total - sum(counts)):
+        counts[index] += 1
+    return counts
+
+
+def _issues(start_year, end_year, issues_per_year):
+    issues = []
+    for year in range(start_year, end_year + 1):
+        for number in range(1, issues_per_year + 1):
+            month = 1 + (number - 1) * 12 // issues_per_year
+            issues.append(JournalIssue(
+                year=year, volume=str(year - start_year + 1), number=str(number),
+                number_sort=issue_number_key(str(number)), publication_date=date(year, month, 15),
+            ))
+    issues[-1].is_current = True
+    return issues
+
+
+def generate_catalogue(articles=10000, start_year=1957, end_year=None, issues_per_year=6, seed=1,
+                       files=False, pdf_kb=200, archive_span=10, batch_size=2000, index=True, log=None):
+    """
+    Создает синтетический каталог. Возвращает {'issues': N, 'articles': N, 'archive_periods': N}.
+    files=True - PDF-заглушки статей (pdf_kb КиБ) и выпусков и обложки в MEDIA_ROOT.
+    index=False - не перестраивать поисковый индекс (это дольше, чем сама генерация).
+    """
+    rng = random.Random(seed)
+    # Файлы - из своего генератора, иначе с files=True записи каталога получились бы другими
+    file_rng = random.Random(seed)
+    end_year = end_year or timezone.now().year
+    issues = _issues(start_year, end_year, issues_per_year)
+    counts = _distribute(articles, len(issues), rng)
+    writer = _FileWriter() if files else None
+    if files:
+        article_pdf = placeholder_pdf(pdf_kb * 1024, file_rng)
+        issue_pdf = placeholder_pdf(pdf_kb * 1024 * 4, file_rng)
+
+    created = 0
+    with transaction.atomic():
+        for issue in issues:
+            if files:
+                issue.full_pdf.name, issue.full_pdf_sha256, issue.full_pdf_size, issue.full_pdf_mtime = (
+                    writer.place(issue, 'full_pdf', 'issue.pdf', issue_pdf))
+                cover = placeholder_cover(issue, file_rng)
+                issue.cover.name, issue.cover_sha256, issue.cover_size, issue.cover_mtime = (
+                    writer.place(issue, 'cover', 'cover.jpg', cover))
+                issue.cover_width, issue.cover_height = COVER_SIZE
+        JournalIssue.objects.bulk_create(issues, batch_size=batch_size)
+        if log:
+            log(f"Выпусков: {len(issues)} ({start_year}-{end_year})")
+
+        batch = []
+        for issue, count in zip(issues, counts):
+            page = 1
+            for position in range(count):
+                pages = rng.randint(4, 16)
+                article = Article(
+                    issue=issue, title=_title(rng), authors=_authors(rng), rubric=rng.choice(RUBRICS),
+                    abstract=_abstract(rng), page_start=page, page_end=page + pages - 1,
+                    is_published=rng.random() < 0.97,
+                )
+                page += pages
+                if files:
+                    article.pdf_file.name, article.pdf_sha256, article.pdf_size, article.pdf_mtime = (
+                        writer.place(article, 'pdf_file', f'article-{position + 1}.pdf', article_pdf))
+                batch.append(article)
+                if len(batch) >= batch_size:
+                    Article.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+                    if log:
+                        log(f"Статей: {created}/{articles}")
+        Article.objects.bulk_create(batch)
+        created += len(batch)
+
+        periods = [
+            ArchiveYear(start_year=start, end_year=min(start + archive_span - 1, end_year),
+                        slug=f'{start}-{min(start + archive_span - 1, end_year)}')
+            for start in range(start_year, end_year + 1, archive_span)
+        ]
+        ArchiveYear.objects.bulk_create(periods)
+
+    # То, что при обычном save() делают сигналы
+    if index:
+        search.rebuild_index()
+        if log:
+            log("Поисковый индекс перестроен")
+    page_cache.invalidate_all()
+    for period in periods:
+        archive.invalidate_period(period)
+    sitemaps.mark_stale()
+    return {'issues': len(issues), 'articles': created, 'archive_periods': len(periods)}
@@ -0,0 +1,52 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from journal.images import mime_type, srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, derivatives, alt='', sizes='100vw', src=None, css_class='', eager=False):
+    """
+    Выводит <picture> с AVIF/WebP-вариантами картинки, размерами и ленивой загрузкой.
+
+    image - поле ImageField, derivatives - JSON с вариантами (см. images.py),
+    src - адрес оригинала (по умолчанию image.url), eager - не откладывать загрузку
+    (для картинок на первом экране).
+
+    Пример: {% responsive_image issue.cover issue.cover_derivatives alt=issue sizes="220px" %}
+    """
+    if not image:
+        return ''
+    derivatives = derivatives or {}
+    src = src or image.url
+
+    sources = []
+    formats = []
+    for variant in derivatives.get('variants', []):
+        if variant['format'] not in formats:
+            formats.append(variant['format'])
+    for fmt in formats:
+        sources.append((mime_type(fmt), srcset(image.storage, derivatives, fmt), sizes))
+
+    # Размеры берем из полей модели - без открытия файла
+    field = image.field
+    width = derivatives.get('width') or (getattr(image.instance, field.width_field) if field.width_field else None)
+    height = derivatives.get('height') or (getattr(image.instance, field.height_field) if field.height_field else None)
+
+    style = ''
+    if derivatives.get('lqip'):
+        style = f"background-image: url({derivatives['lqip']}); background-size: cover;"
+
+    return format_html(
+        '<picture>{}<img src="{}" alt="{}"{}{}{}{} loading="{}" decoding="async"></picture>',
+        format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', sources),
+        src,
+        alt,
+        format_html(' width="{}"', width) if width else '',
+        format_html(' height="{}"', height) if height else '',
+        format_html(' class="{}"', css_class) if css_class else '',
+        format_html(' style="{}"', style) if style else '',
+        'eager' if eager else 'lazy',
+    )
@@ -1,3 +1,1150 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import OperationalError, connection
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.middleware.csrf import CSRF_SECRET_LENGTH, CsrfViewMiddleware, get_token
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from PIL import Image
+
+from gia_journal.database import READ_ALIAS, WRITE_ALIAS, sqlite_databases
+
+from . import (
+    archive, bulk_import, contact_queue, export, images, loadtest, metrics, oai, page_cache, search, sitemaps,
+    synthetic, text_extraction,
+)
+from .models import ArchiveYear, Article, ArticleText, ContactMessage, EditorialBoard, JournalInfo, JournalIssue
+from .pagination import FORWARD, encode_cursor
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='gia-tests-')
+
+# Размер тестового набора: выпусков, статей в выпуске, членов редколлегии
+SEED_ISSUES = 24
+SEED_ARTICLES_PER_ISSUE = 8
+SEED_BOARD_MEMBERS = 15
+
+# Максимум SQL-запросов на страницу. Бюджеты не зависят от объема данных:
+# если страница начинает делать запрос на каждую строку, тест падает.
+QUERY_BUDGETS = {
+    'home': 0,
+    'contact': 0,
+    'issues': 2,
+    'issue_detail': 2,
+    'download_issue_pdf': 1,
+    'read_issue_pdf': 1,
+    'issue_cover': 1,
+    'articles': 2,
+    'article_detail': 1,
+    'download_article_pdf': 1,
+    'read_article_pdf': 1,
+    'search': 2,
+    'search_api': 2,
+    # API: строки страницы - один запрос и для ETag, и для ответа
+    'api_issues': 1,
+    'api_issue': 1,
+    'api_articles': 1,
+    'api_article': 1,
+    'api_editorial_board': 1,
+    'api_editorial_member': 1,
+    'api_archive_periods': 1,
+    'api_archive_period': 1,
+    # OAI-PMH ListRecords: информация о журнале и страница записей
+    'oai': 2,
+    # Карта сайта: сверка частей с БД (в тестах - при каждом запросе) и запись шарда статей
+    'sitemap': 6,
+    'sitemap_part': 6,
+    # Метрики собираются из памяти и файлов воркеров
+    'metrics': 0,
+    'archive': 1,
+    'archive_range': 2,
+    'editorial_board': 1,
+    'editorial_staff': 0,
+    'history': 0,
+    'journal_info': 1,
+    'sections': 0,
+    'focus_and_scope': 0,
+    'peer_reviewing': 0,
+    'ethics': 0,
+    'copyright': 0,
+    'conflict_of_interests': 0,
+    'open_access': 0,
+    'privacy_policy': 0,
+    'fees': 0,
+    'guidelines': 0,
+    'text_design': 0,
+    'references': 0,
+}
+# Списки в админке: сессия, пользователь, количество и сами строки (+ фильтры)
+ADMIN_QUERY_BUDGETS = {
+    JournalIssue: 7,
+    Article: 8,
+    EditorialBoard: 7,
+    ContactMessage: 6,
+    JournalInfo: 7,  # has_add_permission проверяет, есть ли уже запись
+    ArchiveYear: 6,
+}
+# Суммарное время SQL на страницу, мс (с запасом - ловит только грубые регрессии)
+SQL_TIME_BUDGET_MS = 500
+
+
+def _cover_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (60, 80), (40, 120, 60)).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name='cover.png')
+
+
+def _pdf(name):
+    return ContentFile(b'%PDF-1.4\n%%EOF\n', name=name)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    JOURNAL_PAGE_CACHE={'ENABLED': False},
+    JOURNAL_SITEMAPS={'ROOT': f'{MEDIA_ROOT}/sitemaps', 'CHECK_INTERVAL': 0},
+    JOURNAL_CONTACT={'QUEUE_DIR': f'{MEDIA_ROOT}/contact-queue', 'BATCH_SIZE': 3, 'FLUSH_INTERVAL': 0},
+    JOURNAL_THROTTLE={'contact': {'RATE': 1, 'PERIOD': 60, 'BURST': 3}},
+    JOURNAL_SERVER_TIMING={'SAMPLE_RATE': 0},
+    JOURNAL_METRICS={'DIR': f'{MEDIA_ROOT}/metrics', 'FLUSH_INTERVAL': 0},
+)
+class QueryBudgetTests(TestCase):
+    """Число SQL-запросов и время SQL для каждого адреса journal/urls.py и списков админки"""
+
+    @classmethod
+    def setUpTestData(cls):
+        JournalInfo.objects.create(title='Известия вузов. Геодезия и аэрофотосъемка')
+        ArchiveYear.objects.create(start_year=2001, end_year=2024, slug='2001-2024')
+        for i in range(SEED_BOARD_MEMBERS):
+            EditorialBoard.objects.create(name=f'Член редколлегии {i}', position='Профессор', order=i)
+        for i in range(10):
+            ContactMessage.objects.create(name=f'Автор {i}', email=f'author{i}@example.org', message='Вопрос')
+
+        for i in range(SEED_ISSUES):
+            issue = JournalIssue.objects.create(
+                year=2001 + i, volume=str(45 + i), number=str(i % 6 + 1), is_current=(i == SEED_ISSUES - 1),
+            )
+            for j in range(SEED_ARTICLES_PER_ISSUE):
+                Article.objects.create(
+                    issue=issue, title=f'Геодезические измерения {i}-{j}', authors='Иванов И. И., Петров П. П.',
+                    rubric='Геодезия', abstract='Аннотация статьи о спутниковой геодезии.',
+                    page_start=j * 10 + 1, page_end=j * 10 + 9,
+                )
+        cls.issue = JournalIssue.objects.filter(is_current=True).get()
+        cls.issue.cover = _cover_image()
+        cls.issue.full_pdf = _pdf('issue.pdf')
+        cls.issue.save()
+        cls.article = cls.issue.articles.first()
+        cls.article.pdf_file = _pdf('article.pdf')
+        cls.article.save()
+
+        cls.admin_user = get_user_model().objects.create_superuser('editor', 'editor@example.org', 'password')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def url_for(self, name):
+        """Адрес страницы для маршрута с параметрами - на объектах тестового набора"""
+        args = {
+            'issue_detail': [self.issue.pk],
+            'download_issue_pdf': [self.issue.pk],
+            'read_issue_pdf': [self.issue.pk],
+            'issue_cover': [self.issue.pk],
+            'article_detail': [self.article.pk],
+            'download_article_pdf': [self.article.pk],
+            'read_article_pdf': [self.article.pk],
+            'archive_range': ['2001-2024'],
+            'api_issue': [self.issue.pk],
+            'api_article': [self.article.pk],
+            'api_editorial_member': [EditorialBoard.objects.first().pk],
+            'api_archive_period': ['2001-2024'],
+            'sitemap_part': ['articles-0'],
+        }.get(name, [])
+        query = {
+            'search': '?q=геодезия',
+            'search_api': '?q=геодезия',
+            'oai': '?verb=ListRecords&metadataPrefix=oai_dc',
+        }.get(name, '')
+        return reverse(name, args=args) + query
+
+    def assertWithinBudget(self, url, budget):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            if response.streaming:
+                # Потоковый ответ читает БД при отдаче - считаем и эти запросы
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        sql_time_ms = sum(float(query['time']) for query in queries.captured_queries) * 1000
+        details = '\n'.join(query['sql'] for query in queries.captured_queries)
+        self.assertLessEqual(
+            len(queries), budget,
+            f"{url}: {len(queries)} запросов при бюджете {budget} ({sql_time_ms:.1f} мс SQL)\n{details}",
+        )
+        self.assertLessEqual(sql_time_ms, SQL_TIME_BUDGET_MS, f"{url}: {sql_time_ms:.1f} мс SQL")
+
+    def test_every_url_has_budget(self):
+        names = {pattern.name for pattern in get_resolver('journal.urls').url_patterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_public_pages(self):
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(name=name):
+                self.assertWithinBudget(self.url_for(name), budget)
+
+    def test_contact_post(self):
+        """Отправка формы не пишет в БД; сообщения записываются пачкой одним INSERT"""
+        cache.clear()
+        data = {'name': 'Автор', 'email': 'author@example.org', 'message': 'Вопрос'}
+        for i in range(3):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('contact'), data)
+            self.assertEqual(response.json(), {'success': True})
+            # Третье сообщение дополняет пачку: запрос записывает ее целиком
+            self.assertEqual(len(queries), 0 if i < 2 else 1, '\n'.join(q['sql'] for q in queries.captured_queries))
+        self.assertEqual(ContactMessage.objects.filter(email='author@example.org').count(), 3)
+
+        response = self.client.post(reverse('contact'), data)
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(response.json()['success'])
+
+    def test_contact_queue_redelivery(self):
+        """Пачка, записанная повторно (процесс упал до удаления файлов), не создает дублей"""
+        contact_queue.enqueue({'name': 'Автор', 'email': 'resend@example.org', 'message': 'Вопрос'})
+        path = next(contact_queue.queue_dir().glob('*.json'))
+        content = path.read_text(encoding='utf-8')
+        self.assertEqual(contact_queue.flush(), 1)
+        path.write_text(content, encoding='utf-8')
+        contact_queue.flush()
+        self.assertEqual(ContactMessage.objects.filter(email='resend@example.org').count(), 1)
+        self.assertEqual(contact_queue.pending_count(), 0)
+
+    def test_api_list(self):
+        url = reverse('api_issues') + '?limit=5&fields=id,volume'
+        response = self.client.get(url)
+        data = json.loads(b''.join(response.streaming_content))
+        ids = list(JournalIssue.objects.order_by('-year', '-number_sort', '-number', '-pk').values_list('pk', flat=True))
+        self.assertEqual([row['id'] for row in data['results']], ids[:5])
+        self.assertIsNone(data['previous'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        JournalIssue.objects.filter(pk=ids[2]).update(volume='99')
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+        second = json.loads(b''.join(self.client.get(f"{url}&cursor={data['next']}").streaming_content))
+        self.assertEqual([row['id'] for row in second['results']], ids[5:10])
+        back = json.loads(b''.join(self.client.get(f"{url}&cursor={second['previous']}").streaming_content))
+        self.assertEqual([row['id'] for row in back['results']], ids[:5])
+
+        # Неактивный период не виден ни в списке, ни по адресу
+        ArchiveYear.objects.create(start_year=1990, end_year=2000, slug='1990-2000', is_active=False)
+        periods = json.loads(b''.join(self.client.get(reverse('api_archive_periods')).streaming_content))
+        slugs = [row['slug'] for row in periods['results']]
+        self.assertIn('2001-2024', slugs)
+        self.assertNotIn('1990-2000', slugs)
+        self.assertEqual(self.client.get(reverse('api_archive_period', args=['1990-2000'])).status_code, 404)
+
+    def test_cover_cache_policy(self):
+        """immutable - только по адресу из cover_url, а не по любому префиксу хэша"""
+        response = self.client.get(self.issue.cover_url)
+        self.assertIn('immutable', response['Cache-Control'])
+        for version in ('a', self.issue.cover_sha256[:1], self.issue.cover_sha256):
+            with self.subTest(version=version):
+                response = self.client.get(reverse('issue_cover', args=[self.issue.pk]), {'v': version})
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_oai_jats_record(self):
+        """Элементы JATS - без пространства имен, схема в xsi:noNamespaceSchemaLocation"""
+        response = self.client.get(reverse('oai'), {'verb': 'ListRecords', 'metadataPrefix': 'jats'})
+        ns = '{http://www.openarchives.org/OAI/2.0/}'
+        root = ElementTree.fromstring(b''.join(response.streaming_content) if response.streaming else response.content)
+        article = root.find(f'{ns}ListRecords/{ns}record/{ns}metadata/article')
+        self.assertIsNotNone(article)
+        self.assertIsNotNone(article.find('front/article-meta/title-group/article-title'))
+        self.assertEqual(
+            article.get('{http://www.w3.org/2001/XMLSchema-instance}noNamespaceSchemaLocation'), oai.JATS_SCHEMA,
+        )
+
+    def test_export_keeps_manifest_on_failure(self):
+        """Ошибка одной страницы не сбрасывает манифест: повторный запуск рендерит только ее"""
+        pages = [export._page(reverse('history'), 'v1'), export._page(reverse('fees'), 'v1'),
+                 export._page('/no-such-page/', 'v1')]
+        output_dir = Path(MEDIA_ROOT) / 'export'
+        with mock.patch.object(export, 'collect_pages', return_value=pages), \
+                mock.patch.object(export, 'copy_assets', return_value=0):
+            result = export.export_site(output_dir, workers=2)
+            self.assertEqual((result['rendered'], len(result['failed'])), (2, 1))
+            self.assertIn('/no-such-page/: HTTP 404', result['failed'][0])
+            manifest = json.loads((output_dir / export.MANIFEST_NAME).read_text())
+            self.assertEqual(set(manifest), {'history/index.html', 'fees/index.html'})
+
+            result = export.export_site(output_dir, workers=2)
+            self.assertEqual((result['rendered'], result['skipped'], len(result['failed'])), (0, 2, 1))
+
+    def test_server_timing(self):
+        """Server-Timing - только сотрудникам; поля в журнал - для запросов из выборки"""
+        url = self.url_for('issue_detail')
+        self.assertNotIn('Server-Timing', self.client.get(url))
+
+        self.client.force_login(self.admin_user)
+        header = self.client.get(url)['Server-Timing']
+        self.assertRegex(header, r'^app;dur=[\d.]+;desc="view and middleware", db;dur=[\d.]+;desc="\d+ queries", tpl;')
+
+        self.client.logout()
+        with override_settings(JOURNAL_SERVER_TIMING={'SAMPLE_RATE': 1}), self.assertLogs('journal.timing') as logs:
+            self.client.get(url)
+            b''.join(self.client.get(self.url_for('read_article_pdf')).streaming_content)
+        page, pdf = (record.timing for record in logs.records)
+        self.assertEqual((page['view'], page['status']), ('issue_detail', 200))
+        self.assertGreaterEqual(page['db_queries'], 1)
+        self.assertGreater(page['template_ms'], 0)
+        self.assertEqual(pdf['bytes'], self.article.pdf_file.size)
+
+    def test_metrics(self):
+        """Метрики процесса и снимки других воркеров; завершившиеся воркеры сливаются в один файл"""
+        root = metrics.metrics_dir()
+        root.mkdir(parents=True, exist_ok=True)
+        key = ('journal_http_responses_total', (('view', 'other_worker'), ('status', '200')))
+        worker = metrics._Registry()
+        worker.counters[key] = 2
+        # Живой процесс (родитель) и завершившийся (pid больше любого допустимого)
+        (root / f'{os.getppid()}-a{metrics.SNAPSHOT_SUFFIX}').write_text(json.dumps(metrics._encode(worker)))
+        (root / f'99999999-b{metrics.SNAPSHOT_SUFFIX}').write_text(json.dumps(metrics._encode(worker)))
+
+        self.client.get(self.url_for('archive_range'))
+        self.client.get(self.url_for('read_article_pdf'))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('journal_http_responses_total{view="other_worker",status="200"} 4\n', body)
+        self.assertRegex(body, r'journal_http_request_duration_seconds_bucket\{view="archive_range",le="\+Inf"\} [1-9]')
+        self.assertRegex(body, r'journal_db_queries_total\{view="read_article_pdf"\} [1-9]')
+        self.assertRegex(body, r'journal_file_bytes_served_total\{view="read_article_pdf"\} [1-9]')
+        self.assertRegex(body, r'journal_cache_requests_total\{cache="archive_range",result="(hit|miss)"\} [1-9]')
+        self.assertIn('journal_contact_queue_pending 0\n', body)
+        self.assertFalse((root / f'99999999-b{metrics.SNAPSHOT_SUFFIX}').exists())
+        self.assertTrue((root / metrics.ARCHIVE_NAME).exists())
+
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.5').status_code, 404)
+
+    def test_admin_changelists(self):
+        self.client.force_login(self.admin_user)
+        for model, budget in ADMIN_QUERY_BUDGETS.items():
+            self.assertIn(model, admin.site._registry)
+            url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist')
+            with self.subTest(model=model.__name__):
+                self.assertWithinBudget(url, budget)
+
+
+# Содержимое тестового PDF: у каждого байта своя позиция, удобно сверять диапазоны
+PDF_BODY = b'%PDF-1.4\n' + bytes(range(256)) * 4
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, JOURNAL_PAGE_CACHE={'ENABLED': False})
+class FileRangeTests(TestCase):
+    """Range-запросы к PDF статьи: 206, multipart/byteranges, 416 и If-Range"""
+
+    @classmethod
+    def setUpTestData(cls):
+        issue = JournalIssue.objects.create(year=2024, volume='68', number='1')
+        cls.article = Article.objects.create(issue=issue, title='Статья', authors='Иванов И. И.',
+                                             pdf_file=ContentFile(PDF_BODY, name='range.pdf'))
+        cls.url = reverse('read_article_pdf', args=[cls.article.pk])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_file(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, PDF_BODY)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['ETag'], f'"{self.article.pdf_sha256}"')
+
+    def test_single_range(self):
+        for header, (start, end) in [('bytes=0-9', (0, 9)), ('bytes=100-', (100, len(PDF_BODY) - 1)),
+                                     ('bytes=-16', (len(PDF_BODY) - 16, len(PDF_BODY) - 1))]:
+            with self.subTest(header=header):
+                response, body = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{len(PDF_BODY)}')
+                self.assertEqual(body, PDF_BODY[start:end + 1])
+                self.assertEqual(int(response['Content-Length']), len(body))
+
+    def test_multiple_ranges(self):
+        response, body = self.get(HTTP_RANGE='bytes=0-4, 200-209, 3-6')
+        self.assertEqual(response.status_code, 206)
+        content_type, _, boundary = response['Content-Type'].partition('; boundary=')
+        self.assertEqual(content_type, 'multipart/byteranges')
+        self.assertEqual(int(response['Content-Length']), len(body))
+        parts = body.split(f'--{boundary}'.encode())[1:-1]
+        # Пересекающиеся 0-4 и 3-6 склеиваются в один диапазон
+        self.assertEqual(len(parts), 2)
+        for part, (start, end) in zip(parts, [(0, 6), (200, 209)]):
+            headers, _, data = part.partition(b'\r\n\r\n')
+            self.assertIn(f'Content-Range: bytes {start}-{end}/{len(PDF_BODY)}'.encode(), headers)
+            self.assertEqual(data, PDF_BODY[start:end + 1] + b'\r\n')
+
+    def test_unsatisfiable_and_invalid_ranges(self):
+        response, _ = self.get(HTTP_RANGE=f'bytes={len(PDF_BODY)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(PDF_BODY)}')
+        # Некорректный заголовок игнорируется - весь файл
+        response, body = self.get(HTTP_RANGE='bytes=9-1')
+        self.assertEqual((response.status_code, body), (200, PDF_BODY))
+
+    def test_if_range(self):
+        etag = f'"{self.article.pdf_sha256}"'
+        response, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual((response.status_code, body), (206, PDF_BODY[:10]))
+        # Файл изменился (другой ETag) или слабый тег - отдается файл целиком
+        for if_range in ('"outdated"', f'W/{etag}'):
+            with self.subTest(if_range=if_range):
+                response, body = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=if_range)
+                self.assertEqual((response.status_code, body), (200, PDF_BODY))
+
+    async def test_async_range(self):
+        """Под ASGI тело читается асинхронно в пуле потоков - Range, multipart и 304 работают так же"""
+        client = AsyncClient()
+
+        async def get(**headers):
+            response = await client.get(self.url, headers=headers)
+            body = b''.join([chunk async for chunk in response.streaming_content]) if response.streaming else b''
+            return response, body
+
+        response, body = await get()
+        self.assertTrue(response.is_async)
+        self.assertEqual((response.status_code, body), (200, PDF_BODY))
+        response, body = await get(Range='bytes=10-19')
+        self.assertEqual((response.status_code, body), (206, PDF_BODY[10:20]))
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(PDF_BODY)}')
+        response, body = await get(Range='bytes=0-1,100-101')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(len(body), int(response['Content-Length']))
+        self.assertIn(PDF_BODY[100:102], body)
+        response, body = await get(Range='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        response, body = await get(**{'If-None-Match': f'"{self.article.pdf_sha256}"', 'Range': 'bytes=0-9'})
+        self.assertEqual((response.status_code, body), (304, b''))
+
+    def test_proxy_delivery(self):
+        """X-Accel-Redirect / X-Sendfile: тело отдает прокси, Django - только заголовки"""
+        path = self.article.pdf_file.path
+        backends = [
+            ({'BACKEND': 'journal.files.NginxAccelDelivery', 'OPTIONS': {'location': '/protected-media/'}},
+             'X-Accel-Redirect', '/protected-media/' + self.article.pdf_file.name),
+            ({'BACKEND': 'journal.files.SendfileDelivery'}, 'X-Sendfile', path),
+            ({'BACKEND': 'journal.files.SendfileDelivery', 'OPTIONS': {'header': 'X-LIGHTTPD-send-file'}},
+             'X-LIGHTTPD-send-file', path),
+        ]
+        for config, header, target in backends:
+            with self.subTest(header=header), override_settings(JOURNAL_FILE_DELIVERY=config):
+                response, body = self.get(HTTP_RANGE='bytes=0-9')
+                self.assertEqual((response.status_code, body), (200, b''))
+                self.assertEqual(response[header], target)
+                self.assertEqual(response['Content-Type'], 'application/pdf')
+                self.assertTrue(response['Content-Disposition'].startswith('inline'))
+                self.assertEqual(response['ETag'], f'"{self.article.pdf_sha256}"')
+                self.assertIn('max-age', response['Cache-Control'])
+                download = self.client.get(reverse('download_article_pdf', args=[self.article.pk]))
+                self.assertEqual(download[header], target)
+                self.assertIn(f'Article_{self.article.pk}.pdf', download['Content-Disposition'])
+                self.assertTrue(download['Content-Disposition'].startswith('attachment'))
+                # 304 по отпечатку - без заголовка для прокси
+                response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.article.pdf_sha256}"')
+                self.assertEqual(response.status_code, 304)
+                self.assertNotIn(header, response)
+
+
+@override_settings(JOURNAL_PAGE_CACHE={'ENABLED': False})
+class SearchTests(TestCase):
+    """Поиск FTS5: русские словоформы, веса колонок, только опубликованные статьи"""
+
+    @classmethod
+    def setUpTestData(cls):
+        issue = JournalIssue.objects.create(year=2024, volume='68', number='2')
+
+        def article(title, abstract='', authors='Петров П. П.', **kwargs):
+            return Article.objects.create(issue=issue, title=title, authors=authors, abstract=abstract, **kwargs)
+
+        cls.in_abstract = article('Обзор методов', 'Рассмотрены спутниковые измерения деформаций плотин.')
+        cls.in_title = article('Спутниковые измерения деформаций', 'Результаты наблюдений.')
+        cls.by_author = article('Нивелирование', authors='Измерителев А. А.')
+        cls.unrelated = article('Картографическая генерализация', 'Цифровые карты.')
+        cls.unpublished = article('Измерение деформаций', is_published=False)
+
+    def test_stemming(self):
+        self.assertEqual(search.stem_ru('измерениями'), search.stem_ru('измерения'))
+        self.assertEqual(search.normalize('Спутниковых ИЗМЕРЕНИЙ, GNSS'), 'спутников измерен gnss')
+        # Другие словоформы запроса находят те же статьи
+        for query in ('спутниковое измерение', 'спутниковыми измерениями', 'СПУТНИКОВЫХ ИЗМЕРЕНИЙ'):
+            with self.subTest(query=query):
+                self.assertEqual(set(search.search_article_ids(query)), {self.in_title.pk, self.in_abstract.pk})
+
+    def test_ranking(self):
+        """Совпадение в названии весит больше, чем в аннотации"""
+        self.assertEqual(search.search_article_ids('измерения деформаций'), [self.in_title.pk, self.in_abstract.pk])
+        # Слова ищутся по префиксу: "измер" находит и фамилию автора
+        self.assertIn(self.by_author.pk, search.search_article_ids('измер'))
+
+    def test_index_follows_saves(self):
+        self.assertNotIn(self.unpublished.pk, search.search_article_ids('измерение'))
+        self.unpublished.is_published = True
+        self.unpublished.save()
+        self.assertIn(self.unpublished.pk, search.search_article_ids('измерение'))
+        self.unrelated.delete()
+        self.assertEqual(search.search_article_ids('генерализация'), [])
+
+    def test_index_filled_after_migrate(self):
+        """Миграции создают пустую таблицу индекса - ее заполняет обработчик post_migrate"""
+        search.clear_index()
+        self.assertEqual(search.search_article_ids('деформаций'), [])
+        emit_post_migrate_signal(0, False, connection.alias)
+        self.assertEqual(set(search.search_article_ids('деформаций')), {self.in_title.pk, self.in_abstract.pk})
+        # Вместе с метаданными в индекс попадает уже извлеченный текст PDF
+        record = ArticleText(article=self.unrelated, source_hash='test')
+        record.text = 'Триангуляция опорной сети'
+        record.save()
+        search.clear_index()
+        emit_post_migrate_signal(0, False, connection.alias)
+        self.assertEqual(search.search_article_ids('триангуляция'), [self.unrelated.pk])
+
+        # Непустой индекс не перестраивается
+        with mock.patch.object(search, 'rebuild_index') as rebuild_index:
+            emit_post_migrate_signal(0, False, connection.alias)
+        rebuild_index.assert_not_called()
+
+    def test_search_api(self):
+        data = self.client.get(reverse('search_api'), {'q': 'спутниковых деформаций'}).json()
+        self.assertEqual([row['id'] for row in data['results']], [self.in_title.pk, self.in_abstract.pk])
+        self.assertEqual(self.client.get(reverse('search_api'), {'q': ''}).json()['results'], [])
+
+
+def text_pdf(pages):
+    """PDF с одной строкой текста на каждой странице"""
+    count = len(pages)
+    kids = ' '.join(f'{3 + 2 * n} 0 R' for n in range(count))
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', f'<< /Type /Pages /Kids [{kids}] /Count {count} >>'.encode()]
+    for n, line in enumerate(pages):
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {4 + 2 * n} 0 R '
+                       f'/Resources << /Font << /F1 {3 + 2 * count} 0 R >> >> >>'.encode())
+        stream = f'BT /F1 12 Tf 72 720 Td ({line}) Tj ET'.encode()
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+    objects.append(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+    out = io.BytesIO(b'%PDF-1.4\n')
+    out.seek(0, io.SEEK_END)
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    out.write(b''.join(b'%010d 00000 n \n' % offset for offset in offsets))
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, JOURNAL_PAGE_CACHE={'ENABLED': False})
+class TextExtractionTests(TestCase):
+    """Текст PDF для поиска: неизмененные файлы пропускаются, PDF выпуска делится по страницам статей"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.issue = JournalIssue.objects.create(year=2024, volume='68', number='3', full_pdf_first_page=11,
+                                                full_pdf=ContentFile(text_pdf([f'page {n}' for n in range(11, 15)]),
+                                                                     name='issue.pdf'))
+        cls.own = Article.objects.create(issue=cls.issue, title='Своя', authors='Иванов И. И.', page_start=1, page_end=1,
+                                         pdf_file=ContentFile(text_pdf(['geodesy']), name='own.pdf'))
+        cls.first = Article.objects.create(issue=cls.issue, title='Первая', authors='Петров П. П.',
+                                           page_start=11, page_end=12)
+        cls.second = Article.objects.create(issue=cls.issue, title='Вторая', authors='Сидоров С. С.',
+                                            page_start=13, page_end=14)
+
+    def texts(self):
+        return {record.article_id: record.text.split() for record in ArticleText.objects.all()}
+
+    def test_skips_unchanged_files(self):
+        self.assertEqual(text_extraction.run_extraction(workers=0), 3)
+        self.assertEqual(text_extraction.run_extraction(workers=0), 0)
+        self.assertEqual(text_extraction.collect_jobs(Article.objects.all()), [])
+        self.assertEqual(text_extraction.run_extraction(Article.objects.filter(pk=self.own.pk), workers=0, force=True), 1)
+
+        # Новый файл статьи - новый хэш, извлекается только она
+        self.own.pdf_file = ContentFile(text_pdf(['cartography']), name='own.pdf')
+        self.own.save()
+        self.assertEqual(text_extraction.run_extraction(workers=0), 1)
+        self.assertEqual(self.texts()[self.own.pk], ['cartography'])
+
+    def test_issue_pdf_split_by_pages(self):
+        text_extraction.run_extraction(workers=0)
+        texts = self.texts()
+        self.assertEqual(texts[self.own.pk], ['geodesy'])
+        self.assertEqual(texts[self.first.pk], ['page', '11', 'page', '12'])
+        self.assertEqual(texts[self.second.pk], ['page', '13', 'page', '14'])
+
+        # Сменился диапазон страниц - заново только эта статья, страницы за концом PDF отбрасываются
+        self.second.page_end = 20
+        self.second.save()
+        self.assertEqual(text_extraction.run_extraction(workers=0), 1)
+        self.assertEqual(self.texts()[self.second.pk], ['page', '13', 'page', '14'])
+
+    def test_upload_schedules_extraction(self):
+        with mock.patch.object(text_extraction, 'schedule') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.own.save()
+            schedule.assert_called_once_with([self.own.pk])
+            schedule.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.issue.save()
+            self.assertCountEqual(schedule.call_args.args[0], [self.own.pk, self.first.pk, self.second.pk])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, JOURNAL_PAGE_CACHE={'ENABLED': False})
+class BulkImportTests(TestCase):
+    """Импорт архива: повторный запуск ничего не создает, прерванный - продолжается"""
+
+    def setUp(self):
+        self.source = Path(tempfile.mkdtemp(prefix='gia-import-'))
+        self.addCleanup(shutil.rmtree, self.source, ignore_errors=True)
+        self.media = Path(MEDIA_ROOT)
+        shutil.rmtree(self.media / 'issues', ignore_errors=True)
+        shutil.rmtree(self.media / 'articles', ignore_errors=True)
+        manifest = []
+        for number in range(1, 6):
+            folder = self.source / str(number)
+            folder.mkdir()
+            (folder / 'full.pdf').write_bytes(PDF_BODY + str(number).encode())
+            articles = []
+            for page in (1, 11):
+                (folder / f'p{page}.pdf').write_bytes(PDF_BODY + f'{number}-{page}'.encode())
+                articles.append({'title': f'Статья {number}-{page}', 'authors': 'Иванов И. И.',
+                                 'page_start': page, 'page_end': page + 9, 'pdf': f'{number}/p{page}.pdf'})
+            manifest.append({'year': 1957, 'volume': '1', 'number': str(number), 'pdf': f'{number}/full.pdf',
+                             'articles': articles})
+        self.manifest = self.source / 'manifest.json'
+        self.manifest.write_text(json.dumps(manifest, ensure_ascii=False), encoding='utf-8')
+
+    def run_import(self):
+        return bulk_import.import_archive(self.manifest, workers=1, batch_size=2)
+
+    def stored_files(self):
+        return sorted(str(path.relative_to(self.media)) for folder in ('issues', 'articles')
+                      for path in (self.media / folder).rglob('*.pdf'))
+
+    def referenced_files(self):
+        return sorted([*JournalIssue.objects.values_list('full_pdf', flat=True),
+                       *Article.objects.values_list('pdf_file', flat=True)])
+
+    def test_second_run_creates_nothing(self):
+        result = self.run_import()
+        self.assertEqual((result['issues'], result['articles'], result['errors']), (5, 10, []))
+        issue = JournalIssue.objects.get(number='3')
+        self.assertEqual(issue.full_pdf_sha256, hashlib.sha256(PDF_BODY + b'3').hexdigest())
+
+        result = self.run_import()
+        self.assertEqual((result['issues'], result['articles'], result['skipped']), (0, 0, 5))
+        self.assertEqual((JournalIssue.objects.count(), Article.objects.count()), (5, 10))
+        self.assertEqual(self.stored_files(), self.referenced_files())
+
+    def test_resume_after_failure(self):
+        build_article = bulk_import._build_article
+        calls = []
+
+        def failing(*args):
+            # Пятая статья - во второй пачке, после копирования PDF ее выпуска
+            calls.append(args)
+            if len(calls) == 5:
+                raise OSError("диск отвалился")
+            return build_article(*args)
+
+        with mock.patch.object(bulk_import, '_build_article', failing), self.assertRaises(OSError):
+            self.run_import()
+        # Первая пачка осталась в БД, вторая откатилась целиком
+        self.assertEqual((JournalIssue.objects.count(), Article.objects.count()), (2, 4))
+
+        result = self.run_import()
+        self.assertEqual((result['issues'], result['articles'], result['skipped']), (3, 6, 2))
+        self.assertEqual((JournalIssue.objects.count(), Article.objects.count()), (5, 10))
+        # Файлы, скопированные до сбоя, переиспользованы, а не сохранены второй копией
+        self.assertEqual(self.stored_files(), self.referenced_files())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, JOURNAL_PAGE_CACHE={'ENABLED': False})
+class ImageDerivativesTests(TestCase):
+    """WebP/AVIF-варианты и LQIP: создаются при загрузке, удаляются при замене и удалении картинки"""
+
+    def photo(self, color, size=(800, 600)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'PNG')
+        return ContentFile(buffer.getvalue(), name='photo.png')
+
+    def files(self, derivatives):
+        return [Path(MEDIA_ROOT) / variant['name'] for variant in derivatives['variants']]
+
+    def test_generated_on_upload(self):
+        member = EditorialBoard.objects.create(name='Иванов И. И.', photo=self.photo((200, 40, 40)))
+        derivatives = member.photo_derivatives
+        self.assertEqual(derivatives['source'], member.photo.name)
+        self.assertEqual((derivatives['width'], derivatives['height']), (800, 600))
+        self.assertTrue(derivatives['lqip'].startswith('data:image/webp;base64,'))
+        # Каждый доступный формат во всех ширинах меньше исходной
+        self.assertCountEqual(
+            [(variant['format'], variant['width'], variant['height']) for variant in derivatives['variants']],
+            [(fmt, width, width * 3 // 4) for fmt in images.available_formats() for width in images.DERIVATIVE_WIDTHS],
+        )
+        for path in self.files(derivatives):
+            with Image.open(path) as image:
+                self.assertEqual(image.format.lower(), path.suffix[1:])
+
+        # Маленькая картинка не увеличивается
+        small = EditorialBoard.objects.create(name='Петров П. П.', photo=self.photo((0, 0, 0), (200, 100)))
+        self.assertEqual(sorted({v['width'] for v in small.photo_derivatives['variants']}), [160, 200])
+
+    def test_removed_on_replace_and_delete(self):
+        issue = JournalIssue.objects.create(year=2024, volume='68', number='5', cover=self.photo((20, 90, 160)))
+        old = self.files(issue.cover_derivatives)
+        self.assertTrue(all(path.exists() for path in old))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            issue.cover = self.photo((160, 90, 20))
+            issue.save()
+        new = self.files(issue.cover_derivatives)
+        self.assertTrue(all(path.exists() for path in new))
+        self.assertFalse(any(path.exists() for path in old))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            issue.delete()
+        self.assertFalse(any(path.exists() for path in new))
+
+
+@override_settings(JOURNAL_PAGE_CACHE={'ENABLED': False})
+class ArchiveRangeTests(TestCase):
+    """Периоды архива: недопустимые адреса отсекаются до запроса выпусков, выпуск обновляет только свои периоды"""
+
+    @classmethod
+    def setUpTestData(cls):
+        ArchiveYear.objects.all().delete()
+        ArchiveYear.objects.create(start_year=2000, end_year=2009, slug='2000-2009')
+        ArchiveYear.objects.create(start_year=2010, end_year=2019, slug='2010-2019')
+        ArchiveYear.objects.create(start_year=1950, end_year=2000, slug='1950-2000')
+        cls.old = JournalIssue.objects.create(year=2005, volume='49', number='1')
+        cls.new = JournalIssue.objects.create(year=2015, volume='59', number='1')
+
+    def setUp(self):
+        cache.clear()
+
+    def issue_queries(self, func, *args):
+        with CaptureQueriesContext(connection) as queries:
+            result = func(*args)
+        return result, [query['sql'] for query in queries if 'journal_journalissue' in query['sql']]
+
+    def test_unknown_range_rejected_before_issue_query(self):
+        for slug in ('1900-1910', '2009-2000', '2000-09', 'все'):
+            with self.subTest(slug=slug):
+                self.assertEqual(self.issue_queries(archive.get_range, slug), (None, []))
+        self.assertEqual(self.client.get(reverse('archive_range', args=['1900-1910'])).status_code, 404)
+        data, queries = self.issue_queries(archive.get_range, '2000-2009')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([year for year, _ in data['issues_by_year']], [2005])
+
+    def test_wide_range_rejected(self):
+        self.assertEqual(archive.parse_range('1950-1999'), (1950, 1999))
+        self.assertIsNone(archive.parse_range('1950-2000'))
+        # Даже заведенный в админке период шире MAX_ARCHIVE_SPAN лет не открывается
+        self.assertEqual(self.issue_queries(archive.get_range, '1950-2000'), (None, []))
+        self.assertEqual(self.client.get(reverse('archive_range', args=['1950-2000'])).status_code, 404)
+
+    def test_issue_updates_only_its_periods(self):
+        for slug in ('2000-2009', '2010-2019'):
+            archive.get_range(slug)
+        key = {slug: archive.RANGE_KEY.format(slug=slug, start=slug[:4], end=slug[5:])
+               for slug in ('2000-2009', '2010-2019')}
+
+        def updated(issue):
+            with mock.patch.object(archive, 'cache', mock.Mock(wraps=cache)) as spy:
+                with self.captureOnCommitCallbacks(execute=True):
+                    issue.save()
+            return {call.args[0] for call in spy.set.call_args_list}
+
+        self.new.number = '2'
+        self.assertEqual(updated(self.new), {key['2010-2019']})
+        self.assertEqual(archive.get_range('2010-2019')['issues_by_year'][0][1][0].number, '2')
+
+        # Выпуск перенесен в другой период - обновляются оба
+        self.new.year = 2006
+        self.assertEqual(updated(self.new), {key['2000-2009'], key['2010-2019']})
+        self.assertEqual(archive.get_range('2010-2019')['issues_by_year'], [])
+        self.assertEqual([issue.pk for _, group in archive.get_range('2000-2009')['issues_by_year'] for issue in group],
+                         [self.new.pk, self.old.pk])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, JOURNAL_PAGE_CACHE={'ENABLED': False})
+class SyntheticCatalogueTests(TestCase):
+    """Синтетический каталог: одинаковый seed - одинаковые записи, с файлами и без"""
+
+    def catalogue(self, seed=7, files=False):
+        synthetic.clear_catalogue()
+        synthetic.generate_catalogue(articles=60, start_year=2020, end_year=2022, issues_per_year=2, seed=seed,
+                                     files=files, pdf_kb=1, index=False)
+        return list(Article.objects.order_by('issue__year', 'issue__number_sort', 'page_start').values_list(
+            'issue__year', 'issue__number', 'title', 'authors', 'rubric', 'abstract', 'page_start', 'page_end',
+            'is_published',
+        ))
+
+    def test_same_seed_same_catalogue(self):
+        first = self.catalogue()
+        self.assertEqual(len(first), 60)
+        self.assertEqual(self.catalogue(), first)
+        self.assertEqual(self.catalogue(files=True), first)
+        self.assertTrue(Article.objects.exclude(pdf_sha256='').exists())
+        self.assertNotEqual(self.catalogue(seed=8), first)
+
+
+@override_settings(
+    JOURNAL_PAGE_CACHE={'ENABLED': False},
+    JOURNAL_SITEMAPS={'ROOT': f'{MEDIA_ROOT}/sitemap-shards', 'SHARD_SIZE': 10, 'BASE_URL': 'https://example.org'},
+)
+class SitemapShardTests(TestCase):
+    """Карта сайта: перезаписываются только части с изменившимися объектами"""
+
+    @classmethod
+    def setUpTestData(cls):
+        issue = JournalIssue.objects.create(year=2024, volume='68', number='6')
+        cls.articles = [Article.objects.create(issue=issue, title=f'Статья {i}', authors='Иванов И. И.')
+                        for i in range(25)]
+
+    def setUp(self):
+        self.root = sitemaps.sitemaps_root()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def shard(self, article):
+        return f'articles-{article.pk // 10}'
+
+    def test_only_stale_shards_rewritten(self):
+        first = sitemaps.update_sitemaps()
+        shards = sorted({self.shard(article) for article in self.articles})
+        self.assertEqual(sorted(part for part in first['written'] if part.startswith('articles-')), shards)
+        self.assertEqual(sitemaps.update_sitemaps(), {'written': [], 'removed': [], 'unchanged': len(first['written'])})
+        mtimes = {path.name: path.stat().st_mtime_ns for path in self.root.glob('sitemap-*.xml')}
+
+        # Изменилась одна статья - ее шард, а также выпуск и общие страницы, где она дает lastmod
+        changed = self.articles[12]
+        changed.title = 'Новое название'
+        changed.save()
+        result = sitemaps.update_sitemaps()
+        stale = {self.shard(changed), f'issues-{changed.issue_id // 10}', 'pages'}
+        self.assertEqual(set(result['written']), stale)
+        for name, mtime in mtimes.items():
+            if name[len('sitemap-'):-len('.xml')] not in stale:
+                self.assertEqual((self.root / name).stat().st_mtime_ns, mtime, name)
+        url = f'https://example.org{changed.get_absolute_url()}'
+        self.assertIn(url, (self.root / f'sitemap-{self.shard(changed)}.xml').read_text())
+
+        # Шард без опубликованных статей удаляется вместе с .gz-копией
+        last = self.shard(self.articles[-1])
+        Article.objects.filter(pk__gte=self.articles[-1].pk // 10 * 10).update(is_published=False)
+        result = sitemaps.update_sitemaps()
+        self.assertEqual(result['removed'], [last])
+        self.assertFalse((self.root / f'sitemap-{last}.xml').exists())
+        self.assertFalse((self.root / f'sitemap-{last}.xml.gz').exists())
+        self.assertNotIn(last, (self.root / 'sitemap.xml').read_text())
+
+
+class LoadTestCompareTests(SimpleTestCase):
+    """Сравнение прогонов нагрузочного теста: регрессии p95 и ошибок, шум не считается"""
+
+    def endpoint(self, p95, error_rate=0.0, rps=100.0):
+        return {'rps': rps, 'p50_ms': p95 / 2, 'p95_ms': p95, 'p99_ms': p95 * 2, 'error_rate': error_rate}
+
+    def test_compare(self):
+        baseline = {'endpoints': {
+            'slower': self.endpoint(20), 'noise': self.endpoint(2), 'within': self.endpoint(20),
+            'errors': self.endpoint(20), 'throughput': self.endpoint(20, rps=100), 'removed': self.endpoint(20),
+        }}
+        current = {'endpoints': {
+            'slower': self.endpoint(30),                 # +50% и +10 мс
+            'noise': self.endpoint(3.5),                 # +75%, но всего 1.5 мс
+            'within': self.endpoint(23),                 # +15% при пороге 20%
+            'errors': self.endpoint(20, error_rate=0.01),
+            'throughput': self.endpoint(20, rps=50),     # rps сам по себе регрессией не считается
+            'added': self.endpoint(500),
+        }}
+        rows = loadtest.compare(baseline, current, threshold=0.2)
+        regressions = {(name, metric) for name, metric, _, _, regression in rows if regression}
+        self.assertEqual(regressions, {('slower', 'p95_ms'), ('errors', 'error_rate')})
+        # Маршруты, которых нет в одном из прогонов, не сравниваются
+        self.assertEqual({name for name, *_ in rows}, {'slower', 'noise', 'within', 'errors', 'throughput'})
+        self.assertIn(('slower', 'p95_ms', 20, 30, True), rows)
+        # С порогом 10% рост на 15% - уже регрессия
+        rows = loadtest.compare(baseline, current, threshold=0.1)
+        self.assertIn(('within', 'p95_ms', 20, 23, True), rows)
+
+    def test_summarize(self):
+        samples = [('issues', 200, latency / 1000, 100) for latency in range(1, 101)] + [('issues', 500, 0.5, 0)]
+        total, endpoints = loadtest.summarize(samples, elapsed=10)
+        self.assertEqual((total['requests'], total['errors'], total['rps']), (101, 1, 10.1))
+        self.assertEqual((endpoints['issues']['p50_ms'], endpoints['issues']['p95_ms']), (51.0, 96.0))
+
+
+@override_settings(JOURNAL_PAGE_CACHE={'ENABLED': True, 'WAIT_TIMEOUT': 5})
+class PageCacheTests(SimpleTestCase):
+    """Полностраничный кэш: HIT/MISS, объединение промахов и отдача устаревшей страницы"""
+
+    def setUp(self):
+        page_cache.get_cache().clear()
+        self.factory = RequestFactory()
+        self.renders = 0
+        self.lock = threading.Lock()
+
+    def view(self, delay=0):
+        def view(request):
+            time.sleep(delay)
+            with self.lock:
+                self.renders += 1
+                return HttpResponse(f'render {self.renders}')
+        return view
+
+    def test_hit_and_bypass(self):
+        view = page_cache.cached_page(timeout=60)(self.view())
+        first, second = view(self.factory.get('/page/')), view(self.factory.get('/page/'))
+        self.assertEqual((first['X-Page-Cache'], second['X-Page-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(second.content, b'render 1')
+        # Другие параметры - другая страница; с сессией и POST кэш не используется
+        self.assertEqual(view(self.factory.get('/page/', {'q': 1}))['X-Page-Cache'], 'MISS')
+        request = self.factory.get('/page/')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = 'session'
+        self.assertNotIn('X-Page-Cache', view(request))
+        self.assertNotIn('X-Page-Cache', view(self.factory.post('/page/')))
+        page_cache.invalidate_all()
+        self.assertEqual(view(self.factory.get('/page/'))['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.renders, 5)
+
+    def test_csrf_pages_not_cached(self):
+        """Токен в форме принадлежит посетителю - такая страница не кэшируется, даже с готовым cookie"""
+        def view(request):
+            return HttpResponse(f'<input value="{get_token(request)}">')
+
+        view = page_cache.cached_page(timeout=60)(view)
+        middleware = CsrfViewMiddleware(lambda request: None)
+        tokens = []
+        for secret in ('a' * CSRF_SECRET_LENGTH, 'b' * CSRF_SECRET_LENGTH):
+            request = self.factory.get('/form/')
+            request.COOKIES[settings.CSRF_COOKIE_NAME] = secret
+            middleware.process_request(request)
+            response = view(request)
+            self.assertEqual(response['X-Page-Cache'], 'MISS')
+            tokens.append(response.content)
+        self.assertNotEqual(tokens[0], tokens[1])
+
+    def test_concurrent_misses_render_once(self):
+        view = page_cache.cached_page(timeout=60)(self.view(delay=0.3))
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            responses = list(pool.map(lambda _: view(self.factory.get('/slow/')), range(6)))
+        self.assertEqual(self.renders, 1)
+        self.assertEqual(sorted(r['X-Page-Cache'] for r in responses), ['HIT'] * 5 + ['MISS'])
+        self.assertTrue(all(r.content == b'render 1' for r in responses))
+
+    def test_stale_while_revalidate(self):
+        view = page_cache.cached_page(timeout=0, stale_timeout=60)(self.view())
+        self.assertEqual(view(self.factory.get('/stale/'))['X-Page-Cache'], 'MISS')
+        # Страница протухла: сразу отдается старая, а новая рендерится в фоне
+        response = view(self.factory.get('/stale/'))
+        self.assertEqual((response['X-Page-Cache'], response.content), ('STALE', b'render 1'))
+        cache = page_cache.get_cache()
+        key = page_cache.page_key(self.factory.get('/stale/'), cache.get(page_cache.GENERATION_KEY, 0))
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and cache.get(key + ':lock') is not None:
+            time.sleep(0.02)
+        self.assertEqual(self.renders, 2)
+        self.assertEqual(cache.get(key)['content'], b'render 2')
+
+
+@override_settings(JOURNAL_PAGE_CACHE={'ENABLED': False})
+class CursorPaginationTests(TestCase):
+    """Листание списков по курсору: все строки ровно по разу, назад, ошибки и старые ?page=N"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Номера 1..12 в каждом году: номер 10 должен идти после 9, а не после 1
+        for year in (2022, 2023):
+            for number in range(1, 13):
+                JournalIssue.objects.create(year=year, volume=str(year - 1956), number=str(number))
+
+    def walk(self, url):
+        """Страницы списка от первой по ссылкам "вперед": [(pk строк, ответ)]"""
+        pages, cursor = [], None
+        while True:
+            response = self.client.get(url, {'cursor': cursor} if cursor else {})
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page_obj']
+            pages.append(([obj.pk for obj in page], page))
+            if not page.has_next():
+                return pages
+            cursor = page.next_cursor
+
+    def test_forward_and_back(self):
+        pages = self.walk(reverse('issues'))
+        expected = list(JournalIssue.objects.values_list('pk', flat=True))
+        self.assertEqual([len(pks) for pks, _ in pages], [10, 10, 4])
+        self.assertEqual([pk for pks, _ in pages for pk in pks], expected)
+        self.assertFalse(pages[0][1].has_previous())
+
+        # С последней страницы назад - та же вторая страница
+        response = self.client.get(reverse('issues'), {'cursor': pages[2][1].previous_cursor})
+        page = response.context['page_obj']
+        self.assertEqual([obj.pk for obj in page], pages[1][0])
+        self.assertTrue(page.has_next() and page.has_previous())
+        response = self.client.get(reverse('issues'), {'cursor': page.previous_cursor})
+        self.assertEqual([obj.pk for obj in response.context['page_obj']], pages[0][0])
+
+    def test_invalid_cursor(self):
+        valid = encode_cursor(FORWARD, [2023, 5, '5', 1])
+        self.assertEqual(self.client.get(reverse('issues'), {'cursor': valid}).status_code, 200)
+        for cursor in ('not-base64!', encode_cursor('x', [2023]), encode_cursor(FORWARD, [2023]),
+                       encode_cursor(FORWARD, ['год', 5, '5', 1])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(reverse('issues'), {'cursor': cursor}).status_code, 404)
+
+    def test_legacy_page_links(self):
+        """Старые ?page=N ведут на ту же страницу, а не на первую"""
+        pages = self.walk(reverse('issues'))
+        response = self.client.get(reverse('issues'), {'page': 1, 'year': 2023})
+        self.assertEqual((response.status_code, response['Location']), (301, reverse('issues') + '?year=2023'))
+        for number in (2, 3):
+            with self.subTest(page=number):
+                response = self.client.get(reverse('issues'), {'page': number})
+                self.assertEqual(response.status_code, 302)
+                page = self.client.get(response['Location']).context['page_obj']
+                self.assertEqual([obj.pk for obj in page], pages[number - 1][0])
+        for number in ('4', '0', 'last'):
+            with self.subTest(page=number):
+                self.assertEqual(self.client.get(reverse('issues'), {'page': number}).status_code, 404)
+
+
+@override_settings(STATIC_ROOT=f'{MEDIA_ROOT}/static', JOURNAL_METRICS={'ENABLED': False})
+class PrecompressedStaticTests(SimpleTestCase):
+    """Статика из STATIC_ROOT: сжатая копия по Accept-Encoding и 304 при повторной проверке"""
+
+    def setUp(self):
+        root = Path(settings.STATIC_ROOT) / 'css'
+        root.mkdir(parents=True, exist_ok=True)
+        (root / 'site.css').write_text('body { color: black; }' * 50)
+        (root / 'site.css.gz').write_bytes(gzip.compress((root / 'site.css').read_bytes()))
+        self.addCleanup(shutil.rmtree, settings.STATIC_ROOT, ignore_errors=True)
+
+    def test_conditional_get(self):
+        url = settings.STATIC_URL + 'css/site.css'
+        plain = self.client.get(url)
+        compressed = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertNotEqual(plain['ETag'], compressed['ETag'])
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], compressed['ETag'])
+        self.assertIn('max-age=3600', response['Cache-Control'])
+        # Тег другого варианта не подходит - отдается файл
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=plain['Last-Modified']).status_code, 304)
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    """Профиль SQLite (gia_journal/database.py) на файле: запись не блокирует чтение"""
+
+    # Соединения - свои, к временному файлу (см. setUp), но псевдонимы те же, что в settings
+    databases = {WRITE_ALIAS, READ_ALIAS}
+    READERS = 8
+    READS_PER_READER = 20
+    BUSY_TIMEOUT_MS = 300
+
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix='gia-sqlite-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.connections = ConnectionHandler(sqlite_databases(
+            Path(directory) / 'db.sqlite3', conn_max_age=0, pragmas={'busy_timeout': self.BUSY_TIMEOUT_MS},
+        ))
+        self.addCleanup(self.connections.close_all)
+        with self.connections[WRITE_ALIAS].cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)')
+            cursor.execute("INSERT INTO item (name) VALUES ('committed')")
+
+    def _read(self, _):
+        """Чтение в своем потоке (у каждого потока свое соединение replica): (строк, секунд)"""
+        reader = self.connections[READ_ALIAS]
+        try:
+            started = time.monotonic()
+            with reader.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM item')
+                return cursor.fetchone()[0], time.monotonic() - started
+        finally:
+            reader.close()
+
+    def _write_in_thread(self):
+        writer = self.connections[WRITE_ALIAS]
+        try:
+            with writer.cursor() as cursor:
+                cursor.execute('BEGIN IMMEDIATE')
+        finally:
+            writer.close()
+
+    def test_pragmas(self):
+        with self.connections[WRITE_ALIAS].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        with self.connections[READ_ALIAS].cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], self.BUSY_TIMEOUT_MS)
+            with self.assertRaises(OperationalError):
+                cursor.execute("INSERT INTO item (name) VALUES ('reader')")
+
+    def test_readers_not_blocked_during_write(self):
+        writer = self.connections[WRITE_ALIAS]
+        with writer.cursor() as cursor:
+            # Незавершенная транзакция записи с эксклюзивной блокировкой - как долгая загрузка
+            # в админке, когда изменения уже не помещаются в кэш (без WAL чтение ждало бы ее конца)
+            cursor.execute('BEGIN EXCLUSIVE')
+            cursor.execute("INSERT INTO item (name) VALUES ('uncommitted')")
+
+            with ThreadPoolExecutor(self.READERS) as pool:
+                reads = list(pool.map(self._read, range(self.READERS * self.READS_PER_READER)))
+            # Все читатели видят зафиксированное состояние и не ждут блокировку
+            self.assertEqual({count for count, _ in reads}, {1})
+            self.assertLess(max(seconds for _, seconds in reads), self.BUSY_TIMEOUT_MS / 1000)
+
+            # Второй писатель ждет busy_timeout и получает отказ - запись в базу одна за раз
+            with ThreadPoolExecutor(1) as pool, self.assertRaisesMessage(OperationalError, 'locked'):
+                pool.submit(self._write_in_thread).result()
+
+            cursor.execute('COMMIT')
+        self.assertEqual(self._read(None)[0], 2)
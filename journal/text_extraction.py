@@ -0,0 +1,199 @@
+"""
+Извлечение текста из PDF статей для полнотекстового поиска.
+
+Весь архив обрабатывает команда `python manage.py extract_pdf_text`: PDF
+разбираются в пуле процессов (pypdf, необязательная зависимость:
+pip install pypdf). После загрузки PDF статьи или выпуска в админке текст
+извлекается в фоновом потоке процесса (schedule, JOURNAL_TEXT_EXTRACTION).
+Результат сохраняется сжатым в ArticleText и сразу попадает в индекс поиска.
+
+Источник текста статьи - ее собственный pdf_file, а если его нет -
+полный PDF выпуска, из которого берутся страницы page_start..page_end.
+Файлы, чей хэш не изменился с прошлого извлечения, пропускаются.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connections
+
+from . import search
+from .models import Article, ArticleText
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # pragma: no cover
+    PdfReader = None
+
+logger = logging.getLogger(__name__)
+
+# pypdf шумит предупреждениями о шрифтах на каждой странице - в воркерах они не нужны
+logging.getLogger('pypdf').setLevel(logging.ERROR)
+
+
+def _pages_text(reader, indexes):
+    parts = []
+    for index in indexes:
+        try:
+            parts.append(reader.pages[index].extract_text() or '')
+        except Exception:
+            # Битая страница не должна ронять весь документ
+            parts.append('')
+    return '\n'.join(parts)
+
+
+def extract_article_text(path):
+    """Текст всего PDF (выполняется в процессе-воркере)"""
+    reader = PdfReader(path)
+    return _pages_text(reader, range(len(reader.pages)))
+
+
+def extract_issue_texts(path, page_ranges):
+    """
+    Тексты статей из полного PDF выпуска (выполняется в процессе-воркере).
+    page_ranges: {id статьи: (первый индекс страницы, последний индекс)}.
+    """
+    reader = PdfReader(path)
+    total = len(reader.pages)
+    texts = {}
+    for article_id, (first, last) in page_ranges.items():
+        first, last = max(first, 0), min(last, total - 1)
+        texts[article_id] = _pages_text(reader, range(first, last + 1)) if first <= last else ''
+    return texts
+
+
+def _local_path(field_file):
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def collect_jobs(articles, force=False):
+    """
+    Готовит задания для пула: [(функция, аргументы, {id статьи: source_hash})].
+    Статьи, текст которых уже извлечен из того же файла, пропускаются.
+    """
+    # Подзапрос, а не список id: у архива на 100 тыс. статей список не влезет в лимит параметров SQLite
+    known = dict(
+        ArticleText.objects.filter(article__in=articles.values('pk')).values_list('article_id', 'source_hash')
+    )
+    articles = articles.select_related('issue')
+
+    def is_fresh(article_id, source_hash):
+        return not force and known.get(article_id) == source_hash
+
+    jobs = []
+    issue_ranges = {}
+    for article in articles:
+        if article.pdf_file:
+            path = _local_path(article.pdf_file)
+            source_hash = article.pdf_sha256
+            if path and source_hash and not is_fresh(article.pk, source_hash):
+                jobs.append((extract_article_text, (path,), {article.pk: source_hash}))
+            continue
+
+        issue = article.issue
+        if not issue.full_pdf or not issue.full_pdf_sha256 or article.page_end < article.page_start:
+            continue
+        source_hash = f'{issue.full_pdf_sha256}:{article.page_start}-{article.page_end}'
+        if is_fresh(article.pk, source_hash):
+            continue
+        offset = issue.full_pdf_first_page
+        _, ranges, hashes = issue_ranges.setdefault(issue.pk, (issue, {}, {}))
+        ranges[article.pk] = (article.page_start - offset, article.page_end - offset)
+        hashes[article.pk] = source_hash
+
+    for issue, ranges, hashes in issue_ranges.values():
+        path = _local_path(issue.full_pdf)
+        if path:
+            jobs.append((extract_issue_texts, (path, ranges), hashes))
+    return jobs
+
+
+def save_text(article_id, source_hash, text):
+    """Сохраняет текст статьи и переиндексирует ее"""
+    record, _ = ArticleText.objects.get_or_create(article_id=article_id, defaults={'source_hash': source_hash})
+    record.source_hash = source_hash
+    record.text = text
+    record.save()
+    article = Article.objects.filter(pk=article_id).first()
+    if article:
+        search.index_article(article, text=text)
+
+
+def run_extraction(articles=None, workers=None, force=False, on_error=None):
+    """
+    Извлекает тексты для статей (по умолчанию - для всех) в пуле процессов;
+    workers=0 - в текущем процессе, по одному файлу. Возвращает число обновленных статей.
+    """
+    if PdfReader is None:
+        raise RuntimeError("Для извлечения текста установите pypdf: pip install pypdf")
+
+    if articles is None:
+        articles = Article.objects.all()
+    jobs = collect_jobs(articles, force=force)
+    if not jobs:
+        return 0
+
+    updated = 0
+    pool = ThreadPoolExecutor(max_workers=1) if workers == 0 else ProcessPoolExecutor(max_workers=workers)
+    with pool:
+        futures = {pool.submit(func, *args): hashes for func, args, hashes in jobs}
+        for future in as_completed(futures):
+            hashes = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:
+                if on_error:
+                    on_error(sorted(hashes), exc)
+                continue
+            if isinstance(result, str):
+                result = {next(iter(hashes)): result}
+            for article_id, text in result.items():
+                save_text(article_id, hashes[article_id], text)
+                updated += 1
+    return updated
+
+
+# --- Фоновое извлечение после загрузки ---
+
+_pending = set()
+_pending_lock = threading.Lock()
+_worker = None
+
+
+def _extract_pending():
+    global _worker
+    while True:
+        with _pending_lock:
+            if not _pending:
+                _worker = None
+                return
+            article_ids = sorted(_pending)
+            _pending.clear()
+        try:
+            run_extraction(Article.objects.filter(pk__in=article_ids), workers=0)
+        except Exception:
+            logger.exception("Не удалось извлечь текст статей %s", article_ids)
+        finally:
+            connections.close_all()
+
+
+def schedule(article_ids):
+    """
+    Ставит статьи в очередь фонового извлечения текста - один поток на процесс,
+    PDF разбираются по очереди. Неизмененные файлы пропускаются, так что
+    сохранение статьи без новой загрузки стоит одного запроса к БД.
+    """
+    global _worker
+    if PdfReader is None or not getattr(settings, 'JOURNAL_TEXT_EXTRACTION', {}).get('ON_UPLOAD', True):
+        return
+    with _pending_lock:
+        _pending.update(article_ids)
+        if _worker is None:
+            _worker = threading.Thread(target=_extract_pending, name='extract-pdf-text', daemon=True)
+            _worker.start()
@@ -0,0 +1,66 @@
+"""
+Ограничение частоты запросов с одного IP (token bucket) в кэше.
+
+У каждого адреса "ведро" на BURST запросов, которое пополняется со скоростью
+RATE запросов за PERIOD секунд: короткая серия проходит, поток - нет.
+Состояние хранится в кэше (см. CACHES), поэтому при нескольких воркерах
+нужен общий кэш. Чтение и запись ведра не атомарны - при одновременных
+запросах лимит приблизительный, для защиты формы от спама этого достаточно.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _config(scope):
+    return getattr(settings, 'JOURNAL_THROTTLE', {}).get(scope)
+
+
+def client_ip(request):
+    """
+    Адрес клиента. За PROXY_COUNT обратными прокси берется адрес,
+    который добавил в X-Forwarded-For ближайший к клиенту доверенный прокси.
+    """
+    proxies = getattr(settings, 'JOURNAL_THROTTLE', {}).get('PROXY_COUNT', 0)
+    forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def take_token(key, rate, period, burst):
+    """Списывает запрос из ведра; возвращает 0 или сколько секунд ждать следующего"""
+    now = time.time()
+    tokens, updated = cache.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated) * rate / period)
+    if tokens < 1:
+        return math.ceil((1 - tokens) * period / rate)
+    # Полное ведро восстанавливается за burst * period / rate секунд - дольше хранить незачем
+    cache.set(key, (tokens - 1, now), math.ceil(burst * period / rate))
+    return 0
+
+
+def throttle(scope, response, methods=('POST',)):
+    """
+    Декоратор: запросы methods сверх лимита JOURNAL_THROTTLE[scope]
+    получают response(request, retry_after) с заголовком Retry-After.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            config = _config(scope)
+            if config and request.method in methods:
+                retry_after = take_token(
+                    f'throttle:{scope}:{client_ip(request)}',
+                    config['RATE'], config.get('PERIOD', 60), config.get('BURST', config['RATE']),
+                )
+                if retry_after:
+                    limited = response(request, retry_after)
+                    limited['Retry-After'] = str(retry_after)
+                    return limited
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,109 @@
+"""
+Замеры времени внутри запроса для ServerTimingMiddleware (см. middleware.py).
+
+Замер запроса - объект RequestTiming в contextvar: его видят и потоки
+sync_to_async, в которых async view выполняют SQL. Пока замера нет
+(запрос не попал в выборку), обертки ниже сводятся к одной проверке.
+
+- SQL: обертка execute_wrappers ставится на каждое новое соединение
+  (сигнал connection_created) и считает время и число запросов;
+- шаблоны: бэкенд TimedDjangoTemplates (TEMPLATES в settings.py) замеряет
+  render() шаблона страницы целиком - вместе с base.html, include и
+  ленивыми запросами к БД внутри шаблона.
+"""
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+_current = ContextVar('journal_request_timing', default=None)
+
+
+class RequestTiming:
+    """Накопленные за запрос времена, секунды"""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.total = None
+        self.db = 0.0
+        self.queries = 0
+        self.template = 0.0
+        self.templates = []
+        self._template_depth = 0
+
+    def finish(self):
+        self.total = perf_counter() - self.started
+
+
+def start():
+    """Начинает замер текущего запроса; возвращает (замер, токен для stop)"""
+    timing = RequestTiming()
+    return timing, _current.set(timing)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+# --- SQL ---
+
+def _timed_execute(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.db += perf_counter() - started
+        timing.queries += 1
+
+
+def install(connection, **kwargs):
+    # В начало списка: connection.execute_wrapper() снимает свою обертку через pop()
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _timed_execute)
+
+
+def install_on_open_connections():
+    """Соединения, открытые до загрузки middleware (в текущем потоке)"""
+    for connection in connections.all(initialized_only=True):
+        install(connection)
+
+
+connection_created.connect(install, dispatch_uid='journal.timing.install')
+
+
+# --- Шаблоны ---
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timing = _current.get()
+        if timing is None:
+            return super().render(context, request)
+        # render_to_string внутри шаблона уже входит во время внешнего шаблона
+        timing._template_depth += 1
+        started = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timing._template_depth -= 1
+            if not timing._template_depth:
+                timing.template += perf_counter() - started
+                timing.templates.append(self.origin.template_name)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, шаблоны которого замеряют время render()"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
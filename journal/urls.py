@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, metrics, oai, sitemaps, views
 
 urlpatterns = [
     path('', views.home_view, name='home'),
@@ -7,6 +7,9 @@ urlpatterns = [
 
     path('issues/', views.IssueListView.as_view(), name='issues'),
     path('issues/<int:pk>/', views.IssueDetailView.as_view(), name='issue_detail'),
+    path('issues/<int:issue_id>/download/', views.download_issue_pdf, name='download_issue_pdf'),
+    path('issues/<int:issue_id>/read/', views.read_issue_pdf, name='read_issue_pdf'),
+    path('issues/<int:issue_id>/cover/', views.issue_cover, name='issue_cover'),
 
     path('articles/', views.ArticleListView.as_view(), name='articles'),
     path('articles/<int:pk>/', views.ArticleDetailView.as_view(), name='article_detail'),
@@ -15,6 +18,31 @@ urlpatterns = [
     path('articles/<int:article_id>/download/', views.download_article_pdf, name='download_article_pdf'),
     path('articles/<int:article_id>/read/', views.read_article_pdf, name='read_article_pdf'),
 
+    path('search/', views.search_view, name='search'),
+    path('api/search/', views.search_api, name='search_api'),
+
+    # === JSON API (только чтение), см. api.py ===
+    path('api/v1/issues/', api.resource_list, {'resource': 'issues'}, name='api_issues'),
+    path('api/v1/issues/<int:lookup>/', api.resource_detail, {'resource': 'issues'}, name='api_issue'),
+    path('api/v1/articles/', api.resource_list, {'resource': 'articles'}, name='api_articles'),
+    path('api/v1/articles/<int:lookup>/', api.resource_detail, {'resource': 'articles'}, name='api_article'),
+    path('api/v1/editorial-board/', api.resource_list, {'resource': 'editorial-board'}, name='api_editorial_board'),
+    path('api/v1/editorial-board/<int:lookup>/', api.resource_detail, {'resource': 'editorial-board'},
+         name='api_editorial_member'),
+    path('api/v1/archive-periods/', api.resource_list, {'resource': 'archive-periods'}, name='api_archive_periods'),
+    path('api/v1/archive-periods/<slug:lookup>/', api.resource_detail, {'resource': 'archive-periods'},
+         name='api_archive_period'),
+
+    # === OAI-PMH для сборщиков метаданных, см. oai.py ===
+    path('oai/', oai.oai_pmh, name='oai'),
+
+    # === Карта сайта (файлы обновляются по изменениям), см. sitemaps.py ===
+    path('sitemap.xml', sitemaps.sitemap_view, name='sitemap'),
+    path('sitemap-<slug:part>.xml', sitemaps.sitemap_view, name='sitemap_part'),
+
+    # === Метрики для Prometheus (только с ALLOWED_IPS), см. metrics.py ===
+    path('metrics', metrics.metrics_view, name='metrics'),
+
     path('archive/', views.archive, name='archive'),
     # URL для конкретного промежутка лет, например: /archive/1957-1959/
     path('archive/<str:year_range>/', views.archive_range_view, name='archive_range'),
@@ -1,17 +1,32 @@
-from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, FileResponse, Http404 
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render
+from django.http import JsonResponse, Http404 
 from django.contrib import messages
 from django.views.generic import ListView, DetailView
-from .models import JournalIssue, Article, JournalInfo, ArchiveYear
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from . import contact_queue
+from .models import JournalIssue, Article, JournalInfo, ArchiveYear, EditorialBoard
 from .forms import ContactForm
-from itertools import groupby
+from .archive import get_range as get_archive_range
+from .files import aserve_file
+from .page_cache import cached_page
+from .pagination import CursorPaginationMixin
+from .search import search_articles
+from .throttling import throttle
 
+SEARCH_PAGE_SIZE = 20
 
+# Год - для адресов, в которых версия файла зашита в URL
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+@cached_page()
 def home_view(request):
     return render(request, 'journal/index.html')
 
 def home(request):
-    """Главная страница"""
+    """Главная страница (с формой партнерства - не кэшируется, см. page_cache.py)"""
     journal_info = JournalInfo.objects.first()
     current_issue = JournalIssue.objects.filter(is_current=True).first()
     recent_articles = Article.objects.filter(is_published=True)[:5]
@@ -24,12 +39,22 @@ def home(request):
     return render(request, 'journal/home.html', context)
 
 
+def _contact_error(message, status):
+    return JsonResponse({'success': False, 'errors': {'__all__': [message]}}, status=status)
+
+
+@throttle('contact', lambda request, retry_after: _contact_error(
+    'Слишком много сообщений. Попробуйте позже.', status=429))
 def contact(request):
     """Страница контактов и форма обратной связи"""
     if request.method == 'POST':
         form = ContactForm(request.POST)
         if form.is_valid():
-            form.save()
+            # В БД сообщение попадет пачкой вместе с другими (см. contact_queue.py)
+            try:
+                contact_queue.enqueue(form.cleaned_data)
+            except contact_queue.QueueFull:
+                return _contact_error('Сервис временно перегружен. Попробуйте позже.', status=503)
             messages.success(request, 'Ваше сообщение успешно отправлено!')
             return JsonResponse({'success': True})
         else:
@@ -40,42 +65,51 @@ def contact(request):
     return render(request, 'journal/contact.html', {'form': form})
 
 
-class IssueListView(ListView):
+@method_decorator(cached_page(), name='dispatch')
+class IssueListView(CursorPaginationMixin, ListView):
     """Список выпусков журнала"""
     model = JournalIssue
     template_name = 'journal/issues.html'
     context_object_name = 'issues'
     paginate_by = 10
+    cursor_ordering = ['-year', '-number_sort', '-number', '-pk']
 
 
+@method_decorator(cached_page(), name='dispatch')
 class IssueDetailView(DetailView):
     """Детальная страница выпуска"""
     model = JournalIssue
     template_name = 'journal/issue_detail.html'
     context_object_name = 'issue'
+    # Статьи выпуска выводятся списком - грузим их одним запросом
+    queryset = JournalIssue.objects.prefetch_related('articles')
 
 
-class ArticleListView(ListView):
+@method_decorator(cached_page(), name='dispatch')
+class ArticleListView(CursorPaginationMixin, ListView):
     """Список статей"""
     model = Article
     template_name = 'journal/articles.html'
     context_object_name = 'articles'
     paginate_by = 10
+    cursor_ordering = ['page_start', 'pk']
     
     def get_queryset(self):
-        return Article.objects.filter(is_published=True)
+        return Article.objects.filter(is_published=True).select_related('issue')
 
 
+@method_decorator(cached_page(), name='dispatch')
 class ArticleDetailView(DetailView):
     """Детальная страница статьи"""
     model = Article
     template_name = 'journal/article_detail.html'
     context_object_name = 'article'
+    queryset = Article.objects.select_related('issue')
 
 
-def download_article_pdf(request, article_id):
+async def download_article_pdf(request, article_id):
     """Скачиваем пдф файла статьи (как вложение)"""
-    article = get_object_or_404(Article, pk=article_id)
+    article = await aget_object_or_404(Article, pk=article_id, is_published=True)
 
     # поле в модели article называется pdf_file если оно называется иначе изменить!
 
@@ -83,145 +117,251 @@ def download_article_pdf(request, article_id):
         raise Http404("Файл PDF для этой статьи отсутствует.")
 
     try:
-        file_handle = article.pdf_file.open('rb')
-        response = FileResponse(file_handle, as_attachment=True)
         # формируем имя файла для пользователя (безопасное)
         filename = f"Article_{article_id}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+        etag, last_modified = article.file_validators('pdf')
+        return await aserve_file(request, article.pdf_file, as_attachment=True, filename=filename,
+                                 etag=etag, last_modified=last_modified)
     except FileNotFoundError:
         raise Http404("Файл не найден на сервере.")
 
 
-def read_article_pdf(request, article_id):
+async def read_article_pdf(request, article_id):
     """Просмотр PDF файла статьи в браузере (inline)"""
-    article = get_object_or_404(Article, pk=article_id)
+    article = await aget_object_or_404(Article, pk=article_id, is_published=True)
     
     if not article.pdf_file:
         raise Http404("PDF файл для этой статьи отсутствует.")
         
     try:
-        file_handle = article.pdf_file.open('rb')
         # as_attachment=False открывает файл во вкладке браузера
-        return FileResponse(file_handle, as_attachment=False)
+        etag, last_modified = article.file_validators('pdf')
+        return await aserve_file(request, article.pdf_file, as_attachment=False,
+                                 etag=etag, last_modified=last_modified)
+    except FileNotFoundError:
+        raise Http404("Файл не найден на сервере.")
+
+
+async def download_issue_pdf(request, issue_id):
+    """Скачиваем полный PDF выпуска (как вложение)"""
+    issue = await aget_object_or_404(JournalIssue, pk=issue_id)
+
+    if not issue.full_pdf:
+        raise Http404("PDF файл для этого выпуска отсутствует.")
+
+    try:
+        filename = f"Issue_{issue_id}.pdf"
+        etag, last_modified = issue.file_validators('full_pdf')
+        return await aserve_file(request, issue.full_pdf, as_attachment=True, filename=filename,
+                                 etag=etag, last_modified=last_modified)
+    except FileNotFoundError:
+        raise Http404("Файл не найден на сервере.")
+
+
+async def read_issue_pdf(request, issue_id):
+    """Просмотр полного PDF выпуска в браузере (inline)"""
+    issue = await aget_object_or_404(JournalIssue, pk=issue_id)
+
+    if not issue.full_pdf:
+        raise Http404("PDF файл для этого выпуска отсутствует.")
+
+    try:
+        etag, last_modified = issue.file_validators('full_pdf')
+        return await aserve_file(request, issue.full_pdf, as_attachment=False,
+                                 etag=etag, last_modified=last_modified)
+    except FileNotFoundError:
+        raise Http404("Файл не найден на сервере.")
+
+
+async def issue_cover(request, issue_id):
+    """Обложка выпуска с ETag; по адресу с версией (?v=<хэш>) кэшируется навсегда"""
+    issue = await aget_object_or_404(JournalIssue, pk=issue_id)
+
+    if not issue.cover:
+        raise Http404("Обложка для этого выпуска отсутствует.")
+
+    etag, last_modified = issue.file_validators('cover')
+    version = request.GET.get('v')
+    max_age = None
+    # Навсегда - только точный адрес из cover_url; любой другой ?v= перепроверяется как обычно
+    if version and version == issue.cover_version:
+        max_age = IMMUTABLE_MAX_AGE
+
+    try:
+        response = await aserve_file(request, issue.cover, etag=etag, last_modified=last_modified,
+                                     max_age=max_age)
     except FileNotFoundError:
         raise Http404("Файл не найден на сервере.")
+    if max_age:
+        patch_cache_control(response, immutable=True)
+    return response
 
 
+@cached_page()
 def editorial_board(request):
     """Редакционная коллегия"""
     board_members = EditorialBoard.objects.all()
     return render(request, 'journal/editorial_board.html', {'board_members': board_members})
 
 
-def archive(request):
+@cached_page()
+async def archive(request):
     """Архив журнала"""
-    archive_years = ArchiveYear.objects.filter(is_active=True)
-    return render(request, 'journal/archive.html', {'archive_years': archive_years})
+    archive_years = [archive_year async for archive_year in ArchiveYear.objects.filter(is_active=True)]
+    # Шаблон и контекст-процессоры (сессия, сообщения) синхронные - рендерим в потоке
+    return await sync_to_async(render)(request, 'journal/archive.html', {'archive_years': archive_years})
 
+@cached_page()
 def history(request):
     """История журнала"""
     return render(request, 'journal/history.html')
 
+@cached_page()
 def journal_info(request):
     """Информация о журнале"""
     journal_info = JournalInfo.objects.first()
     return render(request, 'journal/journal_info.html', {'journal_info': journal_info})
 
 
+@cached_page()
 def focus_and_scope(request):
     """Цели и задачи журнала"""
     return render(request, 'journal/focus_and_scope.html')
 
 
+@cached_page()
 def peer_reviewing(request):
     """Рецензирование"""
     return render(request, 'journal/peer_reviewing.html')
 
 
+@cached_page()
 def ethics(request):
     """Публикационная этика"""
     return render(request, 'journal/ethics.html')
 
 
+@cached_page()
 def copyright(request):
     """Авторское право"""
     return render(request, 'journal/copyright.html')
 
 
+@cached_page()
 def conflict_of_interests(request):
     """Конфликт интересов"""
     return render(request, 'journal/conflict_of_interests.html')
 
 
+@cached_page()
 def open_access(request):
     """Открытый доступ"""
     return render(request, 'journal/open_access.html')
 
 
+@cached_page()
 def privacy_policy(request):
     """Политика конфиденциальности"""
     return render(request, 'journal/privacy_policy.html')
 
 
+@cached_page()
 def fees(request):
     """Плата за публикацию"""
     return render(request, 'journal/fees.html')
 
 
+@cached_page()
 def guidelines(request):
     """Руководство для авторов"""
     return render(request, 'journal/guidelines.html')
 
 
+@cached_page()
 def text_design(request):
     """Оформление статьи"""
     return render(request, 'journal/text_design.html')
 
 
+@cached_page()
 def references(request):
     """Библиография"""
     return render(request, 'journal/references.html')
 
 
-def archive_range_view(request, year_range):
+@cached_page()
+async def archive_range_view(request, year_range):
     """
     Отображает страницу архива для диапазона (например, '2020-2025').
+    Выпуски по годам берутся из кэша (см. archive.py).
     """
-    try:
-        # Разбиваем строку "2020-2025" на начало и конец
-        start_year, end_year = map(int, year_range.split('-'))
-    except ValueError:
-        raise Http404("Некорректный формат диапазона лет")
-
-    # 1. Достаем выпуски из БД, попадающие в этот диапазон
-    # order_by('-year') важен для группировки
-    issues = JournalIssue.objects.filter(
-        year__gte=start_year, 
-        year__lte=end_year
-    ).order_by('-year', '-number')
-
-    # 2. Группируем выпуски по годам для удобного вывода в шаблоне
-    # structure: [(2025, [issue1, issue2]), (2024, [issue3...])]
-    issues_by_year = []
-    for year, group in groupby(issues, key=lambda x: x.year):
-        issues_by_year.append((year, list(group)))
-    
-    # 3. Генерируем список лет для кнопок (от конца к началу)
-    years_list = list(range(end_year, start_year - 1, -1))
+    data = await sync_to_async(get_archive_range)(year_range)
+    if data is None:
+        raise Http404("Архивный период не найден")
 
     context = {
         'year_range': year_range,
-        'issues_by_year': issues_by_year, # Данные для сетки
-        'years_list': years_list,          # Данные для кнопок
+        'issues_by_year': data['issues_by_year'],  # Данные для сетки
+        'years_list': data['years_list'],          # Данные для кнопок
     }
 
-    return render(request, 'journal/archive_range.html', context)
+    return await sync_to_async(render)(request, 'journal/archive_range.html', context)
 
+@cached_page()
 def sections(request):
     """Рубрики и периодичность"""
     return render(request, 'journal/sections.html')
 
+@cached_page()
 def editorial_staff(request):
     """Редакционная коллегия"""
     return render(request, 'journal/editorial_staff.html')
+
+
+def _search_page(request):
+    """Общая часть поиска: запрос, номер страницы, статьи и признак следующей страницы"""
+    query = request.GET.get('q', '').strip()[:200]
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+
+    articles = []
+    if query:
+        articles = search_articles(query, limit=SEARCH_PAGE_SIZE + 1, offset=(page - 1) * SEARCH_PAGE_SIZE)
+    has_next = len(articles) > SEARCH_PAGE_SIZE
+    return query, page, articles[:SEARCH_PAGE_SIZE], has_next
+
+
+def search_view(request):
+    """Поиск по статьям"""
+    query, page, articles, has_next = _search_page(request)
+    context = {
+        'query': query,
+        'page': page,
+        'articles': articles,
+        'has_next': has_next,
+    }
+    return render(request, 'journal/search.html', context)
+
+
+def search_api(request):
+    """Поиск по статьям (JSON)"""
+    query, page, articles, has_next = _search_page(request)
+    results = [
+        {
+            'id': article.pk,
+            'title': article.title,
+            'authors': article.authors,
+            'rubric': article.rubric,
+            'issue': str(article.issue),
+            'url': article.get_absolute_url(),
+        }
+        for article in articles
+    ]
+    return JsonResponse({
+        'query': query,
+        'page': page,
+        'has_next': has_next,
+        'results': results,
+    }, json_dumps_params={'ensure_ascii': False})